@@ -0,0 +1,192 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from flask import jsonify, request
+
+READ_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+# Idle clients beyond this many buckets are forgotten, oldest first; a
+# forgotten client simply starts again with a full bucket.
+DEFAULT_MAX_BUCKETS = 100000
+# Retry-After for requests shed because every slot and queue place was taken
+SHED_RETRY_AFTER = 1
+
+
+class TokenBuckets:
+    """
+    Token buckets keyed by (client, route), refilled lazily on each take().
+    A bucket holds at most `burst` tokens and gains `rate` per second. A
+    request costing more than `burst` is admitted from a full bucket and
+    leaves it in debt, so its client waits for the whole cost to refill.
+    """
+
+    def __init__(self, rate, burst, max_buckets=DEFAULT_MAX_BUCKETS, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_buckets = max_buckets
+        self.clock = clock
+        self._buckets = OrderedDict()  # key -> [tokens, last refill]
+        self._lock = threading.Lock()
+
+    def take(self, key, n=1):
+        """Spend n tokens; returns 0.0 if admitted, else the seconds until enough are due."""
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now]
+                if len(self._buckets) > self.max_buckets:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            need = min(n, self.burst)
+            if bucket[0] >= need:
+                bucket[0] -= n
+                return 0.0
+            return (need - bucket[0]) / self.rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class ConcurrencyGate:
+    """
+    At most `limit` requests inside at once and at most `queue` more waiting
+    for a slot, each for up to `timeout` seconds. Anything beyond that is
+    refused immediately rather than piling up behind the server's threads.
+    """
+
+    def __init__(self, limit, queue=0, timeout=0.0):
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def enter(self):
+        with self._cond:
+            if self.active < self.limit:
+                self.active += 1
+                return True
+            if self.waiting >= self.queue:
+                return False
+            self.waiting += 1
+            try:
+                deadline = time.monotonic() + self.timeout
+                while self.active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                self.active += 1
+                return True
+            finally:
+                self.waiting -= 1
+
+    def leave(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+
+class Budget:
+    """
+    Limits for one class of routes. rate/burst apply per client and route
+    (0 rate disables them); concurrency/queue/timeout are shared by every
+    request in the class (0 concurrency disables them).
+    """
+
+    def __init__(self, name, rate=0, burst=0, concurrency=0, queue=0, timeout=0.0,
+                 max_buckets=DEFAULT_MAX_BUCKETS):
+        self.name = name
+        self.buckets = TokenBuckets(rate, max(burst, 1), max_buckets) if rate > 0 else None
+        self.gate = ConcurrencyGate(concurrency, queue, timeout) if concurrency > 0 else None
+        self.stats = {"admitted": 0, "throttled": 0, "shed": 0}
+        self._lock = threading.Lock()
+
+    def count(self, outcome):
+        with self._lock:
+            self.stats[outcome] += 1
+
+
+def reads_and_writes(req):
+    """Default classifier: API reads and writes get separate budgets; everything else is not limited."""
+    if req.blueprint != "api":
+        return None
+    return "read" if req.method in READ_METHODS else "write"
+
+
+def remote_client(req):
+    return req.remote_addr or "-"
+
+
+def one_token(req):
+    return 1
+
+
+class AdmissionControl:
+    """
+    Rate limiting and load shedding in front of the views.
+
+    Each request is mapped by `classify(request)` to a Budget name (or None
+    to skip admission). It first spends `cost(request)` tokens (one by
+    default) from its client's bucket for that route, getting 429 with
+    Retry-After when the bucket runs short, then
+    takes a slot in the budget's concurrency gate, getting 503 when all
+    slots and queue places are taken or its wait runs out. The slot is
+    returned at teardown, so it is held for as long as the request is.
+
+    The wait queue holds server threads, so keep each budget's concurrency
+    plus queue, summed over budgets, within the server's worker threads;
+    a storm of one class then never takes the threads the other needs.
+    """
+
+    def __init__(self, app=None, budgets=(), classify=reads_and_writes, client_key=remote_client, cost=one_token):
+        self.budgets = {budget.name: budget for budget in budgets}
+        self.classify = classify
+        self.client_key = client_key
+        self.cost = cost
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._before)
+        app.teardown_request(self._teardown)
+
+    def _before(self):
+        req = request._get_current_object()
+        budget = self.budgets.get(self.classify(req))
+        if budget is None:
+            return None
+        if budget.buckets is not None:
+            route = req.url_rule.rule if req.url_rule is not None else None
+            wait = budget.buckets.take((self.client_key(req), route), self.cost(req))
+            if wait:
+                budget.count("throttled")
+                return self._refuse(429, "Too many requests", wait)
+        if budget.gate is not None:
+            if not budget.gate.enter():
+                budget.count("shed")
+                return self._refuse(503, "Server busy", SHED_RETRY_AFTER)
+            req.admission_gate = budget.gate
+        budget.count("admitted")
+        return None
+
+    def _teardown(self, exc):
+        req = request._get_current_object()
+        gate = getattr(req, "admission_gate", None)
+        if gate is not None:
+            req.admission_gate = None
+            gate.leave()
+
+    @staticmethod
+    def _refuse(status, error, retry_after):
+        retry_after = max(1, math.ceil(retry_after))
+        response = jsonify({"ok": False, "error": f"{error}, retry in {retry_after}s"})
+        response.status_code = status
+        response.headers["Retry-After"] = str(retry_after)
+        return response
@@ -0,0 +1,197 @@
+"""
+Browsing latency during a checkout storm, with and without admission control.
+
+    python bench/bench_admission.py --writers 64 --readers 4 --duration 10
+
+Starts a waitress server (--server-threads threads) in a child process with
+the order journal on and a --commit-ms group-commit window, so each order
+holds its server thread for that long the way a slow disk would, twice:
+once with
+SHOEHUB_ADMISSION=off and once with the default budgets. Against each it
+runs --readers paced browsing clients (search, query and details at
+--read-rate requests/s each), first alone and then while another process
+floods /api/compare-or-order from --writers clients in a closed loop
+(pausing for Retry-After when refused, as well-behaved clients do).
+Every client sends its own X-Client header, which the server is told to
+key its rate limits on.
+
+Reports reader p50/p99 and status counts for each phase, and what the
+storm got back: orders placed, 429s and 503s, and whether every refusal
+carried Retry-After.
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ADDRESS = {"name": "Bench", "line1": "1 Bench Rd", "line2": "", "city": "Leeds", "state": "West Yorkshire",
+           "pincode": "LS1 1AA", "phone": "+44 7000 000000"}
+READS = ("/api/shoes/search?query=running", "/api/shoes/query?sort=price&limit=20&facets=false",
+         "/api/shoes/details?name=Urban%20Casual%20Sneakers")
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100.0 * len(values)))] if values else 0.0
+
+
+def call(conn, method, path, client, body=None):
+    headers = {"X-Client": client}
+    if body is not None:
+        body = json.dumps(body).encode()
+        headers["Content-Type"] = "application/json"
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    return response.status, response.getheader("Retry-After")
+
+
+# ----------------------------
+# Child processes
+# ----------------------------
+def serve(args):
+    from waitress import create_server
+    import main as app_module
+    app_module.app.logger.disabled = True
+    logging.getLogger("waitress.queue").setLevel(logging.ERROR)  # "Task queue depth" is the point here
+    server = create_server(app_module.app, host="127.0.0.1", port=0, threads=args.server_threads,
+                           connection_limit=1000)
+    print(f"READY {server.effective_port}", flush=True)
+    server.run()
+
+
+def storm(args):
+    """Closed-loop order placement from --writers clients; prints status counts as JSON."""
+    statuses, missing_retry_after = Counter(), [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+
+    def writer(w):
+        rng = random.Random(w)
+        conn = http.client.HTTPConnection("127.0.0.1", args.port, timeout=60)
+        local, missing = Counter(), 0
+        while time.monotonic() < deadline:
+            status, retry_after = call(conn, "POST", "/api/compare-or-order", f"writer-{w}", {
+                "action": "order", "shoe_id": "SHOE002", "color": "white", "size": rng.choice([6, 7, 9, 10]),
+                "shipping_address": ADDRESS, "customer_id": "CUST002"})
+            local[status] += 1
+            if status in (429, 503):
+                missing += retry_after is None
+                time.sleep(float(retry_after or 1))
+        conn.close()
+        with lock:
+            statuses.update(local)
+            missing_retry_after[0] += missing
+
+    pool = [threading.Thread(target=writer, args=(w,)) for w in range(args.writers)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    print(json.dumps({"statuses": statuses, "missing_retry_after": missing_retry_after[0]}), flush=True)
+
+
+# ----------------------------
+# Driver
+# ----------------------------
+def start_server(args, admission, directory):
+    env = dict(os.environ, SHOEHUB_ADMISSION=admission, SHOEHUB_CLIENT_HEADER="X-Client",
+               SHOEHUB_JOURNAL_DIR=os.path.join(directory, admission), SHOEHUB_JOURNAL_WINDOW_MS=str(args.commit_ms),
+               SHOEHUB_SLOW_REQUEST_MS="0")
+    cmd = [sys.executable, os.path.abspath(__file__), "--serve", "--server-threads", str(args.server_threads)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True, env=env)
+    for line in proc.stdout:
+        if line.startswith("READY"):
+            return proc, int(line.split()[1])
+    raise SystemExit("server exited before becoming ready")
+
+
+def read_phase(args, port):
+    """Paced readers for --duration seconds; returns (latencies, status counts)."""
+    latencies, statuses = [], Counter()
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+
+    def reader(r):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        interval, local, codes = 1.0 / args.read_rate, [], Counter()
+        due = time.monotonic()
+        n = 0
+        while due < deadline:
+            time.sleep(max(0.0, due - time.monotonic()))
+            started = time.perf_counter()
+            status, _ = call(conn, "GET", READS[n % len(READS)], f"browser-{r}")
+            local.append(time.perf_counter() - started)
+            codes[status] += 1
+            due += interval
+            n += 1
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            statuses.update(codes)
+
+    pool = [threading.Thread(target=reader, args=(r,)) for r in range(args.readers)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return latencies, statuses
+
+
+def report(label, latencies, statuses):
+    codes = " ".join(f"{code}:{n}" for code, n in sorted(statuses.items()))
+    print(f"  {label:<8} reads p50 {percentile(latencies, 50) * 1e3:>7.2f} ms  "
+          f"p99 {percentile(latencies, 99) * 1e3:>8.2f} ms  statuses {codes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=64, help="concurrent order-placing clients in the storm")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--read-rate", type=float, default=20.0, help="requests/s per reader")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per phase")
+    parser.add_argument("--server-threads", type=int, default=8)
+    parser.add_argument("--commit-ms", type=float, default=20.0, help="order journal group-commit window")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--storm", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args)
+    if args.storm:
+        return storm(args)
+
+    with tempfile.TemporaryDirectory(prefix="shoehub-admission-") as directory:
+        for admission in ("off", "on"):
+            proc, port = start_server(args, admission, directory)
+            try:
+                print(f"admission {admission}: {args.readers} readers at {args.read_rate:g}/s, "
+                      f"{args.server_threads} server threads")
+                report("quiet", *read_phase(args, port))
+                writers = subprocess.Popen(
+                    [sys.executable, os.path.abspath(__file__), "--storm", "--port", str(port),
+                     "--writers", str(args.writers), "--duration", str(args.duration)],
+                    stdout=subprocess.PIPE, text=True)
+                report("storm", *read_phase(args, port))
+                result = json.loads(writers.communicate()[0])
+                codes = " ".join(f"{code}:{n}" for code, n in sorted(result["statuses"].items()))
+                print(f"  storm    {args.writers} writers got {codes}; "
+                      f"refusals without Retry-After: {result['missing_retry_after']}")
+            finally:
+                proc.terminate()
+                proc.wait()
+
+
+if __name__ == "__main__":
+    main()
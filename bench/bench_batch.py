@@ -0,0 +1,86 @@
+"""
+Batch endpoints versus one request per item.
+
+    python bench/bench_batch.py --shoes 10000 --items 50 --rounds 50 --journal
+
+Fetches --items shoe details as --items GET /api/shoes/details calls and as
+one /api/shoes/details/batch call (by id and by name), and places --items
+orders as --items /api/compare-or-order calls and as one /api/orders/bulk
+call, each --rounds times through the Flask test client. Reports ms per
+round for each. --journal turns on the order journal in a temporary
+directory, so every single-order request also waits for its own group
+commit.
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ADDRESS = {"name": "Bench", "line1": "1 Bench Rd", "line2": "", "city": "Leeds", "state": "West Yorkshire",
+           "pincode": "LS1 1AA", "phone": "+44 7000 000000"}
+
+
+def timed_rounds(rounds, fn):
+    started = time.perf_counter()
+    for n in range(rounds):
+        fn(n)
+    return (time.perf_counter() - started) / rounds * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shoes", type=int, default=10000, help="synthetic catalog entries to add")
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--journal", action="store_true")
+    parser.add_argument("--seed", type=int, default=9)
+    args = parser.parse_args()
+
+    journal_dir = tempfile.mkdtemp(prefix="shoehub-batch-") if args.journal else None
+    if journal_dir:
+        os.environ["SHOEHUB_JOURNAL_DIR"] = journal_dir
+    os.environ.setdefault("SHOEHUB_SLOW_REQUEST_MS", "0")
+    os.environ.setdefault("SHOEHUB_ADMISSION", "off")
+    os.environ.setdefault("SHOEHUB_RESPONSE_CACHE_SIZE", "0")  # time the handlers, not cache hits
+    try:
+        from loadtest import load_synthetic
+        import main as app_module
+        load_synthetic(app_module, args.shoes, 0, args.seed)
+        client = app_module.app.test_client()
+        shoes = app_module.catalog.shoes
+        rng = random.Random(args.seed)
+        picks = [rng.sample(list(shoes), args.items) for _ in range(args.rounds)]
+
+        print(f"{args.items} items per round, {args.rounds} rounds, {len(shoes)} shoes"
+              f"{', journal on' if journal_dir else ''} (ms per round)")
+        single = timed_rounds(args.rounds, lambda n: [
+            client.get("/api/shoes/details", query_string={"name": shoes[sid]["name"]}) for sid in picks[n]])
+        by_id = timed_rounds(args.rounds, lambda n: client.post(
+            "/api/shoes/details/batch", json={"shoe_ids": picks[n]}))
+        by_name = timed_rounds(args.rounds, lambda n: client.post(
+            "/api/shoes/details/batch", json={"names": [shoes[sid]["name"] for sid in picks[n]]}))
+        print(f"  details  one per request {single:>8.2f}   batch by id {by_id:>7.2f}   batch by name {by_name:>7.2f}")
+
+        def items(n):
+            return [{"shoe_id": sid, "color": shoes[sid]["colors"][0], "size": shoes[sid]["sizes"][0]}
+                    for sid in picks[n]]
+
+        single = timed_rounds(args.rounds, lambda n: [
+            client.post("/api/compare-or-order", json=dict(item, action="order", customer_id="CUST002",
+                                                           shipping_address=ADDRESS))
+            for item in items(n)])
+        bulk = timed_rounds(args.rounds, lambda n: client.post(
+            "/api/orders/bulk", json={"customer_id": "CUST002", "shipping_address": ADDRESS, "items": items(n)}))
+        print(f"  orders   one per request {single:>8.2f}   bulk        {bulk:>7.2f}")
+    finally:
+        if journal_dir:
+            shutil.rmtree(journal_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Catalog hot-reload cost on a large external catalog file.
+
+    python bench/bench_catalog_reload.py --shoes 100000 --threads 8 --duration 10 --reloads 3
+
+First times each reload stage for a --shoes catalog written as JSON and as
+CSV: parsing the file, building the snapshot's indexes, and swapping the
+catalog and inventory into an in-memory repository.
+
+Then starts the app on the JSON file and has --threads readers call
+/api/shoes/query (sorted by price) and /api/shoes/search through the
+Flask test client, first for --duration seconds with the catalog quiet and
+then while another thread --reloads times replaces the file with a
+re-priced version and reloads it.
+It reports reader p50/p99 for both phases and counts price-sorted pages
+whose prices are out of order, which is what a reader mixing one version's
+index with another version's shoe documents would see. Finally it prices
+the per-request snapshot pin itself.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog_source import CSV_COLUMNS, LIST_SEPARATOR, CatalogSnapshot, load_catalog  # noqa: E402
+from inventory import InventoryMatrix  # noqa: E402
+from loadtest import BRANDS, STYLES, synthetic_shoe  # noqa: E402
+from repository import InMemoryRepository  # noqa: E402
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100.0 * len(values)))]
+
+
+def synthetic_catalog(count, seed, reverse_prices=False):
+    rng = random.Random(seed)
+    shoes, inventory = {}, {}
+    for n in range(count):
+        shoe_id = f"SKU{n:07d}"
+        shoes[shoe_id], inventory[shoe_id] = synthetic_shoe(rng, n)
+    if reverse_prices:
+        # Same shoes, prices handed out in reverse order, so price order flips between versions
+        prices = [shoe["base_price"] for shoe in shoes.values()]
+        for shoe, price in zip(shoes.values(), reversed(prices)):
+            shoe["base_price"] = price
+    return shoes, inventory
+
+
+def write_json(path, shoes, inventory):
+    with open(path, "w") as f:
+        json.dump({"shoes": shoes, "inventory": inventory}, f)
+
+
+def write_csv(path, shoes, inventory):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        for shoe_id, shoe in shoes.items():
+            unavailable = [f"{color}:{size}" for color, by_size in inventory[shoe_id].items()
+                           for size, ok in by_size.items() if not ok]
+            writer.writerow([
+                shoe_id, shoe["name"], shoe["brand"], shoe["image"], shoe["base_price"], shoe["discount_percent"],
+                shoe["rating"], LIST_SEPARATOR.join(shoe["colors"]), LIST_SEPARATOR.join(map(str, shoe["sizes"])),
+                LIST_SEPARATOR.join(shoe["materials"]), LIST_SEPARATOR.join(shoe["advantages"]),
+                shoe["description"], LIST_SEPARATOR.join(unavailable),
+            ])
+
+
+def time_stages(path):
+    started = time.perf_counter()
+    shoes, inventory = load_catalog(path)
+    parsed = time.perf_counter()
+    CatalogSnapshot(shoes)
+    indexed = time.perf_counter()
+    InMemoryRepository({"shoes": {}, "inventory": InventoryMatrix()}).replace_catalog(shoes, inventory)
+    stored = time.perf_counter()
+    return parsed - started, indexed - parsed, stored - indexed
+
+
+def read_phase(app_module, threads, seed, finished):
+    """Run readers until finished() is true; returns (latencies, out-of-order pages, elapsed seconds)."""
+    latencies, disorder = [], [0]
+    lock = threading.Lock()
+    stop = threading.Event()
+    barrier = threading.Barrier(threads + 1)
+
+    def reader(w):
+        rng = random.Random(seed + w)
+        client = app_module.app.test_client()
+        local, bad = [], 0
+        barrier.wait()
+        while not stop.is_set():
+            started = time.perf_counter()
+            if rng.random() < 0.5:
+                body = client.get("/api/shoes/query", query_string={
+                    "brands": rng.choice(BRANDS), "sort": "price", "limit": 20, "offset": rng.randrange(0, 2000),
+                    "facets": "false"}).get_json()
+                prices = [app_module.price_after_discount(shoe) for shoe in body["results"]]
+                bad += prices != sorted(prices)
+            else:
+                client.get("/api/shoes/search", query_string={
+                    "query": rng.choice(STYLES).lower(), "limit": 20, "offset": rng.randrange(0, 2000)})
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+            disorder[0] += bad
+
+    pool = [threading.Thread(target=reader, args=(w,)) for w in range(threads)]
+    for t in pool:
+        t.start()
+    barrier.wait()
+    started = time.perf_counter()
+    while not finished():
+        time.sleep(0.05)
+    stop.set()
+    for t in pool:
+        t.join()
+    return latencies, disorder[0], time.perf_counter() - started
+
+
+def report(label, latencies, disorder, elapsed, extra=""):
+    print(f"  {label:<10} {len(latencies) / elapsed:>7.0f} req/s  p50 {percentile(latencies, 50) * 1e3:>6.2f} ms"
+          f"  p99 {percentile(latencies, 99) * 1e3:>7.2f} ms  out-of-order pages {disorder}{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shoes", type=int, default=100000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of the quiet reader phase")
+    parser.add_argument("--reloads", type=int, default=3, help="reloads during the second reader phase")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="shoehub-catalog-")
+    try:
+        versions = []
+        for name, reverse in (("a", False), ("b", True)):
+            shoes, inventory = synthetic_catalog(args.shoes, args.seed, reverse_prices=reverse)
+            write_json(os.path.join(directory, f"{name}.json"), shoes, inventory)
+            versions.append(os.path.join(directory, f"{name}.json"))
+        write_csv(os.path.join(directory, "a.csv"), *synthetic_catalog(args.shoes, args.seed))
+
+        print(f"reload stages for {args.shoes} shoes (seconds)")
+        for path in (versions[0], os.path.join(directory, "a.csv")):
+            parse, index, store = time_stages(path)
+            size = os.path.getsize(path) / 2 ** 20
+            print(f"  {os.path.basename(path):<7} {size:>6.1f} MiB  parse {parse:.2f}  index {index:.2f}  "
+                  f"swap {store:.2f}  total {parse + index + store:.2f}")
+
+        live = os.path.join(directory, "live.json")
+        shutil.copyfile(versions[0], live)
+        os.environ["SHOEHUB_CATALOG_PATH"] = live
+        os.environ["SHOEHUB_CATALOG_POLL_SECONDS"] = "3600"  # reloads below are driven explicitly
+        os.environ.setdefault("SHOEHUB_SLOW_REQUEST_MS", "0")
+        os.environ.setdefault("SHOEHUB_ADMISSION", "off")  # all readers are one client
+        import main as app_module
+
+        def after(seconds):
+            deadline = time.perf_counter() + seconds
+            return lambda: time.perf_counter() >= deadline
+
+        read_phase(app_module, args.threads, args.seed, after(1.0))  # warm-up
+        print(f"readers, {args.threads} threads")
+        report("quiet", *read_phase(app_module, args.threads, args.seed, after(args.duration)))
+
+        reloads = []
+
+        def reloader():
+            for n in range(1, args.reloads + 1):
+                tmp = live + ".tmp"
+                shutil.copyfile(versions[n % 2], tmp)
+                os.replace(tmp, live)
+                started = time.perf_counter()
+                app_module.catalog_watcher.check()
+                reloads.append(time.perf_counter() - started)
+
+        thread = threading.Thread(target=reloader)
+        thread.start()
+        report("reloading", *read_phase(app_module, args.threads, args.seed, lambda: not thread.is_alive()),
+               extra=f"  ({len(reloads)} reloads, {sum(reloads) / len(reloads):.2f} s each)")
+
+        n = 200000
+        with app_module.app.test_request_context():
+            started = time.perf_counter()
+            for _ in range(n):
+                app_module.current_catalog()
+            pinned = time.perf_counter() - started
+        print(f"snapshot pin: {pinned / n * 1e9:.0f} ns per current_catalog() call inside a request")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
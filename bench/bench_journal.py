@@ -0,0 +1,117 @@
+"""
+Order journal benchmark: group-commit write throughput and replay speed.
+
+    python bench/bench_journal.py --threads 32 --writes 200 --replay-events 2000000
+
+Write phase: N threads log order updates concurrently with and without a
+commit window, against a naive fsync-per-write baseline. Replay phase:
+writes a journal of --replay-events events over --replay-orders distinct
+orders, then times OrderJournal.recover().
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_journal import OrderJournal, encode_body, encode_event, _segment_name  # noqa: E402
+
+ORDER = {
+    "customer_id": "CUST001", "shoe_id": "SHOE001", "size": 9, "color": "red", "status": "PLACED",
+    "shipping_address": {"name": "John David", "line1": "123 Shoe Street", "line2": "Near City Mall",
+                         "city": "Greenwich", "state": "London", "pincode": "SE10 9NN", "phone": "+44 7911 123456"},
+    "payment_method": "COD", "created_at": "2024-01-01T00:00:00"
+}
+
+
+def fsync_per_write(directory, threads, writes):
+    path = os.path.join(directory, "naive.log")
+    lock = threading.Lock()
+    with open(path, "ab") as f:
+        def worker(w):
+            for i in range(writes):
+                line = encode_event(0, encode_body(f"ORD{w}-{i}", ORDER))
+                with lock:
+                    f.write(line)
+                    f.flush()
+                    os.fsync(f.fileno())
+        return run_threads(threads, worker)
+
+
+def group_commit(directory, threads, writes, window_ms):
+    journal = OrderJournal(directory, commit_window_ms=window_ms, snapshot_every=10 ** 12)
+    journal.recover()
+    journal.start(snapshot_source=dict)
+
+    def worker(w):
+        for i in range(writes):
+            journal.log(f"ORD{w}-{i}", ORDER)
+
+    elapsed = run_threads(threads, worker)
+    fsyncs = journal.stats["fsyncs"]
+    journal.close()
+    return elapsed, fsyncs
+
+
+def run_threads(threads, target):
+    pool = [threading.Thread(target=target, args=(w,)) for w in range(threads)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return time.perf_counter() - started
+
+
+def build_journal(directory, events, orders):
+    with open(os.path.join(directory, _segment_name(1)), "wb") as f:
+        chunk = []
+        for seq in range(1, events + 1):
+            chunk.append(encode_event(seq, encode_body(f"ORD{1000 + seq % orders}", dict(ORDER, size=seq % 12))))
+            if len(chunk) == 10000:
+                f.write(b"".join(chunk))
+                chunk = []
+        f.write(b"".join(chunk))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--writes", type=int, default=200, help="writes per thread")
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    parser.add_argument("--replay-events", type=int, default=2000000)
+    parser.add_argument("--replay-orders", type=int, default=200000)
+    args = parser.parse_args()
+
+    total = args.threads * args.writes
+    print(f"write phase: {args.threads} threads x {args.writes} writes")
+    tmp = tempfile.mkdtemp(prefix="shoehub-journal-")
+    try:
+        elapsed = fsync_per_write(tmp, args.threads, args.writes)
+        print(f"  fsync per write        {total / elapsed:>10.0f} writes/s  fsyncs={total}")
+        for window in (0.0, args.window_ms):
+            directory = tempfile.mkdtemp(dir=tmp)
+            elapsed, fsyncs = group_commit(directory, args.threads, args.writes, window)
+            print(f"  group commit {window:>4.1f} ms   {total / elapsed:>10.0f} writes/s  fsyncs={fsyncs}")
+
+        directory = tempfile.mkdtemp(dir=tmp)
+        print(f"replay phase: {args.replay_events} events over {args.replay_orders} orders")
+        started = time.perf_counter()
+        build_journal(directory, args.replay_events, args.replay_orders)
+        size = os.path.getsize(os.path.join(directory, _segment_name(1)))
+        print(f"  built {size / 2 ** 20:.0f} MiB journal in {time.perf_counter() - started:.1f}s")
+        journal = OrderJournal(directory)
+        orders = journal.recover()
+        stats = journal.last_recovery
+        print(f"  replayed {stats['replayed_events']} events -> {len(orders)} orders in "
+              f"{stats['replay_seconds']:.2f}s ({stats['events_per_second']:.0f} events/s)")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
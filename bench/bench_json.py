@@ -0,0 +1,104 @@
+"""
+JSON encoding of catalog responses: Flask's default provider versus
+FastJSONProvider, with and without the per-shoe fragment cache.
+
+    python bench/bench_json.py --shoes 10000 --rounds 2000
+
+First encodes a 50-result search payload built from fresh dicts with
+Flask's DefaultJSONProvider, with the standard library and orjson Encoders,
+and as 50 cached fragments spliced in by each Encoder (µs per payload).
+Then times GET /api/shoes/search, /api/shoes/query, /api/shoes/details/batch
+and a 10-way compare through the Flask test client with each encoder,
+once with the fragment cache emptied before every request and once warm
+(µs per request). The response cache is off so every request is encoded.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+RESULTS = 50
+
+
+def per_call(rounds, fn):
+    fn()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shoes", type=int, default=10000, help="synthetic catalog entries to add")
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ.setdefault("SHOEHUB_SLOW_REQUEST_MS", "0")
+    os.environ.setdefault("SHOEHUB_ADMISSION", "off")
+    os.environ.setdefault("SHOEHUB_RESPONSE_CACHE_SIZE", "0")  # encode on every request
+    from flask.json.provider import DefaultJSONProvider
+    from json_provider import Encoder, FastJSONProvider, join_array, orjson, set_default_encoder
+    from loadtest import load_synthetic
+    import main as app_module
+
+    load_synthetic(app_module, args.shoes, 0, args.seed)
+    app, snapshot = app_module.app, app_module.catalog
+    rng = random.Random(args.seed)
+    picks = rng.sample(list(snapshot.shoes), RESULTS)
+    encoders = [Encoder("json")] + ([Encoder("orjson")] if orjson is not None else [])
+
+    print(f"encode a {RESULTS}-result search payload (µs)")
+    flask_default = DefaultJSONProvider(app)
+
+    def fresh_payload():
+        results = [dict(app_module.shoe_summary(sid, snapshot.shoes[sid]), score=1.5) for sid in picks]
+        return {"ok": True, "results": results, "total": RESULTS, "limit": RESULTS, "offset": 0}
+
+    print(f"  flask default            {per_call(args.rounds, lambda: flask_default.dumps(fresh_payload())):>9.1f}")
+    for encoder in encoders:
+        set_default_encoder(encoder)
+        snapshot.fragments = type(snapshot.fragments)(encoder)
+        print(f"  {encoder.name:<6} fresh dicts       {per_call(args.rounds, lambda: encoder.encode(fresh_payload())):>9.1f}")
+
+        def spliced():
+            results = join_array([app_module.summary_fragment(snapshot, sid, snapshot.shoes[sid], score=1.5)
+                                  for sid in picks], encoder.encode)
+            return encoder.encode({"ok": True, "results": results, "total": RESULTS, "limit": RESULTS, "offset": 0})
+
+        print(f"  {encoder.name:<6} cached fragments  {per_call(args.rounds, spliced):>9.1f}")
+
+    client = app.test_client()
+    names = [snapshot.shoes[sid]["name"] for sid in picks]
+    requests = [
+        ("search", lambda: client.get("/api/shoes/search", query_string={"query": "running", "limit": RESULTS})),
+        ("query", lambda: client.get("/api/shoes/query", query_string={"sort": "-rating", "limit": RESULTS,
+                                                                       "facets": "false"})),
+        ("details batch", lambda: client.post("/api/shoes/details/batch", json={"names": names})),
+        ("compare 10", lambda: client.post("/api/compare-or-order", json={"action": "compare",
+                                                                          "shoe_ids": picks[:10]})),
+    ]
+    rounds = max(1, args.rounds // 10)
+    print(f"\nrequests through the test client (µs per request, {rounds} rounds)")
+    print(f"  {'':<14}" + "".join(f"{e.name + ' cold':>14}{e.name + ' warm':>14}" for e in encoders))
+    for label, send in requests:
+        row = []
+        for encoder in encoders:
+            set_default_encoder(encoder)
+            app.json = FastJSONProvider(app, encoder)
+            snapshot.fragments = type(snapshot.fragments)(encoder)
+
+            def cold():
+                snapshot.fragments = type(snapshot.fragments)(encoder)
+                send()
+
+            row += [per_call(rounds, cold), per_call(rounds, send)]
+        print(f"  {label:<14}" + "".join(f"{value:>14.1f}" for value in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Memory held by the order table: plain dicts versus compact OrderRecords.
+
+    python bench/bench_order_memory.py --orders 1000000 --customers 50000
+
+Builds the same synthetic orders three ways, each in a fresh forked
+process, and reports how much the process RSS grew: the old
+{order_id: dict} layout, {order_id: OrderRecord} with a shared
+AddressBook, and a full OrderStore (records plus the secondary indexes).
+Each order is parsed from its own JSON body, as a request would be, so the
+dict layout pays for its own copy of every string just like it does in
+production. Repeat customers reuse their address. Finally checks that
+--verify records unpack to the dicts they were built from and times unpack().
+"""
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_records import AddressBook, pack_order  # noqa: E402
+from order_store import OrderStore  # noqa: E402
+
+COLORS = ["red", "white", "black", "navy", "brown", "blue", "beige", "gray", "gold", "silver"]
+CITIES = [("Greenwich", "London"), ("Salford", "Manchester"), ("Leith", "Edinburgh"), ("Clifton", "Bristol")]
+
+
+def order_bodies(count, customers, seed):
+    """JSON text of `count` orders, as the routes would receive and store them."""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    for n in range(count):
+        c = rng.randrange(customers)
+        city, state = CITIES[c % len(CITIES)]
+        yield json.dumps({
+            "customer_id": f"CUST{c:06d}",
+            "shoe_id": f"SHOE{rng.randrange(1, 2000):04d}",
+            "size": rng.randrange(6, 12),
+            "color": rng.choice(COLORS),
+            "status": "PLACED",
+            "shipping_address": {
+                "name": f"Customer {c}", "line1": f"{c % 900 + 1} Shoe Street", "line2": "Near City Mall",
+                "city": city, "state": state, "pincode": f"SE{c % 90 + 10} {c % 9}NN",
+                "phone": f"+44 7911 {c:06d}",
+            },
+            "payment_method": "COD" if n % 3 else "CARD",
+            "created_at": (start + timedelta(seconds=n * 7, microseconds=rng.randrange(1000000))).isoformat(),
+        })
+
+
+def rss():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # peak RSS (KiB on Linux)
+
+
+def build_dicts(count, customers, seed):
+    return {f"ORD{n + 1001}": json.loads(body) for n, body in enumerate(order_bodies(count, customers, seed))}
+
+
+def build_records(count, customers, seed):
+    addresses = AddressBook()
+    return {f"ORD{n + 1001}": pack_order(json.loads(body), addresses)
+            for n, body in enumerate(order_bodies(count, customers, seed))}
+
+
+def build_store(count, customers, seed):
+    store = OrderStore()
+    for n, body in enumerate(order_bodies(count, customers, seed)):
+        store.put(f"ORD{n + 1001}", json.loads(body))
+    return store
+
+
+def _grow(build, args, results):
+    gc.collect()
+    before = rss()
+    table = build(*args)
+    gc.collect()
+    results.put(rss() - before)
+    del table
+
+
+def rss_growth(build, *args):
+    """RSS added by build(*args), measured in a forked child so layouts do not share pages or arenas."""
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    child = ctx.Process(target=_grow, args=(build, args, results))
+    child.start()
+    grown = results.get()
+    child.join()
+    return grown
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=500000)
+    parser.add_argument("--customers", type=int, default=50000, help="distinct customers (and addresses)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--verify", type=int, default=100000, help="orders to round-trip and time unpack() on")
+    args = parser.parse_args()
+    shape = (args.orders, args.customers, args.seed)
+
+    print(f"{args.orders} orders from {args.customers} customers")
+    dict_bytes = rss_growth(build_dicts, *shape)
+    for label, used in (("dict per order", dict_bytes),
+                        ("OrderRecord + AddressBook", rss_growth(build_records, *shape)),
+                        ("OrderStore (records + indexes)", rss_growth(build_store, *shape))):
+        print(f"  {label:<32} {used / 2 ** 20:>8.1f} MiB  {used / args.orders:>6.0f} B/order  "
+              f"{used / dict_bytes:>4.0%}")
+
+    verify = (min(args.verify, args.orders), args.customers, args.seed)
+    dicts, records = build_dicts(*verify), build_records(*verify)
+    mismatches = sum(1 for order_id, order in dicts.items() if records[order_id].unpack() != order)
+    if mismatches:
+        raise SystemExit(f"{mismatches} records did not round-trip")
+    started = time.perf_counter()
+    for record in records.values():
+        record.unpack()
+    elapsed = time.perf_counter() - started
+    print(f"unpack: {elapsed / len(records) * 1e6:.2f} us/order; {len(records)} records round-trip exactly")
+
+
+if __name__ == "__main__":
+    main()
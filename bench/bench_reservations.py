@@ -0,0 +1,109 @@
+"""
+Flash-sale benchmark for stock holds.
+
+    python bench/bench_reservations.py --threads 32 --ops 2000 --backlog 0 100000 500000
+
+For each backlog size, first parks that many long-lived holds, one per
+SKU, then has --threads threads run reserve -> confirm (or release) cycles
+against a handful of hot SKUs and reports per-operation latency. A hold
+claims its whole SKU, so on the hot SKUs most reserves are refused while
+another thread's hold is pending; refusals are counted.
+Flat p50/p99 across backlog sizes means hold bookkeeping does not grow
+with the number of outstanding holds. Finally times how long the expiry
+thread takes to release a burst of --expire holds falling due together.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reservations import HoldTable, ReservationBook  # noqa: E402
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100.0 * len(values)))]
+
+
+def new_book():
+    # Uncapped: the backlog is parked under a single customer
+    return ReservationBook(HoldTable({}), is_available=lambda shoe_id, color, size: True,
+                           per_customer=float("inf"), limit=float("inf"))
+
+
+def park(book, holds):
+    for n in range(holds):
+        book.reserve(f"BG{n:07d}", "black", 9, customer_id="PARKED", ttl=3600)
+
+
+def flash_sale(book, threads, ops, hot_skus):
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker(w):
+        rng = random.Random(w)
+        local = []
+        barrier.wait()
+        for _ in range(ops):
+            sku = (f"HOT{rng.randrange(hot_skus)}", "red", 9)
+            started = time.perf_counter()
+            hold, _ = book.reserve(*sku, customer_id=f"C{w}", ttl=600)
+            if hold is not None:
+                if rng.random() < 0.7:
+                    book.confirm(hold.hold_id, f"C{w}")
+                else:
+                    book.release(hold.hold_id, f"C{w}")
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    pool = [threading.Thread(target=worker, args=(w,)) for w in range(threads)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return time.perf_counter() - started, latencies
+
+
+def expiry_burst(count, ttl=5.0):
+    book = new_book()
+    for n in range(count):
+        book.reserve(f"BURST{n:07d}", "red", 9, customer_id="X", ttl=ttl)
+    last_due = max(hold.deadline for hold in book.holds.all())
+    if time.time() >= last_due - 0.5:
+        raise SystemExit(f"placing {count} holds took longer than the {ttl}s ttl; lower --expire")
+    while len(book):
+        time.sleep(0.001)
+    return time.time() - last_due, book.stats["expired"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--ops", type=int, default=2000, help="reserve cycles per thread")
+    parser.add_argument("--hot-skus", type=int, default=8)
+    parser.add_argument("--backlog", type=int, nargs="+", default=[0, 100000, 500000])
+    parser.add_argument("--expire", type=int, default=200000)
+    args = parser.parse_args()
+
+    print(f"{args.threads} threads x {args.ops} reserve->confirm/release cycles on {args.hot_skus} hot SKUs")
+    for backlog in args.backlog:
+        book = new_book()
+        park(book, backlog)
+        elapsed, latencies = flash_sale(book, args.threads, args.ops, args.hot_skus)
+        print(f"  {backlog:>8} parked holds: {len(latencies) / elapsed:>8.0f} cycles/s  "
+              f"p50 {percentile(latencies, 50) * 1e6:>6.1f} us  p99 {percentile(latencies, 99) * 1e6:>7.1f} us  "
+              f"refused {book.stats['rejected']}")
+
+    lag, expired = expiry_burst(args.expire)
+    print(f"expiry: {expired} holds released, the last {lag * 1000:.0f} ms after its deadline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Cost of the precomputed similar-shoes lists.
+
+    python bench/bench_similar.py --shoes 50000 --changes 200 --lookups 100000
+
+Builds SimilarShoes for a --shoes synthetic catalog from scratch, then
+times single-shoe edits as the admin routes apply them (new shoes, edited
+shoes, removals), and a catalog reload in which --changes shoes differ,
+which patches a copy of the previous lists instead of rebuilding them.
+Checks that the patched lists score the same as a from-scratch build of
+the final catalog, and finally times serving: the raw lookup and
+GET /api/shoes/similar through the Flask test client.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loadtest import synthetic_shoe  # noqa: E402
+from recommendations import SimilarShoes, refresh_similar  # noqa: E402
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def edited(rng, shoe):
+    shoe = dict(shoe)
+    shoe["rating"] = round(rng.uniform(1, 5), 1)
+    shoe["base_price"] = rng.randrange(3000, 20000, 100)
+    return shoe
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shoes", type=int, default=50000)
+    parser.add_argument("--changes", type=int, default=200, help="shoes edited, added or removed by the reload")
+    parser.add_argument("--ops", type=int, default=200, help="single-shoe edits of each kind to time")
+    parser.add_argument("--lookups", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    shoes = {f"SKU{n:07d}": synthetic_shoe(rng, n)[0] for n in range(args.shoes)}
+    index, seconds = timed(SimilarShoes, shoes)
+    print(f"full build, {len(shoes)} shoes x {index.vectors.shape[1]} features: {seconds:.2f} s")
+
+    ids = list(shoes)
+    ops = (
+        ("add", lambda n: index.add(f"NEW{n:07d}", synthetic_shoe(rng, args.shoes + n)[0])),
+        ("edit", lambda n: index.add(ids[n], edited(rng, shoes[ids[n]]))),
+        ("remove", lambda n: index.remove(ids[-1 - n])),
+    )
+    for label, op in ops:
+        started = time.perf_counter()
+        for n in range(args.ops):
+            op(n)
+        print(f"  {label:<7} {(time.perf_counter() - started) / args.ops * 1e3:>7.2f} ms per shoe")
+
+    old = SimilarShoes(shoes)
+    new = dict(shoes)
+    for n in rng.sample(range(len(ids)), args.changes):
+        kind = n % 3
+        if kind == 0:
+            new[ids[n]] = edited(rng, shoes[ids[n]])
+        elif kind == 1:
+            del new[ids[n]]
+        else:
+            new[f"ADD{n:07d}"] = synthetic_shoe(rng, n)[0]
+    patched, seconds = timed(refresh_similar, old, shoes, new)
+    fresh, full = timed(SimilarShoes, new)
+    print(f"reload with {args.changes} changed shoes: patched in {seconds:.2f} s, full rebuild {full:.2f} s")
+    mismatched = 0
+    for shoe_id in rng.sample(list(new), min(2000, len(new))):
+        a = [score for _, score in patched.similar(shoe_id)]
+        b = [score for _, score in fresh.similar(shoe_id)]
+        mismatched += len(a) != len(b) or not np.allclose(a, b, atol=1e-3)
+    if mismatched:
+        raise SystemExit(f"{mismatched} patched lists differ from a full rebuild")
+    print("  patched lists match a full rebuild")
+
+    lookup_ids = [rng.choice(ids[:len(ids) // 2]) for _ in range(args.lookups)]
+    started = time.perf_counter()
+    for shoe_id in lookup_ids:
+        index.similar(shoe_id, 10)
+    print(f"lookup: {(time.perf_counter() - started) / args.lookups * 1e6:.2f} us")
+
+    os.environ.setdefault("SHOEHUB_SLOW_REQUEST_MS", "0")
+    os.environ.setdefault("SHOEHUB_ADMISSION", "off")  # one client, back to back
+    import main as app_module
+    client = app_module.app.test_client()
+    demo = list(app_module.catalog.shoes)
+    latencies = []
+    for n in range(min(args.lookups, 20000)):
+        started = time.perf_counter()
+        client.get("/api/shoes/similar", query_string={"shoe_id": demo[n % len(demo)], "limit": n % 10 + 1})
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    print(f"GET /api/shoes/similar: p50 {latencies[len(latencies) // 2] * 1e3:.3f} ms  "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1e3:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Read/write throughput of the in-memory and SQLite storage backends.
+
+    python bench/bench_storage.py --threads 8 --ops 20000
+
+Each workload runs the same repository calls the routes make: shoe and
+order lookups plus availability checks for reads, order creation and
+read-modify-write updates for writes.
+"""
+import argparse
+import copy
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inventory import InventoryMatrix  # noqa: E402
+from order_store import OrderStore  # noqa: E402
+from repository import InMemoryRepository, SqliteRepository  # noqa: E402
+import main as app_module  # noqa: E402
+
+ADDRESS = {"name": "Bench", "line1": "1 Bench Rd", "line2": "", "city": "X", "state": "Y",
+           "pincode": "000", "phone": "0"}
+
+
+def fresh_db():
+    db = copy.deepcopy({k: v for k, v in app_module.DB.items() if k in ("customers", "shoes", "pending")})
+    db["inventory"] = InventoryMatrix()
+    for shoe_id in app_module.DB["shoes"]:
+        db["inventory"].load_shoe(shoe_id, app_module.DB["inventory"].to_nested(shoe_id))
+    db["orders"] = OrderStore(dict(app_module.DB["orders"].items()))
+    return db
+
+
+def new_order():
+    return {"customer_id": "CUST001", "shoe_id": "SHOE001", "size": 9, "color": "red", "status": "PLACED",
+            "shipping_address": ADDRESS, "payment_method": "COD", "created_at": "2024-01-01T00:00:00"}
+
+
+def run(threads, ops, fn):
+    per_thread = ops // threads
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(seed):
+        rng = random.Random(seed)
+        barrier.wait()
+        for _ in range(per_thread):
+            fn(rng)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for t in pool:
+        t.join()
+    return per_thread * threads / (time.perf_counter() - started)
+
+
+def workloads(repo, order_ids):
+    shoe_ids = list(repo.all_shoes())
+
+    def read(rng):
+        shoe_id = rng.choice(shoe_ids)
+        repo.get_shoe(shoe_id)
+        repo.is_available(shoe_id, "black", 9)
+        repo.get_order(rng.choice(order_ids))
+
+    def create(rng):
+        repo.create_order(new_order())
+
+    def update(rng):
+        color = rng.choice(("red", "black", "white"))
+        repo.update_order(rng.choice(order_ids), lambda o: dict(o, color=color))
+
+    return {"read (shoe+availability+order)": read, "create_order": create, "update_order": update}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=20000)
+    parser.add_argument("--orders", type=int, default=10000, help="orders preloaded before measuring")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="shoehub-bench-")
+    sqlite_repo = SqliteRepository(os.path.join(tmpdir, "bench.db"))
+    sqlite_repo.seed(fresh_db())
+    backends = [InMemoryRepository(fresh_db()), sqlite_repo]
+
+    print(f"threads={args.threads} ops={args.ops} preloaded_orders={args.orders}")
+    print(f"{'workload':34} " + " ".join(f"{b.name:>14}" for b in backends))
+    results = {}
+    for repo in backends:
+        order_ids = [repo.create_order(new_order()) for _ in range(args.orders)]
+        for name, fn in workloads(repo, order_ids).items():
+            results.setdefault(name, []).append(run(args.threads, args.ops, fn))
+        repo.close()
+    for name, rates in results.items():
+        print(f"{name:34} " + " ".join(f"{rate:>10.0f} op/s" for rate in rates))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,489 @@
+"""
+Load test: replay a weighted request mix against every route and report
+requests/s and p50/p95/p99 latency per route.
+
+    python bench/loadtest.py --mode inprocess --concurrency 8 --duration 20
+    python bench/loadtest.py --mode http --concurrency 32 --shoes 100000 --orders 1000000
+    python bench/loadtest.py --mode http --url http://127.0.0.1:8080 --mix recorded.jsonl
+
+Modes:
+  inprocess  Flask test client, one per worker thread; measures handler cost
+             without sockets.
+  http       Keep-alive HTTP clients against waitress. Without --url a
+             waitress server is started in a child process (so client and
+             server do not share a GIL) holding the synthetic data set.
+
+--shoes / --orders add that many synthetic catalog entries and orders on top
+of the demo data before the run, so scan-based handlers show their cost at
+10k-1M rows. Both the in-process app and the child server are loaded with
+the same deterministic data for a given --seed.
+
+--mix replaces the built-in mix with recorded requests, one JSON object per
+line: {"method": "GET", "path": "/api/...", "json": {...}, "weight": 1,
+"route": "label"}; only "path" is required.
+
+The run first discovers shoe ids and names through /api/shoes/query and
+places a batch of orders, so the mix can address real entities whatever
+the server holds.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from urllib.parse import quote, urlencode, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ADDRESS = {"name": "Load Test", "line1": "1 Bench Rd", "line2": "Unit 2", "city": "Leeds", "state": "West Yorkshire",
+           "pincode": "LS1 1AA", "phone": "+44 7000 000000"}
+COLORS = ["red", "white", "black", "navy", "brown", "blue", "beige", "gray", "gold", "silver", "green", "pink"]
+SIZES = [5, 6, 7, 8, 9, 10, 11, 12]
+BRANDS = ["ShoeHub", "Stride", "Pace", "Northwind", "Trailcraft", "Urbanfoot", "Kinetic", "Loom"]
+STYLES = ["Running", "Trail", "Walking", "Casual", "Formal", "Court", "Hiking", "Training", "Slip-On", "High-Top"]
+NOUNS = ["Shoes", "Sneakers", "Trainers", "Boots", "Loafers", "Runners", "Oxfords", "Flats"]
+ADJECTIVES = ["Classic", "Urban", "Ultra", "Lightweight", "Premium", "Everyday", "Performance", "Vintage", "Cloud",
+              "Rapid", "Alpine", "Coastal", "Midnight", "Summit", "Velocity", "Heritage"]
+MATERIALS = ["Breathable mesh", "EVA midsole", "Canvas upper", "Rubber outsole", "Genuine leather", "Memory foam",
+             "Suede", "Knit upper", "Gore-Tex lining", "Carbon plate"]
+ADVANTAGES = ["Lightweight", "Durable", "Comfort fit", "Water resistant", "Good grip", "Breathable", "Stylish",
+              "Good support", "Easy to clean", "Vegan"]
+IMAGES = ["Shoe 1.jfif", "Shoe 2.jfif", "Shoe 3.jfif", "Shoe 4.jfif", "Shoe 5.jfif", "Shoe 6.jfif", "Shoe 6.avif",
+          "Shoe 7.avif", "Shoe 8.avif", "Shoe 9.jfif"]
+PAGE = 100
+
+
+# ----------------------------
+# Synthetic data
+# ----------------------------
+def synthetic_shoe(rng, n):
+    colors = rng.sample(COLORS, rng.randint(2, 4))
+    sizes = sorted(rng.sample(SIZES, rng.randint(3, 6)))
+    name = f"{rng.choice(ADJECTIVES)} {rng.choice(STYLES)} {rng.choice(NOUNS)} {n}"
+    shoe = {
+        "name": name,
+        "brand": rng.choice(BRANDS),
+        "image": f"/images/{IMAGES[n % len(IMAGES)]}",
+        "base_price": rng.randrange(2999, 24999, 100),
+        "discount_percent": rng.choice([0, 5, 10, 12, 15, 20, 25, 30]),
+        "rating": round(rng.uniform(3.0, 5.0), 1),
+        "colors": colors,
+        "sizes": sizes,
+        "materials": rng.sample(MATERIALS, 2),
+        "advantages": rng.sample(ADVANTAGES, 3),
+        "description": f"{name} built for {rng.choice(STYLES).lower()} with {rng.choice(MATERIALS).lower()}.",
+    }
+    inventory = {color: {size: rng.random() < 0.8 for size in sizes} for color in colors}
+    return shoe, inventory
+
+
+def load_synthetic(app_module, shoes, orders, seed):
+    """Bulk-load synthetic shoes and orders into the app's repository."""
+    rng = random.Random(seed)
+    repo = app_module.repo
+    started = time.perf_counter()
+    shoe_ids = list(repo.all_shoes())
+    for n in range(shoes):
+        shoe_id = f"SYN{n:07d}"
+        shoe, inventory = synthetic_shoe(rng, n)
+        repo.upsert_shoe(shoe_id, shoe, inventory)
+        shoe_ids.append(shoe_id)
+    if shoes:
+        app_module.rebuild_catalog_indexes()
+    catalog_done = time.perf_counter()
+
+    customers = ["CUST001", "CUST002", "CUST003"]
+    for n in range(orders):
+        shoe_id = rng.choice(shoe_ids)
+        shoe = repo.get_shoe(shoe_id)
+        repo.put_order(f"ORD{900000000 + n}", {
+            "customer_id": rng.choice(customers), "shoe_id": shoe_id, "size": rng.choice(shoe["sizes"]),
+            "color": rng.choice(shoe["colors"]), "status": "PLACED", "shipping_address": dict(ADDRESS),
+            "payment_method": rng.choice(["COD", "CARD"]),
+            "created_at": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T12:00:00",
+        })
+    finished = time.perf_counter()
+    if shoes or orders:
+        print(f"loaded {shoes} synthetic shoes in {catalog_done - started:.1f}s and "
+              f"{orders} orders in {finished - catalog_done:.1f}s", file=sys.stderr)
+
+
+def import_app(args):
+    os.environ["SHOEHUB_RESPONSE_CACHE_SIZE"] = str(args.cache_size)
+    os.environ.setdefault("SHOEHUB_SLOW_REQUEST_MS", "0")
+    # Measure the handlers, not the per-client rate limits (see bench_admission.py)
+    os.environ.setdefault("SHOEHUB_ADMISSION", "off")
+    import main as app_module
+    app_module.app.logger.disabled = True
+    load_synthetic(app_module, args.shoes, args.orders, args.seed)
+    return app_module
+
+
+# ----------------------------
+# Clients
+# ----------------------------
+class TestClientTransport:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body):
+        response = self.client.open(path, method=method, json=body)
+        response.get_data()
+        response.close()
+        return response.status_code
+
+
+class HttpTransport:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.conn = None
+
+    def request(self, method, path, body):
+        headers = {"Accept-Encoding": "gzip"}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        for attempt in (1, 2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                self.conn.request(method, quote(path, safe="/?=&,:+%"), body=payload, headers=headers)
+                response = self.conn.getresponse()
+                response.read()
+                return response.status
+            except (http.client.HTTPException, OSError):
+                self.conn.close()
+                self.conn = None
+                if attempt == 2:
+                    raise
+
+
+# ----------------------------
+# Request mix
+# ----------------------------
+def discover(transport, rng, sample_shoes, orders_to_place):
+    """Collect shoe ids/names/colors/sizes via the query API and place orders to mutate later."""
+    client_get = getattr(transport, "client", None)
+
+    def get_json(path):
+        if client_get is not None:
+            return client_get.get(path).get_json()
+        conn = http.client.HTTPConnection(transport.host, transport.port, timeout=60)
+        try:
+            conn.request("GET", path)
+            return json.loads(conn.getresponse().read())
+        finally:
+            conn.close()
+
+    first = get_json(f"/api/shoes/query?limit={PAGE}&facets=false")
+    total = first["total"]
+    shoes = {s["shoe_id"]: s for s in first["results"]}
+    pages = max(1, (total + PAGE - 1) // PAGE)
+    for page in rng.sample(range(pages), min(pages, sample_shoes // PAGE)):
+        for s in get_json(f"/api/shoes/query?limit={PAGE}&offset={page * PAGE}&facets=false")["results"]:
+            shoes[s["shoe_id"]] = s
+
+    shoes = list(shoes.values())
+    terms = sorted({word.lower() for s in shoes for word in s["name"].split() if not word.isdigit()}
+                   | {s["brand"].lower() for s in shoes})
+    ctx = {"shoes": shoes, "terms": terms, "orders": [], "total_shoes": total}
+    by_id = {s["shoe_id"]: s for s in shoes}
+    for _ in range(orders_to_place):
+        method, path, body = order_create(rng, ctx)
+        body["customer_id"] = "CUST001"  # golden members may change colour later
+        if client_get is not None:
+            data = client_get.post(path, json=body).get_json()
+        else:
+            conn = http.client.HTTPConnection(transport.host, transport.port, timeout=60)
+            conn.request(method, path, body=json.dumps(body), headers={"Content-Type": "application/json"})
+            data = json.loads(conn.getresponse().read())
+            conn.close()
+        if data.get("ok") and data.get("order_id"):
+            ctx["orders"].append((data["order_id"], by_id[body["shoe_id"]]))
+    return ctx
+
+
+def typo(rng, name):
+    i = rng.randrange(len(name))
+    return name[:i] + name[i + 1:]
+
+
+def search(rng, ctx):
+    words = rng.sample(ctx["terms"], rng.choice([1, 1, 2]))
+    return "GET", "/api/shoes/search?" + urlencode({"query": " ".join(words), "limit": 20}), None
+
+
+def query(rng, ctx):
+    params = {"min_price": rng.randrange(0, 8000, 500), "max_price": rng.randrange(8000, 25000, 500),
+              "sort": rng.choice(["price", "-price", "-rating", "-discount"]), "limit": 20}
+    if rng.random() < 0.5:
+        params["colors"] = ",".join(rng.sample(COLORS, 2))
+    if rng.random() < 0.3:
+        params["sizes"] = str(rng.choice(SIZES))
+    if rng.random() < 0.5:
+        params["facets"] = "false"
+    return "GET", "/api/shoes/query?" + urlencode(params), None
+
+
+def details(rng, ctx):
+    name = rng.choice(ctx["shoes"])["name"]
+    if rng.random() < 0.2:
+        return "GET", "/api/shoes/details?" + urlencode({"name": typo(rng, name), "fuzzy": "true"}), None
+    return "GET", "/api/shoes/details?" + urlencode({"name": name}), None
+
+
+def availability(rng, ctx):
+    ids = [s["shoe_id"] for s in rng.sample(ctx["shoes"], min(10, len(ctx["shoes"])))]
+    return "GET", "/api/inventory/availability?shoe_ids=" + ",".join(ids), None
+
+
+def compare_pair(rng, ctx):
+    a, b = rng.sample(ctx["shoes"], 2)
+    return "POST", "/api/compare-or-order", {"action": "compare", "shoe_name_a": a["name"], "shoe_name_b": b["name"]}
+
+
+def compare_many(rng, ctx):
+    ids = [s["shoe_id"] for s in rng.sample(ctx["shoes"], min(5, len(ctx["shoes"])))]
+    return "POST", "/api/compare-or-order", {"action": "compare", "shoe_ids": ids}
+
+
+def order_create(rng, ctx):
+    shoe = rng.choice(ctx["shoes"])
+    return "POST", "/api/compare-or-order", {
+        "action": "order", "shoe_id": shoe["shoe_id"], "color": rng.choice(shoe["colors"]),
+        "size": rng.choice(shoe["sizes"]), "shipping_address": ADDRESS,
+        "customer_id": rng.choice(["CUST001", "CUST002", "CUST003"]), "payment_method": "COD"}
+
+
+def order_change(rng, ctx):
+    order_id, shoe = rng.choice(ctx["orders"])
+    # Mostly colours the shoe comes in; the rest exercise the rejection path
+    color = rng.choice(shoe["colors"]) if rng.random() < 0.8 else rng.choice(COLORS)
+    return "POST", "/api/order-change", {"order_id": order_id, "new_color": color}
+
+
+def address_update(rng, ctx):
+    return "POST", "/api/address-update", {"order_id": rng.choice(ctx["orders"])[0],
+                                           "new_address": dict(ADDRESS, line2=f"Unit {rng.randint(1, 99)}")}
+
+
+def simple_get(rng, ctx):
+    return "GET", "/api/simple-get", None
+
+
+def image(rng, ctx):
+    name = rng.choice(IMAGES)
+    if rng.random() < 0.5:
+        return "GET", f"/images/{name}?width={rng.choice([160, 320, 640])}&format=auto", None
+    return "GET", f"/images/{name}", None
+
+
+def spa(rng, ctx):
+    return "GET", rng.choice(["/", "/shoes", "/api-tester.html"]), None
+
+
+# (route label, weight, builder)
+DEFAULT_MIX = [
+    ("shoes/search", 20, search),
+    ("shoes/query", 12, query),
+    ("shoes/details", 15, details),
+    ("inventory/availability", 8, availability),
+    ("compare (pair)", 5, compare_pair),
+    ("compare (n-way)", 5, compare_many),
+    ("order (create)", 8, order_create),
+    ("order-change", 6, order_change),
+    ("address-update", 4, address_update),
+    ("simple-get", 2, simple_get),
+    ("images", 5, image),
+    ("spa shell", 3, spa),
+]
+
+
+def recorded_mix(path):
+    mix = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            method = rec.get("method", "POST" if "json" in rec else "GET").upper()
+            label = rec.get("route") or urlsplit(rec["path"]).path
+            mix.append((label, rec.get("weight", 1), lambda rng, ctx, r=(method, rec["path"], rec.get("json")): r))
+    return mix
+
+
+# ----------------------------
+# Runner
+# ----------------------------
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(p / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def run(make_transport, mix, ctx, concurrency, duration, max_requests, seed, warmup):
+    labels = [label for label, _, _ in mix]
+    weights = [weight for _, weight, _ in mix]
+    builders = {label: build for label, _, build in mix}
+    if not ctx["orders"]:
+        labels_weights = [(lb, w) for lb, w in zip(labels, weights) if lb not in ("order-change", "address-update")]
+        labels, weights = [lb for lb, _ in labels_weights], [w for _, w in labels_weights]
+
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    errors = Counter()
+    lock = threading.Lock()
+    issued = [0]
+    deadline = [None]
+    clock = [None]
+
+    def start_clock():
+        # Runs once every worker has warmed up, before any is released
+        clock[0] = time.perf_counter()
+        deadline[0] = clock[0] + duration
+
+    barrier = threading.Barrier(concurrency + 1, action=start_clock)
+
+    def worker(w):
+        rng = random.Random(seed * 1000 + w)
+        transport = make_transport()
+        for _ in range(warmup):
+            label = rng.choices(labels, weights)[0]
+            transport.request(*builders[label](rng, ctx))
+        local_lat = defaultdict(list)
+        local_status = defaultdict(Counter)
+        local_errors = Counter()
+        barrier.wait()
+        while time.perf_counter() < deadline[0]:
+            if max_requests:
+                with lock:
+                    if issued[0] >= max_requests:
+                        break
+                    issued[0] += 1
+            label = rng.choices(labels, weights)[0]
+            method, path, body = builders[label](rng, ctx)
+            started = time.perf_counter()
+            try:
+                status = transport.request(method, path, body)
+            except Exception as e:  # transport failure counts as an error, keep going
+                local_errors[(label, type(e).__name__)] += 1
+                continue
+            local_lat[label].append(time.perf_counter() - started)
+            local_status[label][status] += 1
+        with lock:
+            for label, values in local_lat.items():
+                latencies[label].extend(values)
+            for label, counts in local_status.items():
+                statuses[label].update(counts)
+            errors.update(local_errors)
+
+    threads = [threading.Thread(target=worker, args=(w,), daemon=True) for w in range(concurrency)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - clock[0], latencies, statuses, errors
+
+
+def report(title, elapsed, latencies, statuses, errors):
+    total = sum(len(v) for v in latencies.values())
+    print(f"\n{title}: {total} requests in {elapsed:.1f}s = {total / elapsed:.0f} req/s")
+    print(f"{'route':<24} {'count':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}  statuses")
+    for label in sorted(latencies, key=lambda lb: -len(latencies[lb])):
+        values = sorted(latencies[label])
+        codes = " ".join(f"{code}:{n}" for code, n in sorted(statuses[label].items()))
+        print(f"{label:<24} {len(values):>7} {len(values) / elapsed:>8.0f} {percentile(values, 50) * 1000:>8.2f} "
+              f"{percentile(values, 95) * 1000:>8.2f} {percentile(values, 99) * 1000:>8.2f} "
+              f"{values[-1] * 1000:>8.2f}  {codes}")
+    server_errors = sum(n for counts in statuses.values() for code, n in counts.items() if code >= 500)
+    if errors or server_errors:
+        print(f"errors: {server_errors} 5xx responses, transport failures: {dict(errors)}")
+
+
+# ----------------------------
+# HTTP server (child process)
+# ----------------------------
+def serve(args):
+    from waitress import create_server
+    app_module = import_app(args)
+    server = create_server(app_module.app, host="127.0.0.1", port=args.port, threads=args.server_threads,
+                           connection_limit=max(100, args.concurrency * 2))
+    print(f"READY {server.effective_port}", flush=True)
+    server.run()
+
+
+def start_server(args):
+    cmd = [sys.executable, os.path.abspath(__file__), "--serve", "--port", "0",
+           "--shoes", str(args.shoes), "--orders", str(args.orders), "--seed", str(args.seed),
+           "--cache-size", str(args.cache_size), "--server-threads", str(args.server_threads),
+           "--concurrency", str(args.concurrency)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    for line in proc.stdout:
+        if line.startswith("READY"):
+            return proc, int(line.split()[1])
+    raise SystemExit("load test server exited before becoming ready")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["inprocess", "http", "both"], default="both")
+    parser.add_argument("--url", help="existing server to target in http mode (no synthetic data is loaded)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per mode")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many requests (0 = no limit)")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per worker")
+    parser.add_argument("--shoes", type=int, default=0, help="synthetic catalog entries to add")
+    parser.add_argument("--orders", type=int, default=0, help="synthetic orders to add")
+    parser.add_argument("--sample-shoes", type=int, default=2000, help="shoes to discover for the mix")
+    parser.add_argument("--place-orders", type=int, default=200, help="orders to create for update traffic")
+    parser.add_argument("--cache-size", type=int, default=4096, help="response cache entries (0 disables)")
+    parser.add_argument("--server-threads", type=int, default=16, help="waitress threads for the child server")
+    parser.add_argument("--mix", help="JSONL file of recorded requests to replay instead of the built-in mix")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args)
+
+    mix = recorded_mix(args.mix) if args.mix else DEFAULT_MIX
+    rng = random.Random(args.seed)
+
+    if args.mode in ("inprocess", "both") and not args.url:
+        app_module = import_app(args)
+        ctx = discover(TestClientTransport(app_module.app), rng, args.sample_shoes, args.place_orders)
+        result = run(lambda: TestClientTransport(app_module.app), mix, ctx, args.concurrency, args.duration,
+                     args.requests, args.seed, args.warmup)
+        report(f"in-process x{args.concurrency} ({ctx['total_shoes']} shoes)", *result)
+
+    if args.mode in ("http", "both"):
+        proc = None
+        if args.url:
+            parts = urlsplit(args.url)
+            host, port = parts.hostname, parts.port or 80
+        else:
+            proc, port = start_server(args)
+            host = "127.0.0.1"
+        try:
+            ctx = discover(HttpTransport(host, port), rng, args.sample_shoes, args.place_orders)
+            result = run(lambda: HttpTransport(host, port), mix, ctx, args.concurrency, args.duration,
+                         args.requests, args.seed, args.warmup)
+            report(f"http x{args.concurrency} against {host}:{port} ({ctx['total_shoes']} shoes)", *result)
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait()
+
+
+if __name__ == "__main__":
+    main()
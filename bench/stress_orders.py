@@ -0,0 +1,139 @@
+"""
+Concurrency stress check for the order store.
+
+Hammers /api/compare-or-order (order creation), /api/order-change and
+/api/address-update from many threads through the Flask test client and
+verifies that no order id was handed out twice and no update was lost.
+
+    python bench/stress_orders.py --threads 64 --orders-per-thread 100
+
+Exits non-zero if any invariant is violated.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# One client hammering the write routes on purpose; rate limits would only get in the way
+os.environ.setdefault("SHOEHUB_ADMISSION", "off")
+
+from main import app, DB  # noqa: E402
+
+ADDRESS = {
+    "name": "Stress Test", "line1": "1 Load St", "line2": "", "city": "Bench",
+    "state": "CI", "pincode": "000000", "phone": "+00 0000"
+}
+
+
+def create_orders(client, count, created, errors):
+    for _ in range(count):
+        res = client.post("/api/compare-or-order", json={
+            "action": "order", "shoe_id": "SHOE001", "color": "red", "size": 9,
+            "shipping_address": ADDRESS, "customer_id": "CUST001"
+        })
+        body = res.get_json()
+        if res.status_code != 200 or not body.get("ok"):
+            errors.append(("create", res.status_code, body))
+            continue
+        created.append(body["order_id"])
+
+
+def update_orders(client, order_ids, worker, rounds, errors):
+    # Each worker owns a disjoint slice of orders and writes a known final value
+    for i in range(rounds):
+        for order_id in order_ids:
+            address = dict(ADDRESS, line2=f"worker-{worker}-round-{i}")
+            res = client.post("/api/address-update", json={"order_id": order_id, "new_address": address})
+            if res.status_code != 200:
+                errors.append(("address", res.status_code, res.get_json()))
+            color = "red" if i % 2 else "black"
+            res = client.post("/api/order-change", json={"order_id": order_id, "new_color": color})
+            if res.status_code != 200:
+                errors.append(("change", res.status_code, res.get_json()))
+
+
+def contended_updates(client, order_id, threads, rounds, errors):
+    # All threads hit one order; color and address must end up from the same write
+    def run(worker):
+        for i in range(rounds):
+            address = dict(ADDRESS, line2=f"w{worker}-{i}")
+            res = client.post("/api/order-change", json={"order_id": order_id, "new_color": "white" if i % 2 else "black", "new_address": address})
+            if res.status_code not in (200, 409):
+                errors.append(("contended", res.status_code, res.get_json()))
+    pool = [threading.Thread(target=run, args=(w,)) for w in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    order = DB["orders"][order_id]
+    round_no = int(order["shipping_address"]["line2"].rsplit("-", 1)[1])
+    if order["color"] != ("white" if round_no % 2 else "black"):
+        errors.append(("contended", "torn write", order))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--orders-per-thread", type=int, default=100)
+    parser.add_argument("--update-rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    sys.setswitchinterval(1e-6)  # force frequent thread switches to surface races
+    client = app.test_client()
+    before = len(DB["orders"])
+    created, errors = [], []
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=create_orders, args=(client, args.orders_per_thread, created, errors))
+            for _ in range(args.threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    create_secs = time.perf_counter() - started
+
+    expected = args.threads * args.orders_per_thread
+    failures = []
+    if len(created) != expected:
+        failures.append(f"created {len(created)} orders, expected {expected}")
+    if len(set(created)) != len(created):
+        failures.append(f"{len(created) - len(set(created))} duplicate order ids handed out")
+    if len(DB["orders"]) != before + len(set(created)):
+        failures.append(f"store holds {len(DB['orders']) - before} new orders, expected {len(set(created))}")
+
+    slices = [created[w::args.threads] for w in range(args.threads)]
+    started = time.perf_counter()
+    pool = [threading.Thread(target=update_orders, args=(client, slices[w], w, args.update_rounds, errors))
+            for w in range(args.threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    update_secs = time.perf_counter() - started
+
+    last = args.update_rounds - 1
+    final_color = "red" if last % 2 else "black"
+    for w, order_ids in enumerate(slices):
+        for order_id in order_ids:
+            order = DB["orders"][order_id]
+            if order["shipping_address"]["line2"] != f"worker-{w}-round-{last}" or order["color"] != final_color:
+                failures.append(f"lost update on {order_id}: {order['color']} / {order['shipping_address']['line2']}")
+                break
+
+    contended_updates(client, "ORD1001", args.threads, args.update_rounds * 4, errors)
+
+    failures.extend(f"request failed: {e}" for e in errors[:10])
+    print(f"threads={args.threads} orders={len(created)} "
+          f"create={len(created) / create_secs:.0f} req/s "
+          f"update={2 * args.update_rounds * len(created) / update_secs:.0f} req/s")
+    if failures:
+        for failure in failures:
+            print("FAIL:", failure)
+        sys.exit(1)
+    print("OK: no duplicate ids, no lost updates")
+
+
+if __name__ == "__main__":
+    main()
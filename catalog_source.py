@@ -0,0 +1,294 @@
+import csv
+import gc
+import json
+import os
+import re
+import threading
+import time
+
+from columnar import ColumnarCatalog
+from json_provider import FragmentCache
+from name_index import NameIndex
+from recommendations import DEFAULT_TOP_K, refresh_similar
+from search_index import SearchIndex
+
+# CSV columns; list cells are "|"-separated, `unavailable` lists color:size cells that are out of stock
+CSV_COLUMNS = ("shoe_id", "name", "brand", "image", "base_price", "discount_percent", "rating", "colors",
+               "sizes", "materials", "advantages", "description", "unavailable")
+LIST_SEPARATOR = "|"
+DEFAULT_POLL_SECONDS = 2.0
+# Generation-0 GC threshold while a reload is being built (Python's default is 700)
+BUILD_GC_THRESHOLD = 100000
+
+OPTIONAL_FIELDS = {"brand": "", "image": "", "rating": 0, "materials": [], "advantages": [], "description": ""}
+
+
+class CatalogError(ValueError):
+    """The catalog file could not be parsed or a shoe in it is malformed."""
+
+
+def _number(shoe_id, field, value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise CatalogError(f"{shoe_id}: {field} must be a number")
+    return value
+
+
+def check_shoe(shoe_id, shoe):
+    """Validate one catalog entry and fill in optional fields; returns the shoe."""
+    if not isinstance(shoe, dict):
+        raise CatalogError(f"{shoe_id}: entry must be an object")
+    if not isinstance(shoe.get("name"), str) or not shoe["name"].strip():
+        raise CatalogError(f"{shoe_id}: name is required")
+    _number(shoe_id, "base_price", shoe.get("base_price"))
+    if not 0 <= _number(shoe_id, "discount_percent", shoe.get("discount_percent")) <= 100:
+        raise CatalogError(f"{shoe_id}: discount_percent must be between 0 and 100")
+    colors, sizes = shoe.get("colors"), shoe.get("sizes")
+    if not isinstance(colors, list) or not colors or not all(isinstance(c, str) and c for c in colors):
+        raise CatalogError(f"{shoe_id}: colors must be a non-empty list of strings")
+    if not isinstance(sizes, list) or not sizes or not all(isinstance(s, int) and not isinstance(s, bool)
+                                                            for s in sizes):
+        raise CatalogError(f"{shoe_id}: sizes must be a non-empty list of integers")
+    for field, default in OPTIONAL_FIELDS.items():
+        if field not in shoe:
+            shoe[field] = list(default) if isinstance(default, list) else default
+    return shoe
+
+
+def full_stock(shoe):
+    return {color: {size: True for size in shoe["sizes"]} for color in shoe["colors"]}
+
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def _decode_object(text, pos, stream_keys=()):
+    """
+    Decode the JSON object at text[pos] one member at a time (and the
+    members named in stream_keys one level deeper), returning (dict, end).
+
+    json.loads on a large catalog is a single C call that holds the GIL for
+    seconds, stalling every request thread; decoding per member lets the
+    interpreter switch threads between shoes.
+    """
+    pos = _WHITESPACE.match(text, pos).end()
+    if not text.startswith("{", pos):
+        raise ValueError(f"expected an object at offset {pos}")
+    result = {}
+    pos = _WHITESPACE.match(text, pos + 1).end()
+    if text.startswith("}", pos):
+        return result, pos + 1
+    while True:
+        key, pos = _decoder.raw_decode(text, pos)
+        if not isinstance(key, str):
+            raise ValueError(f"expected a string key at offset {pos}")
+        pos = _WHITESPACE.match(text, pos).end()
+        if not text.startswith(":", pos):
+            raise ValueError(f"expected ':' at offset {pos}")
+        pos = _WHITESPACE.match(text, pos + 1).end()
+        if key in stream_keys:
+            result[key], pos = _decode_object(text, pos)
+        else:
+            result[key], pos = _decoder.raw_decode(text, pos)
+        pos = _WHITESPACE.match(text, pos).end()
+        if text.startswith(",", pos):
+            pos = _WHITESPACE.match(text, pos + 1).end()
+        elif text.startswith("}", pos):
+            return result, pos + 1
+        else:
+            raise ValueError(f"expected ',' or '}}' at offset {pos}")
+
+
+def load_json(path):
+    """
+    {"shoes": {shoe_id: shoe}, "inventory": {shoe_id: {color: {size: bool}}}}.
+    Shoes missing from "inventory" are fully in stock.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        doc, end = _decode_object(text, 0, stream_keys=("shoes", "inventory"))
+        if text[end:].strip():
+            raise ValueError(f"extra data at offset {end}")
+    except ValueError as e:
+        raise CatalogError(f"{path}: {e}") from None
+    if not isinstance(doc.get("shoes"), dict):
+        raise CatalogError(f"{path}: expected an object with a \"shoes\" object")
+    listed = doc.get("inventory") or {}
+    shoes, inventory = {}, {}
+    for shoe_id, shoe in doc["shoes"].items():
+        shoes[shoe_id] = check_shoe(shoe_id, shoe)
+        by_color = listed.get(shoe_id)
+        if by_color is None:
+            inventory[shoe_id] = full_stock(shoe)
+            continue
+        try:
+            # JSON object keys are strings; sizes are ints everywhere else
+            inventory[shoe_id] = {color: {int(size): bool(ok) for size, ok in by_size.items()}
+                                  for color, by_size in by_color.items()}
+        except (AttributeError, TypeError, ValueError):
+            raise CatalogError(f"{shoe_id}: inventory must be {{color: {{size: bool}}}}") from None
+    return shoes, inventory
+
+
+def _split(cell):
+    return [part.strip() for part in cell.split(LIST_SEPARATOR) if part.strip()] if cell else []
+
+
+def load_csv(path):
+    """One row per shoe with CSV_COLUMNS; every color x size not listed in `unavailable` is in stock."""
+    shoes, inventory = {}, {}
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        missing = {"shoe_id", "name", "base_price", "discount_percent", "colors", "sizes"} - set(reader.fieldnames or ())
+        if missing:
+            raise CatalogError(f"{path}: missing columns {', '.join(sorted(missing))}")
+        for line, row in enumerate(reader, start=2):
+            shoe_id = (row.get("shoe_id") or "").strip()
+            if not shoe_id:
+                raise CatalogError(f"{path}:{line}: shoe_id is required")
+            try:
+                shoe = {
+                    "name": row["name"].strip(),
+                    "brand": (row.get("brand") or "").strip(),
+                    "image": (row.get("image") or "").strip(),
+                    "base_price": int(row["base_price"]),
+                    "discount_percent": int(row["discount_percent"]),
+                    "rating": float(row.get("rating") or 0),
+                    "colors": _split(row["colors"]),
+                    "sizes": [int(size) for size in _split(row["sizes"])],
+                    "materials": _split(row.get("materials")),
+                    "advantages": _split(row.get("advantages")),
+                    "description": (row.get("description") or "").strip(),
+                }
+                out = [cell.split(":", 1) for cell in _split(row.get("unavailable"))]
+                out = {(color.strip(), int(size)) for color, size in out}
+            except (TypeError, ValueError):
+                raise CatalogError(f"{path}:{line}: malformed number or color:size cell") from None
+            shoes[shoe_id] = check_shoe(shoe_id, shoe)
+            inventory[shoe_id] = {color: {size: (color, size) not in out for size in shoe["sizes"]}
+                                  for color in shoe["colors"]}
+    return shoes, inventory
+
+
+def load_catalog(path):
+    """(shoes, inventory) from a .json or .csv catalog file."""
+    if path.lower().endswith(".csv"):
+        return load_csv(path)
+    return load_json(path)
+
+
+class CatalogSnapshot:
+    """
+    One version of the catalog together with every index derived from it.
+    Request handlers take a reference once and read only through it, so a
+    concurrent reload can never show them an index built from one catalog
+    and shoe documents from another. A published snapshot is never changed:
+    every catalog change builds a new one and publishes it in one swap.
+
+    Given the `previous` snapshot, the similar-shoes lists are carried over
+    and patched with the shoes that changed instead of being rebuilt, which
+    is quadratic in the catalog size. Encoded per-shoe JSON fragments are
+    built on demand and belong to the snapshot, so a reload starts empty.
+    """
+
+    __slots__ = ("shoes", "search_index", "name_index", "columnar", "similar", "fragments", "source",
+                 "build_seconds")
+
+    def __init__(self, shoes, source=None, previous=None, similar_k=DEFAULT_TOP_K):
+        started = time.perf_counter()
+        self.shoes = shoes
+        self.search_index = SearchIndex(shoes)
+        self.name_index = NameIndex(shoes)
+        self.columnar = ColumnarCatalog(shoes)
+        if previous is None:
+            self.similar = refresh_similar(None, None, shoes, k=similar_k)
+        else:
+            self.similar = refresh_similar(previous.similar, previous.shoes, shoes, k=similar_k)
+        self.fragments = FragmentCache()
+        self.source = source
+        self.build_seconds = time.perf_counter() - started
+
+    def get_shoe(self, shoe_id):
+        return self.shoes.get(shoe_id)
+
+    def get_shoes(self, shoe_ids):
+        shoes = self.shoes
+        return {sid: shoes[sid] for sid in shoe_ids if sid in shoes}
+
+    def __len__(self):
+        return len(self.shoes)
+
+
+class CatalogWatcher:
+    """
+    Polls a catalog file and hands each new version to on_change(shoes,
+    inventory, path) from a background thread.
+
+    A change is any difference in (mtime, size, inode), so writers should
+    replace the file atomically (write elsewhere, then rename). A version
+    that fails to parse is logged and skipped; the last good catalog keeps
+    serving until the file changes again.
+    """
+
+    def __init__(self, path, on_change, interval=DEFAULT_POLL_SECONDS, logger=None):
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self.logger = logger
+        self._seen = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_error = None
+        self.stats = {"reloads": 0, "errors": 0, "last_reload_seconds": 0.0}
+
+    def _signature(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def check(self):
+        """Reload if the file changed since the last check; returns True if a new catalog was published."""
+        signature = self._signature()
+        if signature == self._seen:
+            return False
+        self._seen = signature
+        started = time.perf_counter()
+        # Building a catalog allocates millions of objects, which would set off
+        # repeated full collections that hold the GIL for up to seconds and
+        # stall every request thread. The thresholds are process-wide, so
+        # rather than turning the collector off for everyone, make it run
+        # far less often while the build lasts.
+        thresholds = gc.get_threshold()
+        gc.set_threshold(max(thresholds[0], BUILD_GC_THRESHOLD), *thresholds[1:])
+        try:
+            shoes, inventory = load_catalog(self.path)
+            self.on_change(shoes, inventory, self.path)
+        finally:
+            gc.set_threshold(*thresholds)
+        self.stats["last_reload_seconds"] = time.perf_counter() - started
+        self.stats["reloads"] += 1
+        self.last_error = None
+        return True
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._poll, name="catalog-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _poll(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if self.check() and self.logger is not None:
+                    self.logger.info("Catalog reloaded from %s in %.2fs", self.path, self.stats["last_reload_seconds"])
+            except Exception as e:  # keep polling; the last good catalog stays published
+                self.stats["errors"] += 1
+                self.last_error = str(e)
+                if self.logger is not None:
+                    self.logger.warning("Catalog reload failed: %s", e)
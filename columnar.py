@@ -0,0 +1,290 @@
+import threading
+
+import numpy as np
+
+INITIAL_CAPACITY = 64
+
+# Upper edges of the price facet buckets, in the catalog's base currency
+PRICE_BAND_EDGES = (5000, 7500, 10000, 12500, 15000)
+RATING_THRESHOLDS = (4.5, 4.0, 3.5, 3.0)
+
+# Sortable columns by query name
+SORT_COLUMNS = {
+    "price": "discounted_price",
+    "base_price": "base_price",
+    "discount": "discount_percent",
+    "rating": "rating",
+}
+
+
+def discounted_prices(base_price, discount_percent):
+    # Same rounding as price_after_discount(): half-to-even on the exact value
+    return np.round(base_price * (100 - discount_percent) / 100)
+
+
+def price_band_labels():
+    labels = []
+    lower = 0
+    for upper in PRICE_BAND_EDGES:
+        labels.append(f"{lower}-{upper - 1}")
+        lower = upper
+    labels.append(f"{lower}+")
+    return labels
+
+
+class Vocabulary:
+    """Stable value -> column position mapping for membership masks."""
+
+    def __init__(self):
+        self.values = []
+        self.index = {}
+
+    def code(self, value):
+        pos = self.index.get(value)
+        if pos is None:
+            pos = self.index[value] = len(self.values)
+            self.values.append(value)
+        return pos
+
+    def __len__(self):
+        return len(self.values)
+
+
+class ColumnarCatalog:
+    """
+    Struct-of-arrays view of DB["shoes"] for filter/sort/facet queries.
+
+    Numeric attributes live in parallel NumPy columns; colors, sizes and
+    brand are boolean membership matrices (rows x vocabulary), so a filter
+    is a handful of vectorized comparisons and a facet is one column sum.
+    Rows are tombstoned on removal and reclaimed by compact().
+    """
+
+    def __init__(self, shoes=None):
+        self._lock = threading.RLock()
+        self._colors = Vocabulary()
+        self._sizes = Vocabulary()
+        self._brands = Vocabulary()
+        self._reset(INITIAL_CAPACITY)
+        if shoes:
+            self.build(shoes)
+
+    def _reset(self, capacity):
+        self.n = 0
+        self.ids = []
+        self.rows = {}  # shoe_id -> row
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.base_price = np.zeros(capacity, dtype=np.float64)
+        self.discount_percent = np.zeros(capacity, dtype=np.float64)
+        self.discounted_price = np.zeros(capacity, dtype=np.float64)
+        self.rating = np.zeros(capacity, dtype=np.float64)
+        self.brand = np.full(capacity, -1, dtype=np.int32)
+        self.color_mask = np.zeros((capacity, max(len(self._colors), 8)), dtype=bool)
+        self.size_mask = np.zeros((capacity, max(len(self._sizes), 8)), dtype=bool)
+
+    def build(self, shoes):
+        with self._lock:
+            n = len(shoes)
+            self._reset(max(INITIAL_CAPACITY, n))
+            color_rows, color_cols, size_rows, size_cols = [], [], [], []
+            base, discount, rating, brand = [], [], [], []
+            for row, (shoe_id, shoe) in enumerate(shoes.items()):
+                self.ids.append(shoe_id)
+                self.rows[shoe_id] = row
+                base.append(shoe["base_price"])
+                discount.append(shoe["discount_percent"])
+                rating.append(shoe["rating"])
+                brand.append(self._brands.code(shoe.get("brand")))
+                for c in shoe.get("colors", ()):
+                    color_rows.append(row)
+                    color_cols.append(self._colors.code(c))
+                for s in shoe.get("sizes", ()):
+                    size_rows.append(row)
+                    size_cols.append(self._sizes.code(s))
+
+            self.n = n
+            self.alive[:n] = True
+            self.base_price[:n] = base
+            self.discount_percent[:n] = discount
+            self.discounted_price[:n] = discounted_prices(self.base_price[:n], self.discount_percent[:n])
+            self.rating[:n] = rating
+            self.brand[:n] = brand
+            self.color_mask = self._ensure_cols(self.color_mask, len(self._colors))
+            self.size_mask = self._ensure_cols(self.size_mask, len(self._sizes))
+            self.color_mask[color_rows, color_cols] = True
+            self.size_mask[size_rows, size_cols] = True
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def colors(self):
+        return list(self._colors.values)
+
+    @property
+    def sizes(self):
+        return list(self._sizes.values)
+
+    def _ensure_rows(self, needed):
+        capacity = len(self.alive)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        for name in ("alive", "base_price", "discount_percent", "discounted_price", "rating", "brand"):
+            old = getattr(self, name)
+            grown = np.zeros(new_capacity, dtype=old.dtype) if name != "brand" else np.full(new_capacity, -1, dtype=old.dtype)
+            grown[:capacity] = old
+            setattr(self, name, grown)
+        for name in ("color_mask", "size_mask"):
+            old = getattr(self, name)
+            grown = np.zeros((new_capacity, old.shape[1]), dtype=bool)
+            grown[:capacity] = old
+            setattr(self, name, grown)
+
+    @staticmethod
+    def _ensure_cols(matrix, needed):
+        if needed <= matrix.shape[1]:
+            return matrix
+        grown = np.zeros((matrix.shape[0], max(needed, matrix.shape[1] * 2)), dtype=bool)
+        grown[:, :matrix.shape[1]] = matrix
+        return grown
+
+    def _write_row(self, shoe_id, shoe):
+        row = self.rows.get(shoe_id)
+        if row is None:
+            row = self.n
+            self._ensure_rows(row + 1)
+            self.n += 1
+            self.rows[shoe_id] = row
+            self.ids.append(shoe_id)
+
+        color_codes = [self._colors.code(c) for c in shoe.get("colors", ())]
+        size_codes = [self._sizes.code(s) for s in shoe.get("sizes", ())]
+        self.color_mask = self._ensure_cols(self.color_mask, len(self._colors))
+        self.size_mask = self._ensure_cols(self.size_mask, len(self._sizes))
+
+        self.alive[row] = True
+        self.base_price[row] = shoe["base_price"]
+        self.discount_percent[row] = shoe["discount_percent"]
+        self.discounted_price[row] = discounted_prices(self.base_price[row], self.discount_percent[row])
+        self.rating[row] = shoe["rating"]
+        self.brand[row] = self._brands.code(shoe.get("brand"))
+        self.color_mask[row] = False
+        self.color_mask[row, color_codes] = True
+        self.size_mask[row] = False
+        self.size_mask[row, size_codes] = True
+
+    def add(self, shoe_id, shoe):
+        with self._lock:
+            self._write_row(shoe_id, shoe)
+
+    def remove(self, shoe_id):
+        with self._lock:
+            row = self.rows.pop(shoe_id, None)
+            if row is None:
+                return
+            self.alive[row] = False
+            if self.n > INITIAL_CAPACITY and len(self.rows) < self.n // 2:
+                self._compact()
+
+    def _compact(self):
+        keep = np.flatnonzero(self.alive[:self.n])
+        capacity = max(INITIAL_CAPACITY, len(keep))
+        for name in ("alive", "base_price", "discount_percent", "discounted_price", "rating", "brand",
+                     "color_mask", "size_mask"):
+            old = getattr(self, name)
+            packed = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            if name == "brand":
+                packed.fill(-1)
+            packed[:len(keep)] = old[keep]
+            setattr(self, name, packed)
+        self.ids = [self.ids[r] for r in keep]
+        self.rows = {shoe_id: r for r, shoe_id in enumerate(self.ids)}
+        self.n = len(self.ids)
+
+    def compact(self):
+        with self._lock:
+            self._compact()
+
+    def gather(self, shoe_ids, *columns):
+        """Return one array per requested column, aligned with shoe_ids (None if any id is unknown)."""
+        with self._lock:
+            try:
+                rows = np.fromiter((self.rows[sid] for sid in shoe_ids), dtype=np.intp, count=len(shoe_ids))
+            except KeyError:
+                return None
+            return [getattr(self, name)[rows] for name in columns]
+
+    def _codes(self, vocabulary, values):
+        return [vocabulary.index[v] for v in values if v in vocabulary.index]
+
+    def _filter(self, brands=None, colors=None, sizes=None, min_price=None, max_price=None,
+                min_rating=None, min_discount=None):
+        n = self.n
+        mask = self.alive[:n].copy()
+        if min_price is not None:
+            mask &= self.discounted_price[:n] >= min_price
+        if max_price is not None:
+            mask &= self.discounted_price[:n] <= max_price
+        if min_rating is not None:
+            mask &= self.rating[:n] >= min_rating
+        if min_discount is not None:
+            mask &= self.discount_percent[:n] >= min_discount
+        if brands:
+            mask &= np.isin(self.brand[:n], self._codes(self._brands, brands))
+        if colors:
+            codes = self._codes(self._colors, colors)
+            mask &= self.color_mask[:n, codes].any(axis=1) if codes else False
+        if sizes:
+            codes = self._codes(self._sizes, sizes)
+            mask &= self.size_mask[:n, codes].any(axis=1) if codes else False
+        return mask
+
+    def _facets(self, mask):
+        n = self.n
+        color_counts = self.color_mask[:n][mask].sum(axis=0)
+        size_counts = self.size_mask[:n][mask].sum(axis=0)
+        brand_counts = np.bincount(self.brand[:n][mask], minlength=len(self._brands))
+        bands = np.searchsorted(PRICE_BAND_EDGES, self.discounted_price[:n][mask], side="right")
+        band_counts = np.bincount(bands, minlength=len(PRICE_BAND_EDGES) + 1)
+        ratings = self.rating[:n][mask]
+        return {
+            "colors": {c: int(color_counts[i]) for i, c in enumerate(self._colors.values) if color_counts[i]},
+            "sizes": {s: int(size_counts[i]) for i, s in enumerate(self._sizes.values) if size_counts[i]},
+            "brands": {b: int(brand_counts[i]) for i, b in enumerate(self._brands.values) if brand_counts[i]},
+            "price_bands": dict(zip(price_band_labels(), (int(c) for c in band_counts))),
+            "rating_at_least": {str(t): int((ratings >= t).sum()) for t in RATING_THRESHOLDS},
+        }
+
+    def _order(self, rows, sort, page_end):
+        if not sort:
+            return rows[:page_end]
+        descending = sort.startswith("-")
+        column = getattr(self, SORT_COLUMNS[sort.lstrip("-")])[rows]
+        keys = -column if descending else column
+        if page_end < len(rows) // 8:
+            # Partial selection: keep everything up to the page_end-th key (ties included)
+            cutoff = np.partition(keys, page_end - 1)[page_end - 1]
+            keep = keys <= cutoff
+            rows, keys = rows[keep], keys[keep]
+        order = np.lexsort((rows, keys))
+        return rows[order][:page_end]
+
+    def query(self, sort=None, limit=20, offset=0, facets=True, **filters):
+        """
+        Filter, sort and page the catalog.
+
+        Returns {"total": int, "shoe_ids": [...], "facets": {...}} where
+        facets are counted over the whole filtered set, not just the page.
+        """
+        if sort and sort.lstrip("-") not in SORT_COLUMNS:
+            raise ValueError(f"sort must be one of {', '.join(sorted(SORT_COLUMNS))} (prefix '-' for descending)")
+        with self._lock:
+            mask = self._filter(**filters)
+            rows = np.flatnonzero(mask)
+            page = self._order(rows, sort, offset + limit)[offset:]
+            return {
+                "total": int(len(rows)),
+                "shoe_ids": [self.ids[r] for r in page],
+                "facets": self._facets(mask) if facets else None,
+            }
@@ -0,0 +1,64 @@
+from collections import Counter
+
+import numpy as np
+
+COMPARE_MIN_SHOES = 2
+COMPARE_MAX_SHOES = 20
+
+
+def diff_matrix(values, decimals=None):
+    """matrix[i][j] = values[i] - values[j], computed in one broadcast."""
+    matrix = values[:, None] - values[None, :]
+    if decimals is not None:
+        matrix = np.round(matrix, decimals)
+    return matrix
+
+
+def compare_summary(shoe_id, shoe, price_after_discount):
+    return {
+        "shoe_id": shoe_id, "name": shoe["name"], "price": shoe["base_price"],
+        "discount_percent": shoe["discount_percent"], "price_after_discount": price_after_discount,
+        "rating": shoe["rating"], "advantages": shoe["advantages"]
+    }
+
+
+def compare_shoes(columnar_catalog, shoes, shoe_ids, summaries=None):
+    """
+    N-way comparison of shoe_ids (already resolved and de-duplicated).
+
+    Prices and ratings come from the columnar catalog as aligned vectors, so
+    the pairwise matrices are a single broadcast each. Advantages are
+    compared as sets: an advantage is common if every shoe has it and
+    unique if exactly one does. `summaries` replaces the list of per-shoe
+    entries built here, e.g. with a pre-encoded one in shoe_ids order.
+    """
+    gathered = columnar_catalog.gather(shoe_ids, "discounted_price", "rating")
+    if gathered is None:
+        return None
+    prices, ratings = gathered
+
+    advantage_sets = [set(shoes[sid]["advantages"]) for sid in shoe_ids]
+    counts = Counter(adv for advs in advantage_sets for adv in advs)
+    total = len(shoe_ids)
+    first = shoes[shoe_ids[0]]["advantages"]
+
+    if summaries is None:
+        summaries = [compare_summary(shoe_id, shoes[shoe_id], int(prices[i])) for i, shoe_id in enumerate(shoe_ids)]
+    unique = {shoe_id: [adv for adv in shoes[shoe_id]["advantages"] if counts[adv] == 1] for shoe_id in shoe_ids}
+
+    cheapest = np.flatnonzero(prices == prices.min())
+    best_rated = np.flatnonzero(ratings == ratings.max())
+    return {
+        "shoes": summaries,
+        "comparison": {
+            "shoe_ids": list(shoe_ids),
+            "price_diff_matrix": diff_matrix(prices).astype(np.int64).tolist(),
+            "rating_diff_matrix": diff_matrix(ratings, 2).tolist(),
+            "cheapest_shoes": [shoe_ids[i] for i in cheapest],
+            "highest_rated_shoes": [shoe_ids[i] for i in best_rated],
+            "advantages": {
+                "common": [adv for adv in first if counts[adv] == total],
+                "unique": unique
+            }
+        }
+    }
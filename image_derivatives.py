@@ -0,0 +1,252 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # Pillow is optional; without it originals are served unchanged
+    Image = None
+
+# Requested widths are rounded up to one of these so the number of variants
+# per image (and therefore the cache footprint) stays bounded.
+WIDTH_BUCKETS = (64, 128, 256, 320, 480, 640, 800, 1024, 1280, 1600, 2048)
+MAX_WIDTH = WIDTH_BUCKETS[-1]
+
+# format -> (Pillow encoder, file extension, mimetype, save options)
+FORMATS = {
+    "jpeg": ("JPEG", "jpg", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+    "webp": ("WEBP", "webp", "image/webp", {"quality": 80, "method": 4}),
+    "avif": ("AVIF", "avif", "image/avif", {"quality": 60, "speed": 6}),
+    "png": ("PNG", "png", "image/png", {"optimize": True}),
+}
+# format=auto picks the first of these the client accepts
+AUTO_PREFERENCE = ("avif", "webp", "jpeg")
+# Bump when encoder settings change so old variants are not reused.
+PIPELINE_VERSION = 1
+
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+ENCODE_TIMEOUT = 30.0
+
+
+def snap_width(width):
+    for bucket in WIDTH_BUCKETS:
+        if width <= bucket:
+            return bucket
+    return MAX_WIDTH
+
+
+def format_for_mimetype(mimetype):
+    for fmt, (_, _, fmt_mimetype, _) in FORMATS.items():
+        if mimetype.startswith(fmt_mimetype):
+            return fmt
+    return None
+
+
+def supported_formats():
+    if Image is None:
+        return set()
+    return {fmt for fmt, (encoder, _, _, _) in FORMATS.items()
+            if encoder in ("JPEG", "PNG") or features.check(encoder.lower())}
+
+
+def render_variant(source_path, width, fmt):
+    """Decode, downscale to at most `width` pixels wide and re-encode. Runs in a pool worker."""
+    encoder, _, _, options = FORMATS[fmt]
+    with Image.open(source_path) as im:
+        # JPEG can decode straight at 1/2, 1/4 or 1/8 scale, which is much cheaper
+        # than decoding full size and resampling everything.
+        im.draft("RGB", (width, max(1, im.height * width // max(im.width, 1))))
+        im = ImageOps.exif_transpose(im)
+        if im.width > width:
+            im = im.resize((width, max(1, round(im.height * width / im.width))), Image.LANCZOS)
+        if fmt == "jpeg" and im.mode not in ("RGB", "L"):
+            im = im.convert("RGB")
+        out = io.BytesIO()
+        im.save(out, format=encoder, **options)
+        return out.getvalue()
+
+
+class DerivativeCache:
+    """
+    Content-addressed, size-bounded disk cache of encoded variants.
+
+    Keys are hashes of the source content plus the variant parameters, so a
+    changed source image simply produces new keys and stale variants age
+    out. Files live in <directory>/<key[:2]>/<key>.<ext>. Recency is kept in
+    memory (seeded from mtimes on startup) and the least recently used
+    files are deleted once the total exceeds max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # filename -> size, least recently used first
+        self.total_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        found = []
+        for dirpath, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if filename.endswith(".tmp"):
+                    continue
+                st = os.stat(os.path.join(dirpath, filename))
+                found.append((st.st_mtime, filename, st.st_size))
+        for _, filename, size in sorted(found):
+            self._entries[filename] = size
+            self.total_bytes += size
+        self._evict()
+
+    def _path(self, filename):
+        return os.path.join(self.directory, filename[:2], filename)
+
+    def get(self, filename):
+        with self._lock:
+            if filename not in self._entries:
+                return None
+            self._entries.move_to_end(filename)
+        try:
+            with open(self._path(filename), "rb") as f:
+                return f.read()
+        except FileNotFoundError:  # evicted by another worker sharing the directory
+            with self._lock:
+                size = self._entries.pop(filename, None)
+                if size is not None:
+                    self.total_bytes -= size
+            return None
+
+    def put(self, filename, data):
+        path = self._path(filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            previous = self._entries.pop(filename, None)
+            if previous is not None:
+                self.total_bytes -= previous
+            self._entries[filename] = len(data)
+            self.total_bytes += len(data)
+            self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            filename, size = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(self._path(filename))
+            except FileNotFoundError:
+                pass
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ImageDerivatives:
+    """
+    Resized/re-encoded image variants backed by a process pool and a
+    DerivativeCache.
+
+    Encoding is CPU bound, so once the server's entry point has called
+    start() it runs in worker processes rather than on request threads.
+    Until then, e.g. when the app is imported by a script or a benchmark,
+    variants are encoded on the requesting thread and no process is ever
+    started. Concurrent requests for the same missing variant share one
+    in-flight encode: the first caller runs or submits it and everyone else
+    waits on the same future.
+    """
+
+    def __init__(self, cache, workers=None):
+        self.cache = cache
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.formats = supported_formats()
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.stats = {"hits": 0, "encodes": 0, "coalesced": 0, "errors": 0}
+
+    @property
+    def enabled(self):
+        return Image is not None
+
+    def start(self):
+        """
+        Start this process's encode pool. Workers come from a forkserver that
+        only preloads this module (or spawn where there is none), never
+        forked straight from the server, whose other threads may hold locks
+        the child could never release. Both re-import the __main__ script in
+        each worker, so call this only from an entry point that keeps its
+        work under `if __name__ == "__main__"`, as serve.py does. A pool
+        inherited across fork has no live manager thread, so forked server
+        workers call start() again.
+        """
+        if self._pool is not None and self._pool_pid == os.getpid():
+            return
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload([__name__])
+        else:
+            context = multiprocessing.get_context("spawn")
+        self._pool = ProcessPoolExecutor(self.workers, mp_context=context)
+        self._pool_pid = os.getpid()
+
+    def negotiate(self, accept_mimetypes):
+        """Best format for format=auto given the request's Accept header."""
+        for fmt in AUTO_PREFERENCE:
+            if fmt in self.formats and FORMATS[fmt][2] in accept_mimetypes:
+                return fmt
+        return "jpeg"
+
+    def variant_name(self, source_etag, width, fmt):
+        key = hashlib.blake2b(f"{source_etag}:{width}:{fmt}:{PIPELINE_VERSION}".encode(), digest_size=16)
+        return f"{key.hexdigest()}.{FORMATS[fmt][1]}"
+
+    def get(self, source_path, source_etag, width, fmt):
+        """Return (variant filename, encoded bytes), encoding at most once per variant."""
+        filename = self.variant_name(source_etag, width, fmt)
+        data = self.cache.get(filename)
+        if data is not None:
+            self.stats["hits"] += 1
+            return filename, data
+
+        pool = self._pool if self._pool_pid == os.getpid() else None
+        with self._lock:
+            future = self._inflight.get(filename)
+            leader = future is None
+            if leader:
+                future = pool.submit(render_variant, source_path, width, fmt) if pool is not None else Future()
+                self._inflight[filename] = future
+            else:
+                self.stats["coalesced"] += 1
+        if not leader:
+            return filename, future.result(ENCODE_TIMEOUT)
+
+        if pool is None:  # not started: encode here
+            try:
+                future.set_result(render_variant(source_path, width, fmt))
+            except Exception as e:
+                future.set_exception(e)
+        try:
+            data = future.result(ENCODE_TIMEOUT)
+            self.cache.put(filename, data)
+            self.stats["encodes"] += 1
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(filename, None)
+        return filename, data
+
+    def close(self):
+        if self._pool is not None and self._pool_pid == os.getpid():
+            self._pool.shutdown()
+        self._pool = None
@@ -0,0 +1,173 @@
+import threading
+
+
+class ShoeGrid:
+    """Placement of one shoe's colors x sizes bit matrix inside the shared buffer."""
+
+    __slots__ = ("colors", "sizes", "color_index", "size_index", "offset", "row_bytes")
+
+    def __init__(self, colors, sizes, offset):
+        self.colors = tuple(colors)
+        self.sizes = tuple(sizes)
+        self.color_index = {color: i for i, color in enumerate(self.colors)}
+        self.size_index = {size: i for i, size in enumerate(self.sizes)}
+        self.offset = offset
+        self.row_bytes = (len(self.sizes) + 7) // 8
+
+    @property
+    def nbytes(self):
+        return len(self.colors) * self.row_bytes
+
+
+def iter_bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class InventoryMatrix:
+    """
+    Availability for every shoe packed into one flat byte buffer.
+
+    Each shoe owns len(colors) rows of ceil(len(sizes) / 8) bytes; bit j of
+    row i is set when colors[i] is in stock in sizes[j]. A row decodes to a
+    Python int, so whole size grids are answered with bit operations rather
+    than per-cell dict lookups.
+    """
+
+    def __init__(self, buffer=None):
+        self._lock = threading.Lock()
+        self._buf = buffer if buffer is not None else bytearray()
+        self._grids = {}  # shoe_id -> ShoeGrid
+
+    @classmethod
+    def from_nested(cls, nested):
+        """Build from the legacy {shoe_id: {color: {size: bool}}} layout."""
+        matrix = cls()
+        for shoe_id, by_color in nested.items():
+            matrix.load_shoe(shoe_id, by_color)
+        return matrix
+
+    def __contains__(self, shoe_id):
+        return shoe_id in self._grids
+
+    def __len__(self):
+        return len(self._grids)
+
+    def shoe_ids(self):
+        return list(self._grids)
+
+    @property
+    def nbytes(self):
+        return len(self._buf)
+
+    def _row_mask(self, grid, row):
+        start = grid.offset + row * grid.row_bytes
+        return int.from_bytes(self._buf[start:start + grid.row_bytes], "little")
+
+    def _write_row(self, grid, row, mask):
+        start = grid.offset + row * grid.row_bytes
+        self._buf[start:start + grid.row_bytes] = mask.to_bytes(grid.row_bytes, "little")
+
+    def load_shoe(self, shoe_id, by_color):
+        """Install (or replace) a shoe's grid from {color: {size: bool}}."""
+        colors = list(by_color)
+        sizes = sorted({size for by_size in by_color.values() for size in by_size})
+        with self._lock:
+            current = self._grids.get(shoe_id)
+            if current is not None and current.colors == tuple(colors) and current.sizes == tuple(sizes):
+                grid = current
+            else:
+                grid = ShoeGrid(colors, sizes, len(self._buf))
+                self._buf.extend(bytes(grid.nbytes))
+                self._grids[shoe_id] = grid
+            for row, color in enumerate(colors):
+                mask = 0
+                for size, available in by_color[color].items():
+                    if available:
+                        mask |= 1 << grid.size_index[size]
+                self._write_row(grid, row, mask)
+
+    def remove_shoe(self, shoe_id):
+        # The freed bytes are left in place; compacted() reclaims them.
+        with self._lock:
+            self._grids.pop(shoe_id, None)
+
+    def compacted(self):
+        """
+        A new matrix holding the same grids packed without the bytes freed by
+        remove_shoe(). This one is only read, so lock-free readers never see a
+        half-moved grid; swap the reference to publish the copy, as
+        replace_catalog() does. Cells flipped here after the copy is taken
+        are not carried over.
+        """
+        matrix = type(self)()
+        with self._lock:
+            for shoe_id, grid in self._grids.items():
+                moved = ShoeGrid(grid.colors, grid.sizes, len(matrix._buf))
+                matrix._buf.extend(self._buf[grid.offset:grid.offset + grid.nbytes])
+                matrix._grids[shoe_id] = moved
+        return matrix
+
+    def is_available(self, shoe_id, color, size):
+        grid = self._grids.get(shoe_id)
+        if grid is None:
+            return False
+        row = grid.color_index.get(color)
+        col = grid.size_index.get(size)
+        if row is None or col is None:
+            return False
+        byte = self._buf[grid.offset + row * grid.row_bytes + (col >> 3)]
+        return bool(byte >> (col & 7) & 1)
+
+    def set_available(self, shoe_id, color, size, available):
+        """Flip one cell; returns False if the shoe/color/size is not in the grid."""
+        grid = self._grids.get(shoe_id)
+        if grid is None:
+            return False
+        row = grid.color_index.get(color)
+        col = grid.size_index.get(size)
+        if row is None or col is None:
+            return False
+        pos = grid.offset + row * grid.row_bytes + (col >> 3)
+        bit = 1 << (col & 7)
+        with self._lock:
+            if available:
+                self._buf[pos] |= bit
+            else:
+                self._buf[pos] &= ~bit & 0xFF
+        return True
+
+    def availability(self, shoe_id):
+        """
+        Return {"by_color": {color: [sizes]}, "by_size": {size: [colors]}}
+        listing only in-stock combinations, or None for an unknown shoe.
+        """
+        grid = self._grids.get(shoe_id)
+        if grid is None:
+            return None
+        by_color = {}
+        column_masks = [0] * len(grid.sizes)
+        for row, color in enumerate(grid.colors):
+            mask = self._row_mask(grid, row)
+            cols = list(iter_bits(mask))
+            by_color[color] = [grid.sizes[c] for c in cols]
+            for c in cols:
+                column_masks[c] |= 1 << row
+        by_size = {}
+        for col, size in enumerate(grid.sizes):
+            if column_masks[col]:
+                by_size[size] = [grid.colors[r] for r in iter_bits(column_masks[col])]
+        return {"by_color": by_color, "by_size": by_size}
+
+    def to_nested(self, shoe_id):
+        """Expand one shoe back to {color: {size: bool}} (debugging/export only)."""
+        grid = self._grids.get(shoe_id)
+        if grid is None:
+            return {}
+        nested = {}
+        for row, color in enumerate(grid.colors):
+            mask = self._row_mask(grid, row)
+            nested[color] = {size: bool(mask >> col & 1) for col, size in enumerate(grid.sizes)}
+        return nested
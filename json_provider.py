@@ -0,0 +1,155 @@
+import json
+import re
+import secrets
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the standard library encoder
+    orjson = None
+
+# Stand-in emitted for a Fragment during encoding and replaced by its bytes
+# afterwards. The per-process nonce keeps real string data from matching it.
+_NONCE = secrets.token_hex(8)
+_PLACEHOLDER = re.compile(rf'"__fragment_{_NONCE}_(\d+)__"'.encode())
+
+
+class Fragment:
+    """Already-encoded JSON (UTF-8 bytes) to be spliced into a document as is."""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+
+def _encoded(part, encode):
+    return part.data if isinstance(part, Fragment) else encode(part)
+
+
+def join_objects(*parts, encode=None):
+    """One Fragment holding the members of every part (dicts or compact object Fragments), in order."""
+    encode = encode or default_encoder().encode
+    members = []
+    for part in parts:
+        data = _encoded(part, encode)
+        if len(data) > 2:  # not "{}"
+            members.append(data[1:-1])
+    return Fragment(b"{" + b",".join(members) + b"}")
+
+
+def join_array(parts, encode=None):
+    """One Fragment holding a JSON array of parts (Fragments or anything encodable)."""
+    encode = encode or default_encoder().encode
+    return Fragment(b"[" + b",".join([_encoded(part, encode) for part in parts]) + b"]")
+
+
+class Encoder:
+    """
+    Compact UTF-8 JSON encoding with Fragment splicing, over orjson when it
+    is installed (name="orjson") or the standard library (name="json").
+    Output matches Flask's compact jsonify(): sorted keys, no whitespace;
+    orjson writes non-ASCII text unescaped, and members appended with
+    join_objects() follow the fragment's own rather than being sorted in.
+    """
+
+    def __init__(self, name=None, sort_keys=True):
+        if name is None:
+            name = "orjson" if orjson is not None else "json"
+        if name == "orjson" and orjson is None:
+            raise ValueError("orjson is not installed")
+        if name not in ("orjson", "json"):
+            raise ValueError(f"unknown JSON encoder {name!r}")
+        self.name = name
+        self.sort_keys = sort_keys
+        if name == "orjson":
+            # Datetimes and dataclasses go through `default` as they do in Flask
+            self._options = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+                             | orjson.OPT_PASSTHROUGH_DATACLASS | (orjson.OPT_SORT_KEYS if sort_keys else 0))
+
+    def encode(self, obj):
+        fragments = []
+
+        def default(value):
+            if isinstance(value, Fragment):
+                fragments.append(value.data)
+                return f"__fragment_{_NONCE}_{len(fragments) - 1}__"
+            return DefaultJSONProvider.default(value)
+
+        if self.name == "orjson":
+            data = orjson.dumps(obj, default=default, option=self._options)
+        else:
+            data = json.dumps(obj, default=default, sort_keys=self.sort_keys, separators=(",", ":")).encode()
+        if fragments:
+            data = _PLACEHOLDER.sub(lambda m: fragments[int(m.group(1))], data)
+        return data
+
+
+_default_encoder = None
+
+
+def default_encoder():
+    """The Encoder used where none is given: orjson if installed unless set_default_encoder() says otherwise."""
+    global _default_encoder
+    if _default_encoder is None:
+        _default_encoder = Encoder()
+    return _default_encoder
+
+
+def set_default_encoder(encoder):
+    global _default_encoder
+    _default_encoder = encoder
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider on top of Encoder: jsonify() and app.json.dumps()
+    encode straight to bytes with orjson when available, and any Fragment
+    in the data is spliced in without being decoded or re-encoded. Responses
+    are compact in debug mode too. Install with app.json =
+    FastJSONProvider(app), optionally passing an Encoder.
+    """
+
+    def __init__(self, app, encoder=None):
+        super().__init__(app)
+        self.encoder = encoder or default_encoder()
+
+    def dumps_bytes(self, obj):
+        return self.encoder.encode(obj)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:  # indent, separators etc.: the plain standard library path
+            return super().dumps(obj, **kwargs)
+        return self.encoder.encode(obj).decode()
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.encoder.encode(obj) + b"\n", mimetype=self.mimetype)
+
+
+class FragmentCache:
+    """
+    Encoded per-shoe payloads for one catalog snapshot, keyed by (kind,
+    shoe_id) and built on first use. Each entry remembers the shoe dict it
+    was built from and is rebuilt when asked about a different one, so a
+    fragment can never outlive the document it encodes.
+    """
+
+    def __init__(self, encoder=None):
+        self._encoder = encoder
+        self._entries = {}  # (kind, shoe_id) -> (shoe, Fragment)
+
+    def get(self, kind, shoe_id, shoe, build):
+        """Fragment of build(shoe_id, shoe)."""
+        key = (kind, shoe_id)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is shoe:
+            return entry[1]
+        encoder = self._encoder or default_encoder()
+        fragment = Fragment(encoder.encode(build(shoe_id, shoe)))
+        self._entries[key] = (shoe, fragment)
+        return fragment
+
+    def __len__(self):
+        return len(self._entries)
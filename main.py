@@ -1,18 +1,43 @@
 
+import base64
+import binascii
+import json
 import os
+import signal
+import socket
+import sys
+import tempfile
 from datetime import datetime
-from flask import Flask, render_template, send_from_directory, Blueprint, jsonify, request
+from flask import Flask, render_template, send_from_directory, Blueprint, jsonify, request, g, has_app_context
 import flask_cors
+from inventory import InventoryMatrix
+from catalog_source import CatalogSnapshot, CatalogWatcher, DEFAULT_POLL_SECONDS
+from comparison import compare_shoes, compare_summary, COMPARE_MIN_SHOES, COMPARE_MAX_SHOES
+from recommendations import DEFAULT_TOP_K
+from order_store import OrderStore
+from order_journal import OrderJournal
+from order_index import order_key
+from repository import open_repository
+from response_cache import ResponseCache, VersionCounter
+from json_provider import Encoder, FastJSONProvider, join_array, join_objects, set_default_encoder
+from name_index import normalize_name
+from static_assets import Asset, AssetManifest, build_asset, asset_response, IMMUTABLE, NO_CACHE
+from metrics import RequestMetrics
+from admission import AdmissionControl, Budget, reads_and_writes, remote_client
+from reservations import (ReservationBook, DEFAULT_TTL_SECONDS, DEFAULT_MAX_PER_CUSTOMER, DEFAULT_MAX_PENDING,
+                          CUSTOMER_LIMIT, LIMIT)
+from image_derivatives import DerivativeCache, ImageDerivatives, FORMATS, format_for_mimetype, snap_width, MAX_WIDTH
 
 # Resolve absolute paths relative to this file
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 BUILD_DIR = os.path.join(BASE_DIR, 'build')
 IMAGES_DIR = os.path.join(BASE_DIR, 'images')
 
+# Static files under BUILD_DIR are served by the `index` route from the asset
+# manifest, so Flask's own static route is disabled.
 app = Flask(
     __name__,
-    static_folder=BUILD_DIR,
-    static_url_path='',
+    static_folder=None,
     template_folder=BUILD_DIR
 )
 
@@ -20,6 +45,17 @@ flask_cors.CORS(app)
 
 api = Blueprint("api", __name__, url_prefix="/api")
 
+# ----------------------------
+# JSON Encoding
+# ----------------------------
+# jsonify() and cached responses are encoded by FastJSONProvider: orjson when
+# installed, the standard library otherwise (SHOEHUB_JSON_ENCODER=json forces
+# it). Per-shoe payloads are encoded once per catalog snapshot and spliced
+# into search, query, similar, details and compare responses as fragments.
+json_encoder = Encoder(os.environ.get("SHOEHUB_JSON_ENCODER") or None)
+set_default_encoder(json_encoder)
+app.json = FastJSONProvider(app, json_encoder)
+
 # ----------------------------
 # Mock In-Memory Data (Demo)
 # ----------------------------
@@ -215,37 +251,246 @@ DB = {
     "pending": {}
 }
 
+# ----------------------------
+# Catalog Indexes
+# ----------------------------
+# Availability is held as a packed per-shoe colors x sizes bit matrix
+DB["inventory"] = InventoryMatrix.from_nested(DB["inventory"])
+
+# Orders are written concurrently by waitress worker threads
+DB["orders"] = OrderStore(DB["orders"])
+
+# ----------------------------
+# Storage Backend
+# ----------------------------
+# SHOEHUB_STORAGE=memory (default) serves straight from DB above;
+# SHOEHUB_STORAGE=sqlite persists to SHOEHUB_SQLITE_PATH, seeded from DB on first run.
+STORAGE_BACKEND = os.environ.get("SHOEHUB_STORAGE", "memory")
+SQLITE_PATH = os.environ.get("SHOEHUB_SQLITE_PATH", os.path.join(BASE_DIR, "shoehub.db"))
+
+# With the memory backend, SHOEHUB_JOURNAL_DIR makes orders durable: writes are
+# group-committed to an append-only journal and replayed on startup.
+JOURNAL_DIR = os.environ.get("SHOEHUB_JOURNAL_DIR")
+order_journal = None
+if JOURNAL_DIR and STORAGE_BACKEND == "memory":
+    order_journal = OrderJournal(
+        JOURNAL_DIR,
+        commit_window_ms=float(os.environ.get("SHOEHUB_JOURNAL_WINDOW_MS", "2")),
+        snapshot_every=int(os.environ.get("SHOEHUB_SNAPSHOT_EVERY", "100000"))
+    )
+    recovered = order_journal.recover()
+    if recovered is not None:
+        DB["orders"] = OrderStore(recovered)
+        stats = order_journal.last_recovery
+        print(f"Recovered {len(recovered)} orders ({stats['replayed_events']} journal events "
+              f"replayed in {stats['replay_seconds']:.2f}s)")
+    order_journal.start(snapshot_source=DB["orders"].items)
+
+repo = open_repository(DB, STORAGE_BACKEND, SQLITE_PATH, journal=order_journal)
+
+# ----------------------------
+# Stock Holds
+# ----------------------------
+# Holds live in the repository's hold table (DB["pending"], or SQLite's
+# pending table shared by every worker) and expire after their TTL. A pending
+# hold makes its SKU unavailable to other customers; inventory bits are never
+# changed by holds or orders. SHOEHUB_HOLDS_PER_CUSTOMER and SHOEHUB_HOLDS_MAX
+# cap the pending holds per customer_id and overall.
+reservations = ReservationBook(
+    repo.holds,
+    is_available=repo.is_available,
+    per_customer=int(os.environ.get("SHOEHUB_HOLDS_PER_CUSTOMER", str(DEFAULT_MAX_PER_CUSTOMER))),
+    limit=int(os.environ.get("SHOEHUB_HOLDS_MAX", str(DEFAULT_MAX_PENDING)))
+)
+
+# ----------------------------
+# Catalog Snapshot
+# ----------------------------
+# The catalog and every index derived from it live in one CatalogSnapshot.
+# SHOEHUB_CATALOG_PATH (.json or .csv) replaces the demo catalog and inventory
+# above at startup and is polled every SHOEHUB_CATALOG_POLL_SECONDS: a new
+# version is parsed and indexed on the watcher thread, then published by
+# swapping the `catalog` reference. Handlers pin one snapshot per request
+# through current_catalog() and never take a lock to read it.
+CATALOG_PATH = os.environ.get("SHOEHUB_CATALOG_PATH")
+CATALOG_POLL_SECONDS = float(os.environ.get("SHOEHUB_CATALOG_POLL_SECONDS", str(DEFAULT_POLL_SECONDS)))
+# Length of the precomputed similar-shoes list kept per shoe
+SIMILAR_TOP_K = int(os.environ.get("SHOEHUB_SIMILAR_TOP_K", str(DEFAULT_TOP_K)))
+
+# Bumped on every catalog change; cached catalog responses built against an
+# older version are treated as misses.
+catalog_version = VersionCounter()
+response_cache = ResponseCache(int(os.environ.get("SHOEHUB_RESPONSE_CACHE_SIZE", "4096")))
+
+catalog = None
+
+def publish_catalog(snapshot):
+    global catalog
+    catalog = snapshot
+    catalog_version.bump()
+
+def reload_catalog(shoes, inventory, source=None):
+    """Index a whole new catalog, store it with its inventory, then publish it in one swap."""
+    snapshot = CatalogSnapshot(shoes, source=source, previous=catalog, similar_k=SIMILAR_TOP_K)
+    repo.replace_catalog(shoes, inventory)
+    publish_catalog(snapshot)
+    # Holds on SKUs the new catalog no longer stocks cannot be honoured
+    reservations.withdraw_unavailable()
+    return snapshot
+
+def current_catalog():
+    """The snapshot this request reads; pinned on first use so one request never mixes versions."""
+    if not has_app_context():
+        return catalog
+    snapshot = g.get("catalog")
+    if snapshot is None:
+        snapshot = g.catalog = catalog
+    return snapshot
+
+catalog_watcher = None
+if CATALOG_PATH:
+    catalog_watcher = CatalogWatcher(CATALOG_PATH, reload_catalog, interval=CATALOG_POLL_SECONDS, logger=app.logger)
+    catalog_watcher.check()  # a bad file fails startup rather than serving the demo catalog
+    catalog_watcher.start()
+else:
+    publish_catalog(CatalogSnapshot(repo.all_shoes(), similar_k=SIMILAR_TOP_K))
+
+def rebuild_catalog_indexes():
+    """Rebuild every derived index from the repository in one pass, e.g. after a bulk load."""
+    publish_catalog(CatalogSnapshot(repo.all_shoes(), similar_k=SIMILAR_TOP_K))
+
 def price_after_discount(shoe):
     return round(shoe["base_price"] * (100 - shoe["discount_percent"]) / 100)
 
 def is_golden_member(customer_id):
-    cust = DB["customers"].get(customer_id)
+    cust = repo.get_customer(customer_id)
     return cust and cust.get("membership", "").lower() == "golden"
 
-def find_shoe_id_by_name(name):
-    for shoe_id, shoe in DB["shoes"].items():
-        if shoe["name"].lower() == name.lower():
-            return shoe_id
-    return None
+def find_shoe_id_by_name(name, fuzzy=False):
+    return current_catalog().name_index.resolve(name, fuzzy=fuzzy)
 
-def check_availability(shoe_id, color, size):
-    inv = DB["inventory"].get(shoe_id, {}).get(color, {})
-    return inv.get(size, False)
+def name_suggestions(name, limit=5):
+    snapshot = current_catalog()
+    candidates = snapshot.name_index.suggest(name, limit=limit)
+    shoes = snapshot.get_shoes([shoe_id for shoe_id, _ in candidates])
+    return [
+        {"shoe_id": shoe_id, "name": shoes[shoe_id]["name"], "similarity": similarity}
+        for shoe_id, similarity in candidates
+        if shoe_id in shoes
+    ]
+
+def is_truthy(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+def check_availability(shoe_id, color, size, customer_id=None):
+    """In stock and not held by another customer's reservation."""
+    return reservations.free(shoe_id, color, size, customer_id)
+
+def cached_json(endpoint, key, build):
+    """
+    Serve a catalog response from the response cache, building it with
+    build() -> (payload, status) on a miss. 200/404 bodies are cached as
+    serialized bytes with a strong ETag; a matching If-None-Match gets 304.
+    """
+    # Read before build() pins a snapshot: a reload in between can then only
+    # file fresh data under the old version, never stale data under the new one.
+    version = catalog_version.value
+    cache_key = (endpoint, key)
+    entry = response_cache.get(cache_key, version)
+    if entry is None:
+        payload, status = build()
+        body = app.json.dumps_bytes(payload) + b"\n"
+        if status not in (200, 404):
+            return app.response_class(body, status=status, mimetype=app.json.mimetype)
+        entry = response_cache.put(cache_key, version, status, body)
+
+    headers = {"ETag": entry.etag, "Cache-Control": "public, no-cache"}
+    # If-None-Match uses the weak comparison (RFC 9110 13.1.2); ours are strong tags
+    if entry.status == 200 and request.if_none_match.contains_weak(entry.etag_value):
+        return app.response_class(status=304, headers=headers)
+    return app.response_class(entry.body, status=entry.status, mimetype=app.json.mimetype, headers=headers)
 
 # ----------------------------
 # Static/Image & SPA Routes
 # ----------------------------
+# Content hashes, small-file bodies and gzip variants are computed once at
+# startup; requests are answered from memory without touching the filesystem.
+ASSET_MEMORY_LIMIT = int(os.environ.get("SHOEHUB_ASSET_MEMORY_LIMIT", str(1024 * 1024)))
+build_assets = AssetManifest(BUILD_DIR, ASSET_MEMORY_LIMIT)
+image_assets = AssetManifest(IMAGES_DIR, ASSET_MEMORY_LIMIT)
+_spa_shell = None
+
+def spa_shell():
+    """index.html rendered once and cached with its gzip variant."""
+    global _spa_shell
+    if _spa_shell is None:
+        body = render_template('index.html').encode()
+        _spa_shell = build_asset(os.path.join(BUILD_DIR, 'index.html'), body=body, name='index.html')
+    return _spa_shell
+
+# Resized variants (/images/<file>?width=320&format=webp) are encoded in a
+# process pool, started by serve.py, and kept in a size-bounded disk cache
+# keyed by content hash.
+IMAGE_CACHE_DIR = os.environ.get("SHOEHUB_IMAGE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "shoehub-images"))
+IMAGE_CACHE_BYTES = int(os.environ.get("SHOEHUB_IMAGE_CACHE_BYTES", str(256 * 1024 * 1024)))
+image_derivatives = ImageDerivatives(
+    DerivativeCache(IMAGE_CACHE_DIR, IMAGE_CACHE_BYTES),
+    workers=int(os.environ.get("SHOEHUB_IMAGE_WORKERS", "0")) or None
+)
+
 @app.route('/images/<filename>')
 def serve_image(filename):
-    return send_from_directory(IMAGES_DIR, filename)
+    asset = image_assets.get(filename)
+    if asset is None:
+        return send_from_directory(IMAGES_DIR, filename)
+
+    width, error = int_arg("width", None, minimum=1)
+    if error:
+        return jsonify({"ok": False, "error": error}), 400
+    fmt = request.args.get("format", "").strip().lower() or None
+    if width is None and fmt is None:
+        return asset_response(app, request, asset)
+    if fmt is not None and fmt != "auto" and fmt not in FORMATS:
+        return jsonify({"ok": False, "error": f"format must be one of: auto, {', '.join(FORMATS)}"}), 400
+    return serve_image_variant(asset, width, fmt)
+
+def serve_image_variant(asset, width, fmt):
+    if not image_derivatives.enabled:
+        return asset_response(app, request, asset)  # Pillow not installed
+
+    negotiated = fmt == "auto"
+    if negotiated:
+        fmt = image_derivatives.negotiate(request.accept_mimetypes)
+    elif fmt is None:
+        fmt = format_for_mimetype(asset.mimetype) or "jpeg"
+    if fmt not in image_derivatives.formats:
+        return jsonify({"ok": False, "error": f"format {fmt} is not supported by this server"}), 400
+
+    try:
+        name, data = image_derivatives.get(asset.path, asset.etag, snap_width(width or MAX_WIDTH), fmt)
+    except Exception:
+        app.logger.exception("Could not build %s variant of %s; serving the original", fmt, asset.path)
+        return asset_response(app, request, asset)
+
+    variant = Asset(asset.path, FORMATS[fmt][2], len(data), name.split(".")[0], data, None, False)
+    # Variant URLs carry the source's ?v=, so immutability follows the source
+    versioned = asset.fingerprinted or request.args.get("v") == asset.version
+    response = asset_response(app, request, variant, IMMUTABLE if versioned else None)
+    if negotiated:
+        response.vary.add("Accept")
+    return response
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def index(path):
-    requested_path = os.path.join(BUILD_DIR, path) if path else None
-    if path and os.path.isfile(requested_path):
-        return send_from_directory(BUILD_DIR, path)
-    return render_template('index.html')
+    asset = build_assets.get(path) if path else None
+    if asset is not None:
+        # HTML entry points must revalidate so a new deploy is picked up
+        cache_control = NO_CACHE if asset.mimetype.startswith("text/html") else None
+        return asset_response(app, request, asset, cache_control)
+    return asset_response(app, request, spa_shell(), NO_CACHE)
 
 # ----------------------------
 # Basic sample API (existing)
@@ -257,6 +502,10 @@ def get_item():
 # ----------------------------
 # (1–4 Combined) Order Change Flow (Automatic)
 # ----------------------------
+def format_address(address):
+    return (f"{address.get('name')}, {address.get('line1')}, {address.get('line2')}, "
+            f"{address.get('city')}, {address.get('state')} - {address.get('pincode')}, {address.get('phone')}")
+
 @api.route('/order-change', methods=['POST'])
 def order_change():
     """
@@ -280,11 +529,11 @@ def order_change():
         return jsonify({"ok": False, "error": "new_color is required"}), 400
 
     # Fetch order and shoe
-    order = DB["orders"].get(order_id)
+    order = repo.get_order(order_id)
     if not order:
         return jsonify({"ok": False, "error": "Order not found. Please provide a valid order id to proceed further."}), 404
 
-    shoe = DB["shoes"].get(order["shoe_id"])
+    shoe = current_catalog().get_shoe(order["shoe_id"])
     if not shoe:
         return jsonify({"ok": False, "error": "Shoe not found for this order"}), 404
 
@@ -294,7 +543,7 @@ def order_change():
             "ok": False,
             "error": "Only Golden Membership card holders can change the color after ordering.",
             "customer_id": order["customer_id"],
-            "membership": DB["customers"].get(order["customer_id"], {}).get("membership", "Unknown")
+            "membership": (repo.get_customer(order["customer_id"]) or {}).get("membership", "Unknown")
         }), 403
 
     # Stage 2: Check color availability
@@ -305,7 +554,10 @@ def order_change():
             "available_colors": shoe["colors"]
         }), 400
 
-    if not check_availability(order["shoe_id"], new_color, order["size"]):
+    # Inventory is yes/no and orders do not draw it down, so there is no unit
+    # to move from the old color to the new one; only another customer's hold
+    # on the new SKU blocks the change.
+    if not check_availability(order["shoe_id"], new_color, order["size"], order["customer_id"]):
         return jsonify({
             "ok": False,
             "error": f"{new_color} not available in size {order['size']}",
@@ -313,24 +565,28 @@ def order_change():
             "requested_color": new_color
         }), 409
 
-    # Stage 3: Apply the color change
-    old_color = order["color"]
-    order["color"] = new_color
-
-    # Stage 4: Handle shipping address
-    current_address = order["shipping_address"]
-    if new_address and isinstance(new_address, dict):
-        # Update with new address if provided
-        order["shipping_address"] = new_address
-        address_status = "updated"
-        final_address = new_address
-    else:
-        # Keep existing address
-        address_status = "confirmed"
-        final_address = current_address
+    # Stage 3 & 4: Apply the color change and handle the shipping address
+    # as one atomic update of the order
+    address_provided = bool(new_address) and isinstance(new_address, dict)
+
+    def apply_change(current):
+        updated = dict(current, color=new_color)
+        if address_provided:
+            # Update with new address if provided
+            updated["shipping_address"] = new_address
+        return updated
+
+    changed = repo.update_order(order_id, apply_change)
+    if changed is None:
+        return jsonify({"ok": False, "error": "Order not found. Please provide a valid order id to proceed further."}), 404
+    previous, order = changed
+    old_color = previous["color"]
+    # Keep existing address unless a new one was provided
+    address_status = "updated" if address_provided else "confirmed"
+    final_address = order["shipping_address"]
 
     # Return complete success response
-    membership = DB["customers"].get(order["customer_id"], {}).get("membership", "Unknown")
+    membership = (repo.get_customer(order["customer_id"]) or {}).get("membership", "Unknown")
     message = (
         f"Color change completed successfully!\n"
         f"Order ID: {order_id}\n"
@@ -339,9 +595,7 @@ def order_change():
         f"Color changed from {old_color} to {new_color}\n"
         f"Size: {order['size']}\n"
         f"Shipping address {address_status}:\n"
-        f"{final_address['name']}, {final_address['line1']}, {final_address['line2']}, "
-        f"{final_address['city']}, {final_address['state']} - {final_address['pincode']}, "
-        f"{final_address['phone']}"
+        f"{format_address(final_address)}"
     )
 
     return jsonify({
@@ -367,10 +621,9 @@ def address_update_direct():
     new_address = data.get("new_address")
     if not order_id or not new_address:
         return jsonify({"ok": False, "error": "order_id and new_address are required"}), 400
-    order = DB["orders"].get(order_id)
-    if not order:
+    changed = repo.update_order(order_id, lambda order: dict(order, shipping_address=new_address))
+    if changed is None:
         return jsonify({"ok": False, "error": "Order not found"}), 404
-    order["shipping_address"] = new_address
     return jsonify({
         "ok": True,
         "order_id": order_id,
@@ -378,31 +631,239 @@ def address_update_direct():
         "new_address": new_address
     })
 
+# ----------------------------
+# Order Listing & Export
+# ----------------------------
+ORDERS_DEFAULT_LIMIT = 50
+ORDERS_MAX_LIMIT = 500
+ORDERS_EXPORT_BATCH = 1000
+ORDER_FILTERS = ("customer_id", "shoe_id", "status", "created_from", "created_to")
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(raw):
+    """Position after which the next page starts, or None if the cursor is malformed."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(raw + "=" * (-len(raw) % 4)))
+    except (binascii.Error, ValueError):
+        return None
+    if not (isinstance(key, list) and len(key) == 2 and all(isinstance(k, str) for k in key)):
+        return None
+    return tuple(key)
+
+def order_query():
+    """Filters and cursor position from the query string; returns (filters, before, error_message)."""
+    filters = {name: (request.args.get(name) or "").strip() or None for name in ORDER_FILTERS}
+    if filters["status"]:
+        filters["status"] = filters["status"].upper()
+    before = None
+    raw = request.args.get("cursor")
+    if raw:
+        before = decode_cursor(raw)
+        if before is None:
+            return None, None, "Invalid cursor"
+    return filters, before, None
+
+@api.route('/orders', methods=['GET'])
+def list_orders():
+    """
+    Newest-first order listing served from the secondary indexes:
+    GET /api/orders?customer_id=CUST001&status=PLACED&created_from=2024-01-01&limit=50
+    Pass next_cursor back as ?cursor= for the following page.
+    """
+    limit, error = int_arg('limit', ORDERS_DEFAULT_LIMIT, 1, ORDERS_MAX_LIMIT)
+    if error:
+        return jsonify({"ok": False, "error": error}), 400
+    filters, before, error = order_query()
+    if error:
+        return jsonify({"ok": False, "error": error}), 400
+
+    page = repo.list_orders(limit, before=before, **filters)
+    return jsonify({
+        "ok": True,
+        "orders": [{"order_id": order_id, **order} for order_id, order in page],
+        "limit": limit,
+        "next_cursor": encode_cursor(order_key(*page[-1])) if len(page) == limit else None
+    })
+
+@api.route('/orders/export', methods=['GET'])
+def export_orders():
+    """
+    Every matching order as NDJSON, newest first, same filters as /orders.
+    Rows are fetched ORDERS_EXPORT_BATCH at a time by cursor and streamed,
+    so memory use does not depend on the size of the table.
+    """
+    filters, before, error = order_query()
+    if error:
+        return jsonify({"ok": False, "error": error}), 400
+
+    def generate(position):
+        while True:
+            page = repo.list_orders(ORDERS_EXPORT_BATCH, before=position, **filters)
+            if page:
+                yield "".join(app.json.dumps({"order_id": order_id, **order}) + "\n" for order_id, order in page)
+            if len(page) < ORDERS_EXPORT_BATCH:
+                return
+            position = order_key(*page[-1])
+
+    return app.response_class(generate(before), mimetype="application/x-ndjson",
+                              headers={"Cache-Control": "no-store"})
+
 # ----------------------------
 # (6 single) Shoes Search
 # ----------------------------
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+def int_arg(name, default, minimum=0, maximum=None):
+    """Parse an integer query parameter; returns (value, error_message)."""
+    raw = request.args.get(name)
+    if raw is None or raw == "":
+        return default, None
+    try:
+        value = int(raw)
+    except ValueError:
+        return None, f"{name} must be an integer"
+    if value < minimum:
+        return None, f"{name} must be >= {minimum}"
+    if maximum is not None and value > maximum:
+        return None, f"{name} must be <= {maximum}"
+    return value, None
+
+def float_arg(name, minimum=None):
+    """Parse an optional float query parameter; returns (value, error_message)."""
+    raw = request.args.get(name)
+    if raw is None or raw == "":
+        return None, None
+    try:
+        value = float(raw)
+    except ValueError:
+        return None, f"{name} must be a number"
+    if minimum is not None and value < minimum:
+        return None, f"{name} must be >= {minimum}"
+    return value, None
+
+def list_arg(name):
+    return [v.strip() for v in (request.args.get(name) or "").split(",") if v.strip()]
+
+def shoe_summary(shoe_id, shoe):
+    return {
+        "shoe_id": shoe_id,
+        "name": shoe["name"],
+        "brand": shoe["brand"],
+        "base_price": shoe["base_price"],
+        "discount_percent": shoe["discount_percent"],
+        "rating": shoe["rating"],
+        "colors": shoe["colors"],
+        "sizes": shoe["sizes"],
+        "materials": shoe["materials"],
+        "advantages": shoe["advantages"],
+        "description": shoe["description"]
+    }
+
+def priced_summary(shoe_id, shoe):
+    return dict(shoe_summary(shoe_id, shoe), price_after_discount=price_after_discount(shoe))
+
+def summary_fragment(snapshot, shoe_id, shoe, **extra):
+    """shoe_summary() as encoded JSON, cached on the snapshot, with `extra` members appended."""
+    fragment = snapshot.fragments.get("summary", shoe_id, shoe, shoe_summary)
+    return join_objects(fragment, extra) if extra else fragment
+
 @api.route('/shoes/search', methods=['GET'])
 def search_shoes():
     query = (request.args.get('query') or "").strip().lower()
     if not query:
         return jsonify({"ok": False, "error": "query parameter is required"}), 400
+    limit, error = int_arg('limit', SEARCH_DEFAULT_LIMIT, 1, SEARCH_MAX_LIMIT)
+    if error:
+        return jsonify({"ok": False, "error": error}), 400
+    offset, error = int_arg('offset', 0)
+    if error:
+        return jsonify({"ok": False, "error": error}), 400
+
+    query = " ".join(query.split())
+    return cached_json("search", (query, limit, offset), lambda: build_search(query, limit, offset))
+
+def build_search(query, limit, offset):
+    snapshot = current_catalog()
+    total, hits = snapshot.search_index.search(query, limit=limit, offset=offset)
+    shoes = snapshot.get_shoes([shoe_id for shoe_id, _ in hits])
+    results = []
+    for shoe_id, score in hits:
+        shoe = shoes.get(shoe_id)
+        if shoe is None:
+            continue
+        results.append(summary_fragment(snapshot, shoe_id, shoe, score=score))
+    return {
+        "ok": True,
+        "results": join_array(results),
+        "total": total,
+        "limit": limit,
+        "offset": offset
+    }, 200
+
+# ----------------------------
+# Catalog Query (filter / sort / facets)
+# ----------------------------
+@api.route('/shoes/query', methods=['GET'])
+def query_shoes():
+    """
+    Structured catalog browsing, e.g.
+    GET /api/shoes/query?colors=red,black&sizes=9&max_price=10000&sort=-rating&limit=20
+    Prices filter on the discounted price. Facet counts cover the whole filtered set.
+    """
+    limit, error = int_arg('limit', SEARCH_DEFAULT_LIMIT, 1, SEARCH_MAX_LIMIT)
+    if error:
+        return jsonify({"ok": False, "error": error}), 400
+    offset, error = int_arg('offset', 0)
+    if error:
+        return jsonify({"ok": False, "error": error}), 400
+
+    filters = {}
+    for name in ("min_price", "max_price", "min_rating", "min_discount"):
+        filters[name], error = float_arg(name, minimum=0)
+        if error:
+            return jsonify({"ok": False, "error": error}), 400
+    sizes = []
+    for raw in list_arg('sizes'):
+        try:
+            sizes.append(int(raw))
+        except ValueError:
+            return jsonify({"ok": False, "error": f"Invalid size '{raw}'"}), 400
+    filters["sizes"] = sizes
+    filters["colors"] = [c.lower() for c in list_arg('colors')]
+    filters["brands"] = list_arg('brands')
+
+    snapshot = current_catalog()
+    try:
+        result = snapshot.columnar.query(
+            sort=request.args.get('sort'),
+            limit=limit,
+            offset=offset,
+            facets=request.args.get('facets', 'true').lower() != 'false',
+            **filters
+        )
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+
+    shoes = snapshot.get_shoes(result["shoe_ids"])
     results = []
-    for shoe_id, shoe in DB["shoes"].items():
-        if query in shoe["name"].lower() or query in shoe["brand"].lower():
-            results.append({
-                "shoe_id": shoe_id,
-                "name": shoe["name"],
-                "brand": shoe["brand"],
-                "base_price": shoe["base_price"],
-                "discount_percent": shoe["discount_percent"],
-                "rating": shoe["rating"],
-                "colors": shoe["colors"],
-                "sizes": shoe["sizes"],
-                "materials": shoe["materials"],
-                "advantages": shoe["advantages"],
-                "description": shoe["description"]
-            })
-    return jsonify({"ok": True, "results": results})
+    for shoe_id in result["shoe_ids"]:
+        shoe = shoes.get(shoe_id)
+        if shoe is None:
+            continue
+        results.append(snapshot.fragments.get("priced_summary", shoe_id, shoe, priced_summary))
+    response = {
+        "ok": True,
+        "results": join_array(results),
+        "total": result["total"],
+        "limit": limit,
+        "offset": offset
+    }
+    if result["facets"] is not None:
+        response["facets"] = result["facets"]
+    return jsonify(response)
 
 # ----------------------------
 # (7 single) Shoe Details
@@ -412,20 +873,29 @@ def shoe_details():
     name = request.args.get('name')
     if not name:
         return jsonify({"ok": False, "error": "name parameter is required"}), 400
-    
-    shoe_id = find_shoe_id_by_name(name)
+
+    name = normalize_name(name)
+    fuzzy = is_truthy(request.args.get('fuzzy'))
+    return cached_json("details", (name, fuzzy), lambda: build_shoe_details(name, fuzzy))
+
+def build_shoe_details(name, fuzzy=False):
+    shoe_id = find_shoe_id_by_name(name, fuzzy=fuzzy)
     if not shoe_id:
-        return jsonify({"ok": False, "error": "Shoe not found"}), 404
-    
-    shoe = DB["shoes"].get(shoe_id)
-    
+        return {"ok": False, "error": "Shoe not found", "suggestions": name_suggestions(name)}, 404
+
+    snapshot = current_catalog()
+    shoe = snapshot.get_shoe(shoe_id)
+    if not shoe:
+        return {"ok": False, "error": "Shoe not found"}, 404
+    return join_objects({"ok": True}, details_fragment(snapshot, shoe_id, shoe)), 200
+
+def shoe_details_payload(shoe_id, shoe):
     # Get base price in USD (convert from INR by dividing by 100)
     base_price_usd = round(shoe["base_price"] / 100, 2)
     discounted_price_usd = round(base_price_usd * (100 - shoe["discount_percent"]) / 100, 2)
-    
+
     # Return shoe details without image
-    return jsonify({
-        "ok": True,
+    return {
         "shoe_id": shoe_id,
         "name": shoe["name"],
         "brand": shoe["brand"],
@@ -438,8 +908,229 @@ def shoe_details():
         "base_price": f"${base_price_usd:.2f}",
         "discount_percent": shoe["discount_percent"],
         "price_after_discount": f"${discounted_price_usd:.2f}"
+    }
+
+def details_fragment(snapshot, shoe_id, shoe):
+    return snapshot.fragments.get("details", shoe_id, shoe, shoe_details_payload)
+
+DETAILS_BATCH_MAX_SHOES = 200
+
+@api.route('/shoes/details/batch', methods=['GET', 'POST'])
+def shoe_details_batch():
+    """
+    Details for many shoes in one call, by id or by name:
+    GET /api/shoes/details/batch?shoe_ids=SHOE001,SHOE002
+    POST {"names": ["Classic Running Shoes", ...], "fuzzy": false}
+    Results keep the request order; ids or names that match nothing are listed
+    in not_found, and names also get suggestions.
+    """
+    if request.method == "POST":
+        data = request.get_json(force=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({"ok": False, "error": "Request body must be a JSON object"}), 400
+    else:
+        data = {"shoe_ids": list_arg('shoe_ids') or None, "names": list_arg('names') or None,
+                "fuzzy": request.args.get('fuzzy')}
+    by_name = data.get("names") is not None
+    if by_name == (data.get("shoe_ids") is not None):
+        return jsonify({"ok": False, "error": "Provide either shoe_ids or names"}), 400
+    field = "names" if by_name else "shoe_ids"
+    requested = data[field]
+    if not isinstance(requested, list) or not all(isinstance(v, str) and v.strip() for v in requested):
+        return jsonify({"ok": False, "error": f"{field} must be a list of non-empty strings"}), 400
+    requested = list(dict.fromkeys(v.strip() for v in requested))
+    if len(requested) > DETAILS_BATCH_MAX_SHOES:
+        return jsonify({"ok": False, "error": f"At most {DETAILS_BATCH_MAX_SHOES} {field} per request"}), 400
+
+    fuzzy = is_truthy(data.get("fuzzy"))
+    snapshot = current_catalog()
+    results, not_found, resolved, suggestions = [], [], {}, {}
+    for value in requested:
+        shoe_id = find_shoe_id_by_name(normalize_name(value), fuzzy=fuzzy) if by_name else value
+        shoe = snapshot.get_shoe(shoe_id) if shoe_id else None
+        if shoe is None:
+            not_found.append(value)
+            if by_name:
+                suggestions[value] = name_suggestions(value)
+            continue
+        if by_name:
+            resolved[value] = shoe_id
+        results.append(details_fragment(snapshot, shoe_id, shoe))
+
+    response = {"ok": True, "results": join_array(results), "not_found": not_found}
+    if by_name:
+        response["resolved"] = resolved
+        response["suggestions"] = suggestions
+    return jsonify(response)
+
+# ----------------------------
+# Similar Shoes
+# ----------------------------
+@api.route('/shoes/similar', methods=['GET'])
+def similar_shoes():
+    """
+    Recommendations for one shoe, most similar first:
+    GET /api/shoes/similar?shoe_id=SHOE001&limit=5
+    Lists are precomputed with the catalog snapshot, so this is a lookup.
+    """
+    shoe_id = (request.args.get('shoe_id') or "").strip()
+    if not shoe_id:
+        return jsonify({"ok": False, "error": "shoe_id parameter is required"}), 400
+    limit, error = int_arg('limit', SIMILAR_TOP_K, 1, SIMILAR_TOP_K)
+    if error:
+        return jsonify({"ok": False, "error": error}), 400
+
+    return cached_json("similar", (shoe_id, limit), lambda: build_similar(shoe_id, limit))
+
+def build_similar(shoe_id, limit):
+    snapshot = current_catalog()
+    neighbours = snapshot.similar.similar(shoe_id, limit)
+    if neighbours is None:
+        return {"ok": False, "error": "Shoe not found"}, 404
+    shoes = snapshot.get_shoes([other for other, _ in neighbours])
+    results = []
+    for other, similarity in neighbours:
+        shoe = shoes.get(other)
+        if shoe is None:
+            continue
+        results.append(summary_fragment(snapshot, other, shoe, similarity=similarity))
+    return {"ok": True, "shoe_id": shoe_id, "results": join_array(results)}, 200
+
+# ----------------------------
+# Batch Availability
+# ----------------------------
+AVAILABILITY_MAX_SHOES = 200
+
+@api.route('/inventory/availability', methods=['GET'])
+def batch_availability():
+    """
+    Size/color grids for several shoes in one call:
+    GET /api/inventory/availability?shoe_ids=SHOE001,SHOE002
+    """
+    shoe_ids = [s.strip() for s in (request.args.get('shoe_ids') or "").split(",") if s.strip()]
+    if not shoe_ids:
+        return jsonify({"ok": False, "error": "shoe_ids parameter is required"}), 400
+    if len(shoe_ids) > AVAILABILITY_MAX_SHOES:
+        return jsonify({"ok": False, "error": f"At most {AVAILABILITY_MAX_SHOES} shoe_ids per request"}), 400
+
+    results = {}
+    not_found = []
+    for shoe_id, grid in repo.availability_many(list(dict.fromkeys(shoe_ids))).items():
+        if grid is None:
+            not_found.append(shoe_id)
+            continue
+        results[shoe_id] = {
+            "available_sizes_by_color": grid["by_color"],
+            "available_colors_by_size": grid["by_size"]
+        }
+    return jsonify({"ok": True, "results": results, "not_found": not_found})
+
+# ----------------------------
+# Reservations: reserve -> confirm | release
+# ----------------------------
+HOLD_MAX_QUANTITY = 10
+HOLD_MIN_TTL_SECONDS = 10
+HOLD_MAX_TTL_SECONDS = 900
+
+@api.route('/inventory/reserve', methods=['POST'])
+def reserve_stock():
+    """
+    Hold stock for a customer while they check out:
+    {"shoe_id": "SHOE001", "color": "red", "size": 9, "customer_id": "CUST001", "quantity": 1, "ttl_seconds": 300}
+    The hold expires on its own unless confirmed or released first. Holds
+    are advisory: the SKU is kept from other customers while the hold is
+    pending, but stock has no counts, so quantity only goes onto the order.
+    """
+    data = request.get_json(force=True) or {}
+    shoe_id = data.get("shoe_id")
+    color = (data.get("color") or "").lower()
+    size = data.get("size")
+    customer_id = data.get("customer_id")
+    quantity = data.get("quantity", 1)
+    ttl = data.get("ttl_seconds", DEFAULT_TTL_SECONDS)
+
+    if not all([shoe_id, color, size, customer_id]):
+        return jsonify({"ok": False, "error": "shoe_id, color, size, customer_id are required"}), 400
+    if not isinstance(quantity, int) or isinstance(quantity, bool) or not 1 <= quantity <= HOLD_MAX_QUANTITY:
+        return jsonify({"ok": False, "error": f"quantity must be an integer between 1 and {HOLD_MAX_QUANTITY}"}), 400
+    if not isinstance(ttl, (int, float)) or isinstance(ttl, bool) or \
+            not HOLD_MIN_TTL_SECONDS <= ttl <= HOLD_MAX_TTL_SECONDS:
+        return jsonify({
+            "ok": False,
+            "error": f"ttl_seconds must be between {HOLD_MIN_TTL_SECONDS} and {HOLD_MAX_TTL_SECONDS}"
+        }), 400
+
+    shoe = current_catalog().get_shoe(shoe_id)
+    if not shoe:
+        return jsonify({"ok": False, "error": "Shoe not found"}), 404
+    if color not in shoe["colors"]:
+        return jsonify({"ok": False, "error": f"Color '{color}' is not available for this shoe"}), 400
+    if size not in shoe["sizes"]:
+        return jsonify({"ok": False, "error": f"Size '{size}' is not available for this shoe"}), 400
+
+    hold, reason = reservations.reserve(shoe_id, color, size, quantity, customer_id, ttl)
+    if reason == CUSTOMER_LIMIT:
+        return jsonify({
+            "ok": False,
+            "error": f"At most {reservations.per_customer} pending holds per customer; confirm or release one first"
+        }), 429
+    if reason == LIMIT:
+        return jsonify({"ok": False, "error": "Too many pending holds; try again shortly"}), 503
+    if hold is None:
+        return jsonify({"ok": False, "error": f"{color} not available in size {size}"}), 409
+    return jsonify({"ok": True, "hold": hold.to_dict()})
+
+@api.route('/inventory/confirm', methods=['POST'])
+def confirm_reservation():
+    """Turn a live hold into an order: {"hold_id", "customer_id", "shipping_address", "payment_method"}."""
+    data = request.get_json(force=True) or {}
+    hold_id = data.get("hold_id")
+    customer_id = data.get("customer_id")
+    shipping_address = data.get("shipping_address")
+    payment_method = (data.get("payment_method") or "COD").upper()
+
+    if not all([hold_id, customer_id, shipping_address]):
+        return jsonify({"ok": False, "error": "hold_id, customer_id, shipping_address are required"}), 400
+    if payment_method not in ["COD", "CARD"]:
+        return jsonify({"ok": False, "error": "Payment method must be COD or CARD"}), 400
+
+    hold = reservations.confirm(hold_id, customer_id)
+    if hold is None:
+        return jsonify({"ok": False, "error": "Reservation not found or expired"}), 404
+
+    order = {
+        "customer_id": customer_id,
+        "shoe_id": hold.shoe_id,
+        "size": hold.size,
+        "color": hold.color,
+        "quantity": hold.quantity,
+        "status": "PLACED",
+        "shipping_address": shipping_address,
+        "payment_method": payment_method,
+        "created_at": datetime.now().isoformat()
+    }
+    order_id = repo.create_order(order)
+    return jsonify({
+        "ok": True,
+        "order_id": order_id,
+        "hold_id": hold_id,
+        "message": f"Order placed successfully with {payment_method}.\nOrder ID: {order_id}, "
+                   f"Size: {hold.size}, Color: {hold.color}, Quantity: {hold.quantity}."
     })
 
+@api.route('/inventory/release', methods=['POST'])
+def release_reservation():
+    """Give held stock back early: {"hold_id", "customer_id"}."""
+    data = request.get_json(force=True) or {}
+    hold_id = data.get("hold_id")
+    customer_id = data.get("customer_id")
+    if not hold_id or not customer_id:
+        return jsonify({"ok": False, "error": "hold_id and customer_id are required"}), 400
+    hold = reservations.release(hold_id, customer_id)
+    if hold is None:
+        return jsonify({"ok": False, "error": "Reservation not found or expired"}), 404
+    return jsonify({"ok": True, "hold_id": hold_id, "message": "Reservation released."})
+
 # ----------------------------
 # (8 & 9 combined) Compare or Order
 # ----------------------------
@@ -447,25 +1138,38 @@ def shoe_details():
 def compare_or_order():
     """
     Combines:
-    - action='compare' : compare two shoes
+    - action='compare' : compare two shoes (shoe_name_a / shoe_name_b),
+                         or 2-20 shoes at once via shoe_names or shoe_ids
     - action='order'   : create an order (COD)
     """
     data = request.get_json(force=True) or {}
     action = (data.get("action") or "").strip().lower()
 
+    if action == "compare" and ("shoe_names" in data or "shoe_ids" in data):
+        return compare_many(data)
+
     if action == "compare":
         a_name = data.get("shoe_name_a")
         b_name = data.get("shoe_name_b")
         if not a_name or not b_name:
             return jsonify({"ok": False, "error": "shoe_name_a and shoe_name_b are required"}), 400
 
-        a_id = find_shoe_id_by_name(a_name)
-        b_id = find_shoe_id_by_name(b_name)
+        fuzzy = is_truthy(data.get("fuzzy"))
+        a_id = find_shoe_id_by_name(a_name, fuzzy=fuzzy)
+        b_id = find_shoe_id_by_name(b_name, fuzzy=fuzzy)
         if not a_id or not b_id:
-            return jsonify({"ok": False, "error": "Shoe name(s) not found"}), 404
+            suggestions = {}
+            if not a_id:
+                suggestions["shoe_name_a"] = name_suggestions(a_name)
+            if not b_id:
+                suggestions["shoe_name_b"] = name_suggestions(b_name)
+            return jsonify({"ok": False, "error": "Shoe name(s) not found", "suggestions": suggestions}), 404
 
-        a = DB["shoes"].get(a_id)
-        b = DB["shoes"].get(b_id)
+        snapshot = current_catalog()
+        a = snapshot.get_shoe(a_id)
+        b = snapshot.get_shoe(b_id)
+        if not a or not b:
+            return jsonify({"ok": False, "error": "Shoe name(s) not found"}), 404
 
         a_price = price_after_discount(a)
         b_price = price_after_discount(b)
@@ -473,23 +1177,17 @@ def compare_or_order():
             "cheaper_shoe": a_id if a_price < b_price else b_id if b_price < a_price else "equal",
             "difference": abs(a_price - b_price)
         }
+        a_advs = set(a["advantages"])
+        b_advs = set(b["advantages"])
         advantages = {
-            "unique_to_a": [adv for adv in a["advantages"] if adv not in b["advantages"]],
-            "unique_to_b": [adv for adv in b["advantages"] if adv not in a["advantages"]],
-            "common": [adv for adv in a["advantages"] if adv in b["advantages"]]
+            "unique_to_a": [adv for adv in a["advantages"] if adv not in b_advs],
+            "unique_to_b": [adv for adv in b["advantages"] if adv not in a_advs],
+            "common": [adv for adv in a["advantages"] if adv in b_advs]
         }
         return jsonify({
             "ok": True,
-            "shoe_a": {
-                "shoe_id": a_id, "name": a["name"], "price": a["base_price"],
-                "discount_percent": a["discount_percent"], "price_after_discount": a_price,
-                "rating": a["rating"], "advantages": a["advantages"]
-            },
-            "shoe_b": {
-                "shoe_id": b_id, "name": b["name"], "price": b["base_price"],
-                "discount_percent": b["discount_percent"], "price_after_discount": b_price,
-                "rating": b["rating"], "advantages": b["advantages"]
-            },
+            "shoe_a": compare_fragment(snapshot, a_id, a),
+            "shoe_b": compare_fragment(snapshot, b_id, b),
             "comparison": {
                 "price_benefit": price_benefit,
                 "rating_diff": round(a["rating"] - b["rating"], 2),
@@ -511,22 +1209,17 @@ def compare_or_order():
         if payment_method not in ["COD", "CARD"]:
             return jsonify({"ok": False, "error": "Payment method must be COD or CARD"}), 400
 
-        shoe = DB["shoes"].get(shoe_id)
+        shoe = current_catalog().get_shoe(shoe_id)
         if not shoe:
             return jsonify({"ok": False, "error": "Shoe not found"}), 404
         if color not in shoe["colors"]:
             return jsonify({"ok": False, "error": f"Color '{color}' is not available for this shoe"}), 400
         if size not in shoe["sizes"]:
             return jsonify({"ok": False, "error": f"Size '{size}' is not available for this shoe"}), 400
-        if not check_availability(shoe_id, color, size):
+        if not check_availability(shoe_id, color, size, customer_id):
             return jsonify({"ok": False, "error": f"{color} not available in size {size}"}), 409
 
-        # If no order_id provided, create a new one
-        if not order_id:
-            next_id_num = 1000 + len(DB["orders"]) + 1
-            order_id = f"ORD{next_id_num}"
-        
-        DB["orders"][order_id] = {
+        order = {
             "customer_id": customer_id,
             "shoe_id": shoe_id,
             "size": size,
@@ -536,23 +1229,350 @@ def compare_or_order():
             "payment_method": payment_method,
             "created_at": datetime.now().isoformat()
         }
+        # If no order_id provided, allocate a new one atomically
+        if order_id:
+            repo.put_order(order_id, order)
+        else:
+            order_id = repo.create_order(order)
 
         message = (
             f"Order placed successfully with {payment_method}.\n"
             f"Order ID: {order_id}, Product: {shoe['name']}, Size: {size}, Color: {color}.\n"
             f"Payment Method: {payment_method}.\n"
-            f"Shipping to: {shipping_address.get('name')}, {shipping_address.get('line1')}, {shipping_address.get('line2')}, "
-            f"{shipping_address.get('city')}, {shipping_address.get('state')} - {shipping_address.get('pincode')}, "
-            f"{shipping_address.get('phone')}."
+            f"Shipping to: {format_address(shipping_address)}."
         )
         return jsonify({"ok": True, "order_id": order_id, "message": message})
 
     else:
         return jsonify({"ok": False, "error": "Invalid or missing 'action'. Use compare|order"}), 400
 
+def compare_fragment(snapshot, shoe_id, shoe):
+    return snapshot.fragments.get("compare", shoe_id, shoe,
+                                  lambda shoe_id, shoe: compare_summary(shoe_id, shoe, price_after_discount(shoe)))
+
+def compare_many(data):
+    """N-way compare: resolve every name/id, then build all matrices in one batched pass."""
+    if "shoe_ids" in data:
+        requested = data.get("shoe_ids")
+        field = "shoe_ids"
+    else:
+        requested = data.get("shoe_names")
+        field = "shoe_names"
+    if not isinstance(requested, list) or not all(isinstance(v, str) and v for v in requested):
+        return jsonify({"ok": False, "error": f"{field} must be a list of non-empty strings"}), 400
+
+    shoe_ids = []
+    missing = {}
+    fuzzy = is_truthy(data.get("fuzzy"))
+    snapshot = current_catalog()
+    known = snapshot.get_shoes(requested) if field == "shoe_ids" else None
+    for value in requested:
+        if field == "shoe_names":
+            shoe_id = find_shoe_id_by_name(value, fuzzy=fuzzy)
+        else:
+            shoe_id = value if value in known else None
+        if not shoe_id:
+            missing[value] = name_suggestions(value) if field == "shoe_names" else []
+        elif shoe_id not in shoe_ids:
+            shoe_ids.append(shoe_id)
+    if missing:
+        return jsonify({"ok": False, "error": "Shoe(s) not found", "not_found": list(missing), "suggestions": missing}), 404
+    if not COMPARE_MIN_SHOES <= len(shoe_ids) <= COMPARE_MAX_SHOES:
+        return jsonify({
+            "ok": False,
+            "error": f"Provide between {COMPARE_MIN_SHOES} and {COMPARE_MAX_SHOES} distinct shoes to compare"
+        }), 400
+
+    shoes = snapshot.get_shoes(shoe_ids)
+    if len(shoes) != len(shoe_ids):
+        return jsonify({"ok": False, "error": "Shoe(s) not found"}), 404
+    summaries = join_array([compare_fragment(snapshot, shoe_id, shoes[shoe_id]) for shoe_id in shoe_ids])
+    result = compare_shoes(snapshot.columnar, shoes, shoe_ids, summaries=summaries)
+    if result is None:
+        return jsonify({"ok": False, "error": "Shoe(s) not found"}), 404
+    return jsonify({"ok": True, **result})
+
+# ----------------------------
+# Bulk Orders
+# ----------------------------
+BULK_ORDER_MAX_ITEMS = 100
+BULK_ORDER_MAX_QUANTITY = 10
+
+def bulk_item(data, item):
+    """Merge an item over the request-level defaults and validate it; returns (order, status, error)."""
+    if not isinstance(item, dict):
+        return None, 400, "Each item must be an object"
+    merged = {field: data.get(field) for field in ("customer_id", "shipping_address", "payment_method")}
+    merged.update(item)
+    shoe_id = merged.get("shoe_id")
+    color = (merged.get("color") or "").lower()
+    size = merged.get("size")
+    shipping_address = merged.get("shipping_address")
+    payment_method = (merged.get("payment_method") or "COD").upper()
+    customer_id = merged.get("customer_id")
+    quantity = merged.get("quantity", 1)
+
+    if not all([shoe_id, color, size, shipping_address, customer_id]):
+        return None, 400, "shoe_id, color, size, shipping_address, customer_id are required"
+    if payment_method not in ["COD", "CARD"]:
+        return None, 400, "Payment method must be COD or CARD"
+    if not isinstance(quantity, int) or isinstance(quantity, bool) or not 1 <= quantity <= BULK_ORDER_MAX_QUANTITY:
+        return None, 400, f"quantity must be an integer between 1 and {BULK_ORDER_MAX_QUANTITY}"
+    shoe = current_catalog().get_shoe(shoe_id)
+    if not shoe:
+        return None, 404, "Shoe not found"
+    if color not in shoe["colors"]:
+        return None, 400, f"Color '{color}' is not available for this shoe"
+    if size not in shoe["sizes"]:
+        return None, 400, f"Size '{size}' is not available for this shoe"
+    return {
+        "customer_id": customer_id,
+        "shoe_id": shoe_id,
+        "size": size,
+        "color": color,
+        "quantity": quantity,
+        "status": "PLACED",
+        "shipping_address": shipping_address,
+        "payment_method": payment_method
+    }, 200, None
+
+@api.route('/orders/bulk', methods=['POST'])
+def bulk_orders():
+    """
+    Place many orders in one call:
+    {"customer_id": "CUST001", "shipping_address": {...}, "payment_method": "COD",
+     "items": [{"shoe_id": "SHOE001", "color": "red", "size": 9, "quantity": 2}, ...], "atomic": false}
+    Top-level customer_id / shipping_address / payment_method are defaults an
+    item may override. Every item is validated first, then stock for all of
+    them is read in one availability_many() call, and the hold check runs
+    together with the writes in one pass (repo.place_orders). results[i]
+    reports items[i]. With "atomic": true nothing is placed unless every
+    item can be.
+    """
+    data = request.get_json(force=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"ok": False, "error": "Request body must be a JSON object"}), 400
+    items = data.get("items")
+    if not isinstance(items, list) or not items:
+        return jsonify({"ok": False, "error": "items must be a non-empty list"}), 400
+    if len(items) > BULK_ORDER_MAX_ITEMS:
+        return jsonify({"ok": False, "error": f"At most {BULK_ORDER_MAX_ITEMS} items per request"}), 400
+    atomic = is_truthy(data.get("atomic"))
+
+    results = [None] * len(items)
+    valid = []  # (index, order)
+    for index, item in enumerate(items):
+        order, status, error = bulk_item(data, item)
+        if order is None:
+            results[index] = {"index": index, "ok": False, "status": status, "error": error}
+        else:
+            valid.append((index, order))
+
+    grids = repo.availability_many({order["shoe_id"] for _, order in valid})
+    in_stock = []
+    for index, order in valid:
+        grid = grids.get(order["shoe_id"])
+        if grid is not None and order["size"] in grid["by_color"].get(order["color"], ()):
+            in_stock.append((index, order))
+        else:
+            results[index] = {"index": index, "ok": False, "status": 409,
+                              "error": f"{order['color']} not available in size {order['size']}"}
+
+    placed = []
+    if in_stock and (not atomic or len(in_stock) == len(items)):
+        created_at = datetime.now().isoformat()
+        for _, order in in_stock:
+            order["created_at"] = created_at
+        order_ids, blocked = repo.place_orders([order for _, order in in_stock], reservations.clock(), atomic)
+        for i, ((index, order), order_id) in enumerate(zip(in_stock, order_ids)):
+            if order_id is not None:
+                placed.append(index)
+                results[index] = {"index": index, "ok": True, "order_id": order_id, "shoe_id": order["shoe_id"],
+                                  "color": order["color"], "size": order["size"], "quantity": order["quantity"]}
+            elif i in blocked:
+                results[index] = {"index": index, "ok": False, "status": 409,
+                                  "error": f"{order['color']} not available in size {order['size']}"}
+    for index, _ in in_stock:
+        if results[index] is None:
+            results[index] = {"index": index, "ok": False, "status": 409, "error": "Not placed: another item failed"}
+
+    if atomic and not placed:
+        return jsonify({"ok": False, "error": "No orders placed: some items failed", "placed": 0,
+                        "failed": len(items), "results": results}), 409
+    return jsonify({"ok": True, "placed": len(placed), "failed": len(items) - len(placed), "results": results})
+
 # Register blueprint
 app.register_blueprint(api)
 
+# ----------------------------
+# Request Metrics
+# ----------------------------
+# Prometheus text at /metrics; requests slower than SHOEHUB_SLOW_REQUEST_MS
+# (0 disables profiling) get a sampled stack profile at /metrics/slow. Both
+# are only served when SHOEHUB_METRICS_TOKEN is set, to requests sending
+# "Authorization: Bearer <token>".
+request_metrics = RequestMetrics(
+    app,
+    token=os.environ.get("SHOEHUB_METRICS_TOKEN") or None,
+    slow_threshold=float(os.environ.get("SHOEHUB_SLOW_REQUEST_MS", "500")) / 1000,
+    sample_interval=float(os.environ.get("SHOEHUB_PROFILE_INTERVAL_MS", "5")) / 1000
+)
+request_metrics.add_metric("catalog_version", "gauge", "Catalog version; bumps on every catalog change.",
+                           lambda: catalog_version.value)
+request_metrics.add_metric("catalog_shoes", "gauge", "Shoes in the published catalog snapshot.",
+                           lambda: len(catalog))
+if catalog_watcher is not None:
+    request_metrics.add_metric("catalog_reloads_total", "counter", "Catalog file versions published.",
+                               lambda: catalog_watcher.stats["reloads"])
+    request_metrics.add_metric("catalog_reload_errors_total", "counter", "Catalog file versions rejected.",
+                               lambda: catalog_watcher.stats["errors"])
+    request_metrics.add_metric("catalog_reload_seconds", "gauge", "Parse, index and publish time of the last reload.",
+                               lambda: catalog_watcher.stats["last_reload_seconds"])
+request_metrics.add_metric("response_cache_entries", "gauge", "Cached catalog responses.", lambda: len(response_cache))
+request_metrics.add_metric("response_cache_hits_total", "counter", "Catalog response cache hits.",
+                           lambda: response_cache.hits)
+request_metrics.add_metric("response_cache_misses_total", "counter", "Catalog response cache misses.",
+                           lambda: response_cache.misses)
+request_metrics.add_metric("reservations_pending", "gauge", "Stock holds awaiting confirm, release or expiry.",
+                           lambda: len(reservations))
+request_metrics.add_metric("reservations_expired_total", "counter", "Stock holds released by TTL expiry.",
+                           lambda: reservations.stats["expired"])
+request_metrics.add_metric("image_variant_encodes_total", "counter", "Image variants encoded.",
+                           lambda: image_derivatives.stats["encodes"])
+request_metrics.add_metric("image_variant_coalesced_total", "counter",
+                           "Image variant requests that joined an in-flight encode.",
+                           lambda: image_derivatives.stats["coalesced"])
+
+# ----------------------------
+# Admission Control
+# ----------------------------
+# API reads and writes get separate budgets: a token bucket per client and
+# route (429 when empty) and a shared concurrency cap with a short bounded
+# wait queue (503 when full), both answered with Retry-After. The defaults
+# give writes at most 3 and reads at most 5 of the 8 threads a
+# multi-process worker runs, so a checkout storm leaves browsing its own
+# threads. Clients are told apart by remote address. Behind trusted proxies,
+# set SHOEHUB_CLIENT_HEADER to the header they append the client address to
+# (normally X-Forwarded-For) and SHOEHUB_CLIENT_HEADER_HOPS to how many of
+# them there are: the address that many entries from the right is the one
+# the outermost proxy saw. Entries further left come from the client and
+# are ignored, since anyone can send them. SHOEHUB_ADMISSION=off disables
+# all of it.
+def budget_from_env(name, rate, burst, concurrency, queue):
+    env = f"SHOEHUB_{name.upper()}"
+    return Budget(
+        name,
+        rate=float(os.environ.get(f"{env}_RATE", str(rate))),
+        burst=int(os.environ.get(f"{env}_BURST", str(burst))),
+        concurrency=int(os.environ.get(f"{env}_CONCURRENCY", str(concurrency))),
+        queue=int(os.environ.get(f"{env}_QUEUE", str(queue))),
+        timeout=float(os.environ.get("SHOEHUB_ADMISSION_WAIT_MS", "250")) / 1000
+    )
+
+CLIENT_HEADER = os.environ.get("SHOEHUB_CLIENT_HEADER")
+CLIENT_HEADER_HOPS = max(1, int(os.environ.get("SHOEHUB_CLIENT_HEADER_HOPS", "1")))
+
+def client_key(req):
+    if CLIENT_HEADER:
+        # Every occurrence of the header, in order, as one comma-separated list
+        entries = [entry.strip() for value in req.headers.getlist(CLIENT_HEADER) for entry in value.split(",")]
+        if len(entries) >= CLIENT_HEADER_HOPS and entries[-CLIENT_HEADER_HOPS]:
+            return entries[-CLIENT_HEADER_HOPS]
+    return remote_client(req)
+
+# POSTs that only read: batch details, and the compare action of /compare-or-order
+READ_ONLY_POST_ENDPOINTS = frozenset(("api.shoe_details_batch",))
+
+def classify_request(req):
+    budget = reads_and_writes(req)
+    if budget != "write":
+        return budget
+    if req.endpoint in READ_ONLY_POST_ENDPOINTS:
+        return "read"
+    if req.endpoint == "api.compare_or_order":
+        data = req.get_json(force=True, silent=True)
+        if isinstance(data, dict) and str(data.get("action") or "").strip().lower() == "compare":
+            return "read"
+    return budget
+
+def request_cost(req):
+    """Rate-limit tokens a request spends: one, or one per item for bulk orders."""
+    if req.endpoint == "api.bulk_orders":
+        data = req.get_json(force=True, silent=True)
+        items = data.get("items") if isinstance(data, dict) else None
+        if isinstance(items, list):
+            return min(max(len(items), 1), BULK_ORDER_MAX_ITEMS)
+    return 1
+
+admission = None
+if os.environ.get("SHOEHUB_ADMISSION", "on").lower() not in ("0", "off", "false", "no"):
+    admission = AdmissionControl(app, budgets=(
+        budget_from_env("read", rate=50, burst=100, concurrency=5, queue=0),
+        budget_from_env("write", rate=5, burst=10, concurrency=2, queue=1),
+    ), classify=classify_request, client_key=client_key, cost=request_cost)
+    for budget in admission.budgets.values():
+        for outcome, help_text in (("admitted", "admitted"), ("throttled", "refused with 429 by the rate limit"),
+                                   ("shed", "refused with 503 at the concurrency cap")):
+            request_metrics.add_metric(f"admission_{budget.name}_{outcome}_total", "counter",
+                                       f"API {budget.name} requests {help_text}.",
+                                       lambda budget=budget, outcome=outcome: budget.stats[outcome])
+        if budget.gate is not None:
+            request_metrics.add_metric(f"admission_{budget.name}_active", "gauge",
+                                       f"API {budget.name} requests holding a concurrency slot.",
+                                       lambda gate=budget.gate: gate.active)
+            request_metrics.add_metric(f"admission_{budget.name}_queued", "gauge",
+                                       f"API {budget.name} requests waiting for a concurrency slot.",
+                                       lambda gate=budget.gate: gate.waiting)
+
+# ----------------------------
+# Multi-process Serving
+# ----------------------------
+def serve_multiprocess(workers, host='0.0.0.0', port=8080, threads=8):
+    """
+    Pre-fork N waitress workers on one listening socket. Every worker reads
+    and writes orders, inventory and stock holds in the same SQLite
+    database, so they all answer from the same stock. The catalog snapshot
+    is built once before forking and the file watcher is stopped, so
+    restart to load a new catalog. The response cache, admission budgets
+    and request metrics are per worker.
+    """
+    if not hasattr(os, "fork"):
+        raise SystemExit("Multi-process mode needs os.fork (POSIX only)")
+    if repo.name != "sqlite":
+        raise SystemExit("Multi-process mode keeps orders and inventory in SQLite; set SHOEHUB_STORAGE=sqlite")
+    from waitress import serve
+
+    if catalog_watcher is not None:
+        catalog_watcher.stop()  # each worker would reload on its own; restart to reload
+    repo.close()  # never carry an open SQLite connection across fork; workers open their own
+
+    sock = socket.create_server((host, port), backlog=1024)
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                image_derivatives.start()
+                serve(app, sockets=[sock], threads=threads)
+            finally:
+                os._exit(0)
+        children.append(pid)
+    sock.close()
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f"Server started on http://127.0.0.1:{port} with {workers} workers")
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
 if __name__ == '__main__':
-    print("Server started on http://127.0.0.1:8080")
-    app.run(host='0.0.0.0', port=8080, debug=False)
+    # Image encode workers re-import the __main__ script, so the entry point
+    # lives in serve.py rather than in the module that builds the app.
+    sys.exit("Start the server with: python serve.py")
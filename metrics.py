@@ -0,0 +1,290 @@
+import hmac
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict, deque
+
+from flask import current_app, jsonify, request
+
+# Latency bucket upper bounds in seconds (Prometheus `le` labels).
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = "<unmatched>"
+PROMETHEUS_MIMETYPE = "text/plain; version=0.0.4; charset=utf-8"
+MAX_STACK_DEPTH = 64
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(pairs):
+    return "{" + ",".join(f'{k}="{_label_value(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size):
+        self.counts = [0] * (size + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+
+def collapse_stack(frame):
+    """Root-first "file:function:line;..." string, the folded format flame graph tools read."""
+    parts = []
+    while frame is not None and len(parts) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+class SlowRequestProfiler:
+    """
+    Statistical stack sampler for slow requests.
+
+    Request threads register when they start. A single sampler thread wakes
+    every `interval` seconds while requests are in flight and, for each
+    request that has run longer than half the threshold, records the
+    thread's current stack. Requests that finish under the threshold just
+    drop their samples; the rest become a report with the hottest stacks.
+    Fast requests therefore cost two dict operations and are never sampled.
+    """
+
+    def __init__(self, threshold, interval=0.005, max_reports=50, logger=None):
+        self.threshold = threshold
+        self.interval = interval
+        self.trigger = threshold / 2
+        self.logger = logger
+        self.reports = deque(maxlen=max_reports)
+        self.slow_requests = 0
+        self._lock = threading.Lock()
+        self._has_active = threading.Condition(self._lock)
+        self._active = {}  # thread ident -> [started, Counter of stacks or None]
+        self._running = False
+        if hasattr(os, "register_at_fork"):
+            # The sampler thread does not survive a fork; forked workers start their own
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._has_active = threading.Condition(self._lock)
+        self._active = {}
+        self._running = False
+
+    def begin(self, started):
+        with self._lock:
+            if not self._running:
+                self._running = True
+                threading.Thread(target=self._run, name="slow-request-sampler", daemon=True).start()
+            was_idle = not self._active
+            self._active[threading.get_ident()] = [started, None]
+            if was_idle:
+                self._has_active.notify()
+
+    def end(self, duration, describe):
+        """Finish the current thread's request; describe() supplies report fields if it was slow."""
+        with self._lock:
+            entry = self._active.pop(threading.get_ident(), None)
+        if entry is None or duration < self.threshold:
+            return None
+        samples = entry[1] or Counter()
+        details = describe()
+        report = dict(details)
+        report["duration_ms"] = round(duration * 1000, 3)
+        report["samples"] = sum(samples.values())
+        report["sample_interval_ms"] = self.interval * 1000
+        report["stacks"] = [{"stack": stack, "count": count} for stack, count in samples.most_common(10)]
+        self.reports.append(report)
+        self.slow_requests += 1
+        if self.logger is not None:
+            hottest = report["stacks"][0]["stack"].rsplit(";", 3)[-3:] if report["stacks"] else []
+            self.logger.warning("Slow request %s %s: %.0f ms (%d samples), hottest frames: %s",
+                                details.get("method"), details.get("path"), duration * 1000,
+                                report["samples"], " <- ".join(reversed(hottest)))
+        return report
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._active:
+                    self._has_active.wait()
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            with self._lock:
+                due = [(ident, entry) for ident, entry in self._active.items() if now - entry[0] >= self.trigger]
+                if not due:
+                    continue
+                frames = sys._current_frames()
+                for ident, entry in due:
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        if entry[1] is None:
+                            entry[1] = Counter()
+                        entry[1][collapse_stack(frame)] += 1
+                del frames
+
+
+class RequestMetrics:
+    """
+    Per-route request instrumentation for a Flask app.
+
+    Records a latency histogram per (route, method, status) and an in-flight
+    gauge per route, using the URL rule (e.g. /api/shoes/search) rather
+    than the raw path so label cardinality stays bounded. Exposes them in
+    Prometheus text format at /metrics, together with any gauges or
+    counters registered through add_metric(). Slow requests are profiled by
+    a SlowRequestProfiler and listed at /metrics/slow, with their query
+    strings dropped. Both endpoints exist only when a `token` is given and
+    then answer only requests carrying "Authorization: Bearer <token>";
+    without one, render() is the only way to read the numbers.
+
+    Latency is measured until the view returns, so streamed bodies (large
+    static files, NDJSON exports) count only their setup time. Each worker
+    process of a multi-process server keeps its own numbers.
+    """
+
+    def __init__(self, app=None, buckets=DEFAULT_BUCKETS, slow_threshold=0.5, sample_interval=0.005,
+                 prefix="shoehub", token=None):
+        self.buckets = tuple(buckets)
+        self.token = token
+        self.prefix = prefix
+        self.slow_threshold = slow_threshold
+        self.sample_interval = sample_interval
+        self.profiler = None
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._in_flight = defaultdict(int)
+        self._extra = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if self.slow_threshold:
+            self.profiler = SlowRequestProfiler(self.slow_threshold, self.sample_interval, logger=app.logger)
+        app.before_request(self._before)
+        app.after_request(self._after)
+        app.teardown_request(self._teardown)
+        if self.token:
+            app.add_url_rule("/metrics", "metrics", self.metrics_view)
+            app.add_url_rule("/metrics/slow", "slow_requests", self.slow_requests_view)
+
+    def add_metric(self, name, kind, help_text, read):
+        """Export read() (a number) as <prefix>_<name>; kind is "gauge" or "counter"."""
+        self._extra.append((f"{self.prefix}_{name}", kind, help_text, read))
+
+    # ----------------------------
+    # Request hooks
+    # ----------------------------
+    # Each hook resolves the request proxy once; attribute access through
+    # the werkzeug LocalProxy costs about as much as the rest of the hook.
+    def _before(self):
+        req = request._get_current_object()
+        route = req.url_rule.rule if req.url_rule is not None else UNMATCHED_ROUTE
+        started = time.perf_counter()
+        req.metrics_state = [route, started, None]
+        with self._lock:
+            self._in_flight[route] += 1
+        if self.profiler is not None:
+            self.profiler.begin(started)
+
+    def _after(self, response):
+        state = getattr(request._get_current_object(), "metrics_state", None)
+        if state is not None:
+            state[2] = response.status_code
+        return response
+
+    def _teardown(self, exc):
+        req = request._get_current_object()
+        state = getattr(req, "metrics_state", None)
+        if state is None:
+            return
+        req.metrics_state = None
+        route, started, status = state
+        if status is None:
+            status = 500
+        duration = time.perf_counter() - started
+        self.observe(route, req.method, status, duration)
+        with self._lock:
+            self._in_flight[route] -= 1
+        if self.profiler is not None:
+            self.profiler.end(duration, lambda: {"route": route, "method": req.method,
+                                                 "path": req.path, "status": status})
+
+    def observe(self, route, method, status, duration):
+        index = bisect_left(self.buckets, duration)
+        key = (route, method, status)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram(len(self.buckets))
+            hist.counts[index] += 1
+            hist.sum += duration
+            hist.count += 1
+
+    # ----------------------------
+    # Exposition
+    # ----------------------------
+    def render(self):
+        with self._lock:
+            histograms = [(key, list(h.counts), h.sum, h.count) for key, h in sorted(self._histograms.items())]
+            in_flight = sorted(self._in_flight.items())
+
+        name = f"{self.prefix}_http_request_duration_seconds"
+        lines = [f"# HELP {name} Request latency by route, method and status.", f"# TYPE {name} histogram"]
+        bounds = self.buckets + (float("inf"),)
+        for (route, method, status), counts, total, count in histograms:
+            base = [("route", route), ("method", method), ("status", status)]
+            cumulative = 0
+            for bound, n in zip(bounds, counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels(base + [('le', _number(bound))])} {cumulative}")
+            lines.append(f"{name}_sum{_labels(base)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(base)} {count}")
+
+        name = f"{self.prefix}_http_requests_in_flight"
+        lines += [f"# HELP {name} Requests currently being handled, by route.", f"# TYPE {name} gauge"]
+        lines += [f"{name}{_labels([('route', route)])} {value}" for route, value in in_flight]
+
+        if self.profiler is not None:
+            name = f"{self.prefix}_slow_requests_total"
+            lines += [f"# HELP {name} Requests slower than {self.slow_threshold}s that were profiled.",
+                      f"# TYPE {name} counter", f"{name} {self.profiler.slow_requests}"]
+
+        for name, kind, help_text, read in self._extra:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {_number(read())}"]
+        return "\n".join(lines) + "\n"
+
+    def _authorized(self):
+        supplied = request.headers.get("Authorization", "").encode()
+        return hmac.compare_digest(supplied, f"Bearer {self.token}".encode())
+
+    @staticmethod
+    def _unauthorized():
+        response = jsonify({"ok": False, "error": "Unauthorized"})
+        response.status_code = 401
+        response.headers["WWW-Authenticate"] = "Bearer"
+        return response
+
+    def metrics_view(self):
+        if not self._authorized():
+            return self._unauthorized()
+        return current_app.response_class(self.render(), mimetype=PROMETHEUS_MIMETYPE,
+                                          headers={"Cache-Control": "no-store"})
+
+    def slow_requests_view(self):
+        if not self._authorized():
+            return self._unauthorized()
+        if self.profiler is None:
+            return jsonify({"ok": True, "threshold_ms": None, "requests": []})
+        return jsonify({"ok": True, "threshold_ms": self.slow_threshold * 1000,
+                        "requests": list(reversed(self.profiler.reports))})
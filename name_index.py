@@ -0,0 +1,124 @@
+import heapq
+import threading
+
+TRIGRAM_SIZE = 3
+
+# Trigrams shared by more names than this are skipped when gathering fuzzy
+# candidates; they carry little signal and would make lookups O(catalog).
+MAX_POSTING_SCAN = 2000
+MAX_CANDIDATES = 200
+DEFAULT_MIN_SIMILARITY = 0.4
+
+
+def normalize_name(name):
+    return " ".join((name or "").casefold().split())
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + TRIGRAM_SIZE] for i in range(len(padded) - TRIGRAM_SIZE + 1)}
+
+
+class NameIndex:
+    """
+    Case-folded name -> shoe_id hash index with a trigram fallback for typos.
+
+    Exact lookups are a single dict probe. Fuzzy lookups only touch the
+    posting lists of the query's trigrams, capped by MAX_POSTING_SCAN, so
+    their cost does not grow with catalog size.
+    """
+
+    def __init__(self, shoes=None):
+        self._lock = threading.RLock()
+        self._by_name = {}   # normalized name -> [shoe_id, ...] in insertion order
+        self._names = {}     # shoe_id -> normalized name
+        self._grams = {}     # trigram -> set(shoe_id)
+        self._gram_count = {}  # shoe_id -> number of distinct trigrams
+        if shoes:
+            self.build(shoes)
+
+    def build(self, shoes):
+        with self._lock:
+            self._by_name.clear()
+            self._names.clear()
+            self._grams.clear()
+            self._gram_count.clear()
+            for shoe_id, shoe in shoes.items():
+                self._add(shoe_id, shoe)
+
+    def add(self, shoe_id, shoe):
+        with self._lock:
+            self._remove(shoe_id)
+            self._add(shoe_id, shoe)
+
+    def remove(self, shoe_id):
+        with self._lock:
+            self._remove(shoe_id)
+
+    def __len__(self):
+        return len(self._names)
+
+    def _add(self, shoe_id, shoe):
+        key = normalize_name(shoe.get("name"))
+        self._names[shoe_id] = key
+        self._by_name.setdefault(key, []).append(shoe_id)
+        grams = trigrams(key)
+        self._gram_count[shoe_id] = len(grams)
+        for gram in grams:
+            self._grams.setdefault(gram, set()).add(shoe_id)
+
+    def _remove(self, shoe_id):
+        key = self._names.pop(shoe_id, None)
+        if key is None:
+            return
+        self._gram_count.pop(shoe_id, None)
+        ids = self._by_name.get(key)
+        if ids is not None:
+            ids.remove(shoe_id)
+            if not ids:
+                del self._by_name[key]
+        for gram in trigrams(key):
+            bucket = self._grams.get(gram)
+            if bucket is not None:
+                bucket.discard(shoe_id)
+                if not bucket:
+                    del self._grams[gram]
+
+    def get(self, name):
+        ids = self._by_name.get(normalize_name(name))
+        return ids[0] if ids else None
+
+    def suggest(self, name, limit=5, min_similarity=DEFAULT_MIN_SIMILARITY):
+        """Return [(shoe_id, similarity), ...] best first, using trigram Dice similarity."""
+        query_grams = trigrams(normalize_name(name))
+        if not query_grams:
+            return []
+
+        with self._lock:
+            shared = {}
+            # Rarest trigrams first so the candidate cap keeps the most selective ones
+            for gram in sorted(query_grams, key=lambda g: len(self._grams.get(g, ()))):
+                bucket = self._grams.get(gram)
+                if not bucket or len(bucket) > MAX_POSTING_SCAN:
+                    continue
+                for shoe_id in bucket:
+                    if shoe_id in shared:
+                        shared[shoe_id] += 1
+                    elif len(shared) < MAX_CANDIDATES:
+                        shared[shoe_id] = 1
+
+            scored = []
+            for shoe_id, common in shared.items():
+                similarity = 2.0 * common / (len(query_grams) + self._gram_count[shoe_id])
+                if similarity >= min_similarity:
+                    scored.append((round(similarity, 4), shoe_id))
+
+        best = heapq.nlargest(limit, scored)
+        return [(shoe_id, similarity) for similarity, shoe_id in best]
+
+    def resolve(self, name, fuzzy=False, min_similarity=DEFAULT_MIN_SIMILARITY):
+        shoe_id = self.get(name)
+        if shoe_id is not None or not fuzzy:
+            return shoe_id
+        best = self.suggest(name, limit=1, min_similarity=min_similarity)
+        return best[0][0] if best else None
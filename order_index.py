@@ -0,0 +1,164 @@
+import threading
+from bisect import bisect_left, insort
+
+INDEXED_FIELDS = ("customer_id", "shoe_id", "status")
+CHUNK_SIZE = 1024
+
+
+def order_key(order_id, order):
+    """Listing order: newest first by created_at, ties broken by order id."""
+    return (order.get("created_at") or "", order_id)
+
+
+class SortedKeys:
+    """
+    Sorted list split into chunks of at most 2 * CHUNK_SIZE keys, so an
+    insert or delete anywhere moves at most one chunk's worth of pointers
+    instead of shifting the whole list.
+    """
+
+    __slots__ = ("_chunks", "_maxes", "_len")
+
+    def __init__(self, keys=()):
+        keys = sorted(keys)
+        self._chunks = [keys[i:i + CHUNK_SIZE] for i in range(0, len(keys), CHUNK_SIZE)]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+        self._len = len(keys)
+
+    def __len__(self):
+        return self._len
+
+    def add(self, key):
+        if not self._chunks:
+            self._chunks.append([key])
+            self._maxes.append(key)
+        else:
+            i = min(bisect_left(self._maxes, key), len(self._chunks) - 1)
+            chunk = self._chunks[i]
+            insort(chunk, key)
+            self._maxes[i] = chunk[-1]
+            if len(chunk) > 2 * CHUNK_SIZE:
+                self._chunks[i:i + 1] = [chunk[:CHUNK_SIZE], chunk[CHUNK_SIZE:]]
+                self._maxes[i:i + 1] = [chunk[CHUNK_SIZE - 1], chunk[-1]]
+        self._len += 1
+
+    def remove(self, key):
+        i = bisect_left(self._maxes, key)
+        if i == len(self._chunks):
+            return
+        chunk = self._chunks[i]
+        j = bisect_left(chunk, key)
+        if j == len(chunk) or chunk[j] != key:
+            return
+        del chunk[j]
+        self._len -= 1
+        if chunk:
+            self._maxes[i] = chunk[-1]
+        else:
+            del self._chunks[i]
+            del self._maxes[i]
+
+    def descending(self, below=None, at_least=None):
+        """Keys k with at_least <= k < below, largest first (either bound may be None)."""
+        chunks = self._chunks
+        i = len(chunks) - 1 if below is None else min(bisect_left(self._maxes, below), len(chunks) - 1)
+        while i >= 0:
+            chunk = chunks[i]
+            hi = len(chunk) if below is None else bisect_left(chunk, below)
+            lo = 0 if at_least is None else bisect_left(chunk, at_least)
+            for j in range(hi - 1, lo - 1, -1):
+                yield chunk[j]
+            if lo > 0:
+                return
+            i -= 1
+
+
+class OrderIndex:
+    """
+    Secondary indexes over the order table.
+
+    Every index is a SortedKeys of (created_at, order_id), one for the whole
+    table and one per customer_id, shoe_id and status value. A listing
+    picks the shortest index among the requested filters, bisects to the
+    created_at range and the cursor position, and walks backwards checking
+    the remaining filters, so it touches only candidate orders, never the
+    whole table.
+    """
+
+    def __init__(self, orders=()):
+        self._lock = threading.Lock()
+        self._entries = {}  # order_id -> (key, (customer_id, shoe_id, status))
+        grouped = {field: {} for field in INDEXED_FIELDS}
+        for order_id, order in orders:
+            key, values = order_key(order_id, order), tuple(order.get(f) for f in INDEXED_FIELDS)
+            self._entries[order_id] = (key, values)
+            for field, value in zip(INDEXED_FIELDS, values):
+                grouped[field].setdefault(value, []).append(key)
+        self._all = SortedKeys(key for key, _ in self._entries.values())
+        self._by = {field: {value: SortedKeys(keys) for value, keys in lists.items()}
+                    for field, lists in grouped.items()}
+
+    def update(self, order_id, order):
+        """Index a new order or re-index a changed one (no-op if indexed fields are unchanged)."""
+        key, values = order_key(order_id, order), tuple(order.get(f) for f in INDEXED_FIELDS)
+        with self._lock:
+            previous = self._entries.get(order_id)
+            if previous == (key, values):
+                return
+            if previous is not None:
+                self._unlink(*previous)
+            self._entries[order_id] = (key, values)
+            self._all.add(key)
+            for field, value in zip(INDEXED_FIELDS, values):
+                keys = self._by[field].get(value)
+                if keys is None:
+                    keys = self._by[field][value] = SortedKeys()
+                keys.add(key)
+
+    def discard(self, order_id):
+        with self._lock:
+            previous = self._entries.pop(order_id, None)
+            if previous is not None:
+                self._unlink(*previous)
+
+    def _unlink(self, key, values):
+        self._all.remove(key)
+        for field, value in zip(INDEXED_FIELDS, values):
+            keys = self._by[field].get(value)
+            if keys is not None:
+                keys.remove(key)
+                if not keys:
+                    del self._by[field][value]
+
+    def query(self, limit, before=None, created_from=None, created_to=None, **filters):
+        """
+        (created_at, order_id) keys matching every field filter, newest first.
+
+        created_from is inclusive and created_to exclusive (ISO timestamps);
+        before is the (created_at, order_id) key of the last row of the
+        previous page.
+        """
+        wanted = [(INDEXED_FIELDS.index(f), v) for f, v in filters.items() if v is not None]
+        below = (created_to,) if created_to else None
+        if before is not None:
+            before = tuple(before)
+            below = before if below is None else min(below, before)
+        at_least = (created_from,) if created_from else None
+        with self._lock:
+            candidates = [self._by[INDEXED_FIELDS[i]].get(v) for i, v in wanted]
+            if any(keys is None for keys in candidates):
+                return []
+            keys = min(candidates, key=len) if candidates else self._all
+            result = []
+            entries = self._entries
+            for key in keys.descending(below, at_least):
+                values = entries[key[1]][1]
+                if all(values[field] == value for field, value in wanted):
+                    result.append(key)
+                    if len(result) == limit:
+                        break
+            return result
+
+    def __len__(self):
+        return len(self._entries)
+
@@ -0,0 +1,299 @@
+import glob
+import json
+import os
+import threading
+import time
+import zlib
+
+SNAPSHOT_FILE = "snapshot.json"
+SEGMENT_PATTERN = "journal-*.log"
+
+
+def _segment_name(first_seq):
+    return f"journal-{first_seq:012d}.log"
+
+
+def _fsync_dir(path):
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+# One event per line:  <crc32 hex> <seq> <len(order_id)> <order_id> <order json>\n
+# The crc covers everything after the first space. Keeping seq and order_id
+# outside the JSON lets replay find the last write per order without parsing
+# every superseded document.
+
+def encode_body(order_id, order):
+    """Everything but the sequence number, so callers can serialize outside the journal lock."""
+    key = order_id.encode()
+    return b"%d %s %s" % (len(key), key, json.dumps(order, separators=(",", ":")).encode())
+
+
+def encode_event(seq, body):
+    payload = b"%d %s" % (seq, body)
+    return b"%08x %s\n" % (zlib.crc32(payload), payload)
+
+
+def decode_event(line):
+    """Return (seq, order_id, order_json_bytes), or None for a torn or corrupt line."""
+    if len(line) < 10 or line[-1:] != b"\n":
+        return None
+    payload = line[9:-1]
+    try:
+        if int(line[:8], 16) != zlib.crc32(payload):
+            return None
+        seq, key_len, rest = payload.split(b" ", 2)
+        key_len = int(key_len)
+        return int(seq), rest[:key_len].decode(), rest[key_len + 1:]
+    except ValueError:
+        return None
+
+
+class OrderJournal:
+    """
+    Append-only journal of order writes with group commit.
+
+    Every write is logged as the full new order document, so replay is a
+    sequence of idempotent puts. append() only queues the record and returns
+    a ticket; a single flusher thread writes everything queued within the
+    commit window and issues one fsync for the whole batch, then wakes all
+    writers whose tickets it covered. Concurrent requests therefore share
+    fsyncs instead of paying one each.
+
+    Every snapshot_every events the flusher starts a new segment and a
+    background thread writes a compacted snapshot of the order table; once
+    it is durable the older segments are deleted. Startup loads the
+    snapshot and replays only the segment tail after it.
+
+    Lines are "<crc32> <seq> <order_id length> <order_id> <json>" (see
+    encode_event); replay stops at the first torn or corrupt line, which can
+    only be the unacknowledged tail of the last batch.
+    """
+
+    def __init__(self, directory, commit_window_ms=2.0, snapshot_every=100000):
+        self.directory = directory
+        self.commit_window = commit_window_ms / 1000.0
+        self.snapshot_every = snapshot_every
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._has_data = threading.Condition(self._lock)
+        self._durable = threading.Condition(threading.Lock())
+        self._buffer = []
+        self._seq = 0            # last sequence number handed out
+        self._durable_seq = 0    # last sequence number known to be on disk
+        self._since_snapshot = 0
+        self._snapshot_source = None
+        self._snapshot_thread = None
+        self._file = None
+        self._active_path = None
+        self._flusher = None
+        self._stopping = False
+        self._error = None
+        self.stats = {"events": 0, "fsyncs": 0, "snapshots": 0}
+
+    # ----------------------------
+    # Recovery
+    # ----------------------------
+    def _segments(self):
+        return sorted(glob.glob(os.path.join(self.directory, SEGMENT_PATTERN)))
+
+    def recover(self):
+        """
+        Rebuild {order_id: order} from the snapshot plus the journal tail.
+
+        Returns None when the directory holds no previous state. Also fills
+        self.last_recovery with timing figures.
+        """
+        started = time.perf_counter()
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        orders = None
+        snapshot_seq = 0
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, "rb") as f:
+                snapshot = json.loads(f.read())
+            orders = snapshot["orders"]
+            snapshot_seq = snapshot["seq"]
+        loaded = time.perf_counter()
+
+        replayed = 0
+        last_seq = snapshot_seq
+        latest = {}  # order_id -> newest document bytes; parsed once after the scan
+        segments = self._segments()
+        for i, path in enumerate(segments):
+            with open(path, "rb") as f:
+                for line in f:
+                    event = decode_event(line)
+                    if event is None:
+                        break
+                    seq, order_id, doc = event
+                    if seq <= snapshot_seq:
+                        continue
+                    latest[order_id] = doc
+                    last_seq = seq
+                    replayed += 1
+                else:
+                    continue
+            # Torn tail: only possible in the newest segment; drop anything after it
+            for stale in segments[i + 1:]:
+                os.remove(stale)
+            self._truncate_after_valid(path)
+            break
+
+        if latest:
+            if orders is None:
+                orders = {}
+            for order_id, doc in latest.items():
+                orders[order_id] = json.loads(doc)
+
+        self._seq = self._durable_seq = last_seq
+        self._since_snapshot = replayed
+        finished = time.perf_counter()
+        self.last_recovery = {
+            "orders": 0 if orders is None else len(orders),
+            "snapshot_seconds": loaded - started,
+            "replayed_events": replayed,
+            "replay_seconds": finished - loaded,
+            "events_per_second": replayed / (finished - loaded) if finished > loaded else 0.0,
+        }
+        return orders
+
+    @staticmethod
+    def _truncate_after_valid(path):
+        valid = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if decode_event(line) is None:
+                    break
+                valid += len(line)
+        with open(path, "r+b") as f:
+            f.truncate(valid)
+
+    # ----------------------------
+    # Writing
+    # ----------------------------
+    def start(self, snapshot_source):
+        """
+        Begin accepting appends. snapshot_source() must return the current
+        {order_id: order} table; it is called from the snapshot thread.
+        """
+        self._snapshot_source = snapshot_source
+        if not os.path.exists(os.path.join(self.directory, SNAPSHOT_FILE)) and not self._segments():
+            self._write_snapshot(self._seq)
+        self._open_segment(self._seq + 1)
+        self._flusher = threading.Thread(target=self._flush_loop, name="order-journal", daemon=True)
+        self._flusher.start()
+
+    def append(self, order_id, order):
+        """Queue one order write; returns a ticket for wait()."""
+        body = encode_body(order_id, order)
+        with self._lock:
+            if self._error is not None:
+                raise self._error
+            self._seq += 1
+            seq = self._seq
+            self._buffer.append(encode_event(seq, body))
+            self._has_data.notify()
+        return seq
+
+    def wait(self, ticket):
+        """Block until the write identified by ticket is fsynced."""
+        with self._durable:
+            while self._durable_seq < ticket:
+                if self._error is not None:
+                    raise self._error
+                self._durable.wait()
+
+    def log(self, order_id, order):
+        self.wait(self.append(order_id, order))
+
+    def _flush_loop(self):
+        while True:
+            with self._lock:
+                while not self._buffer and not self._stopping:
+                    self._has_data.wait()
+                if not self._buffer and self._stopping:
+                    return
+            if self.commit_window:
+                time.sleep(self.commit_window)  # let concurrent writers join this batch
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+                batch_seq = self._seq
+            try:
+                self._file.write(b"".join(batch))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except OSError as e:
+                with self._lock:
+                    self._error = e
+                with self._durable:
+                    self._durable.notify_all()
+                return
+            self.stats["events"] += len(batch)
+            self.stats["fsyncs"] += 1
+            with self._durable:
+                self._durable_seq = batch_seq
+                self._durable.notify_all()
+
+            self._since_snapshot += len(batch)
+            if self._since_snapshot >= self.snapshot_every and self._snapshot_idle():
+                self._rotate_and_snapshot(batch_seq)
+
+    def _open_segment(self, first_seq):
+        self._active_path = os.path.join(self.directory, _segment_name(first_seq))
+        self._file = open(self._active_path, "ab")
+
+    def _snapshot_idle(self):
+        return self._snapshot_thread is None or not self._snapshot_thread.is_alive()
+
+    def _rotate_and_snapshot(self, cut_seq):
+        # Records after cut_seq go to a fresh segment; the snapshot covers everything up to it.
+        with self._lock:
+            self._file.close()
+            self._open_segment(cut_seq + 1)
+        self._since_snapshot = 0
+        self._snapshot_thread = threading.Thread(
+            target=self._write_snapshot, args=(cut_seq,), name="order-snapshot", daemon=True)
+        self._snapshot_thread.start()
+
+    def _write_snapshot(self, cut_seq):
+        # Orders are applied before they are journaled, so a table copied now
+        # already contains every event <= cut_seq; later events replay idempotently.
+        orders = dict(self._snapshot_source())
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(json.dumps({"seq": cut_seq, "orders": orders}, separators=(",", ":")).encode())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        _fsync_dir(self.directory)
+        # Segments that start at or before cut_seq, other than the one being
+        # written, hold only events the snapshot now covers.
+        first_uncovered = _segment_name(cut_seq + 1)
+        for segment in self._segments():
+            if segment != self._active_path and os.path.basename(segment) < first_uncovered:
+                os.remove(segment)
+        self.stats["snapshots"] += 1
+
+    def snapshot_now(self):
+        """Force a snapshot at the current durable position (e.g. before shutdown)."""
+        with self._durable:
+            cut = self._durable_seq
+        self._write_snapshot(cut)
+
+    def close(self):
+        with self._lock:
+            self._stopping = True
+            self._has_data.notify()
+        if self._flusher is not None:
+            self._flusher.join()
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+        if self._file is not None:
+            self._file.close()
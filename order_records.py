@@ -0,0 +1,196 @@
+import sys
+import threading
+from datetime import datetime, timedelta
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class Codebook:
+    """
+    Small-integer codes for a low-cardinality string column (status, color,
+    payment method). Codes are assigned on first sight and never reused, so
+    a record only stores an int that indexes into a shared table.
+    """
+
+    def __init__(self, values=()):
+        self._codes = {}
+        self._values = []
+        self._lock = threading.Lock()
+        for value in values:
+            self.code(value)
+
+    def code(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(value)
+                if code is None:
+                    code = len(self._values)
+                    self._values.append(sys.intern(value))
+                    self._codes[value] = code
+        return code
+
+    def value(self, code):
+        return self._values[code]
+
+    def __len__(self):
+        return len(self._values)
+
+
+STATUSES = Codebook(("PLACED",))
+COLORS = Codebook()
+PAYMENT_METHODS = Codebook(("COD", "CARD"))
+
+
+class AddressBook:
+    """
+    Deduplicated shipping addresses.
+
+    An address is stored once as a tuple of its (key, value) pairs, shared
+    by every order that ships there, and reference counted so that an
+    address nobody ships to any more (after an address update, say) is
+    dropped.
+    """
+
+    def __init__(self):
+        self._entries = {}  # items tuple -> [items tuple, refcount]
+        self._lock = threading.Lock()
+
+    def acquire(self, address):
+        """Shared items tuple for an address dict, or None if it cannot be interned."""
+        try:
+            items = tuple((sys.intern(k), v) for k, v in address.items())
+            hash(items)
+        except TypeError:  # non-string keys or nested values
+            return None
+        with self._lock:
+            entry = self._entries.get(items)
+            if entry is None:
+                entry = self._entries[items] = [items, 0]
+            entry[1] += 1
+            return entry[0]
+
+    def release(self, items):
+        with self._lock:
+            entry = self._entries.get(items)
+            if entry is not None:
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    del self._entries[items]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def pack_timestamp(value):
+    """Naive ISO timestamp -> microseconds since the epoch, or None if it would not round-trip."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is not None or parsed.isoformat() != value:
+        return None
+    return (parsed - EPOCH) // timedelta(microseconds=1)
+
+
+def unpack_timestamp(micros):
+    return (EPOCH + timedelta(microseconds=micros)).isoformat()
+
+
+class OrderRecord:
+    """
+    One order in about 31% of the memory of the equivalent dict (measured by
+    bench/bench_order_memory.py with 100k orders from 50k customers).
+
+    Ids are interned, status, color and payment method are codebook ints,
+    created_at is integer microseconds and shipping_address points at a
+    tuple shared through an AddressBook. Any field that does not fit its
+    compact column (an unexpected type, a timestamp with a zone, a key the
+    routes do not write) is kept verbatim in `extra`, so unpack() always
+    returns a dict equal to the one that was packed. get() reads single
+    fields for the order indexes.
+    """
+
+    __slots__ = ("customer_id", "shoe_id", "size", "color", "quantity", "status", "address", "payment",
+                 "created", "extra")
+
+    def unpack(self):
+        order = {}
+        if self.customer_id is not None:
+            order["customer_id"] = self.customer_id
+        if self.shoe_id is not None:
+            order["shoe_id"] = self.shoe_id
+        if self.size is not None:
+            order["size"] = self.size
+        if self.color is not None:
+            order["color"] = COLORS.value(self.color)
+        if self.quantity is not None:
+            order["quantity"] = self.quantity
+        if self.status is not None:
+            order["status"] = STATUSES.value(self.status)
+        if self.address is not None:
+            order["shipping_address"] = dict(self.address)
+        if self.payment is not None:
+            order["payment_method"] = PAYMENT_METHODS.value(self.payment)
+        if self.created is not None:
+            order["created_at"] = unpack_timestamp(self.created)
+        if self.extra is not None:
+            order.update(self.extra)
+        return order
+
+    def get(self, field, default=None):
+        """One field as unpack() would return it, without building the whole dict."""
+        if self.extra is not None and field in self.extra:
+            return self.extra[field]
+        if field == "customer_id":
+            value = self.customer_id
+        elif field == "shoe_id":
+            value = self.shoe_id
+        elif field == "status":
+            value = None if self.status is None else STATUSES.value(self.status)
+        elif field == "created_at":
+            value = None if self.created is None else unpack_timestamp(self.created)
+        else:
+            return self.unpack().get(field, default)
+        return default if value is None else value
+
+
+def pack_order(order, addresses):
+    """Compact an order dict; the caller must release() the record when it is replaced."""
+    record = OrderRecord()
+    extra = {}
+    record.customer_id = record.shoe_id = record.size = record.color = record.quantity = None
+    record.status = record.address = record.payment = record.created = None
+
+    for field, value in order.items():
+        if field == "customer_id" and isinstance(value, str):
+            record.customer_id = sys.intern(value)
+        elif field == "shoe_id" and isinstance(value, str):
+            record.shoe_id = sys.intern(value)
+        elif field == "size" and value is not None:
+            record.size = value
+        elif field == "color" and isinstance(value, str):
+            record.color = COLORS.code(value)
+        elif field == "quantity" and value is not None:
+            record.quantity = value
+        elif field == "status" and isinstance(value, str):
+            record.status = STATUSES.code(value)
+        elif field == "shipping_address" and isinstance(value, dict):
+            record.address = addresses.acquire(value)
+            if record.address is None:
+                extra[field] = value
+        elif field == "payment_method" and isinstance(value, str):
+            record.payment = PAYMENT_METHODS.code(value)
+        elif field == "created_at":
+            record.created = pack_timestamp(value)
+            if record.created is None:
+                extra[field] = value
+        else:
+            extra[field] = value
+    record.extra = extra or None
+    return record
+
+
+def release(record, addresses):
+    if record is not None and record.address is not None:
+        addresses.release(record.address)
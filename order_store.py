@@ -0,0 +1,112 @@
+import itertools
+import re
+import threading
+from contextlib import contextmanager
+
+from order_index import OrderIndex
+from order_records import AddressBook, pack_order, release
+
+ORDER_ID_PREFIX = "ORD"
+DEFAULT_STRIPES = 64
+
+_ORDER_NUM_RE = re.compile(rf"^{ORDER_ID_PREFIX}(\d+)$")
+
+
+class OrderStore:
+    """
+    Concurrency-safe order table.
+
+    New IDs come from a shared counter and are claimed with dict.setdefault,
+    which is atomic, so two requests can never hand out the same order id.
+    Read-modify-write of an existing order goes through locked(order_id),
+    which takes one of a fixed set of striped locks: writers to different
+    orders rarely contend, writers to the same order always serialize.
+    Updates replace the stored record rather than mutating it, so readers
+    never observe a half-applied change.
+
+    Orders are held as compact OrderRecords (see order_records) with
+    shipping addresses shared through the store's AddressBook; every read
+    unpacks a fresh dict with the same shape the routes wrote.
+    """
+
+    def __init__(self, orders=None, first_id=1001, stripes=DEFAULT_STRIPES):
+        self._orders = {}
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+        self.addresses = AddressBook()
+        start = first_id
+        for order_id, order in (orders or {}).items():
+            release(self._orders.get(order_id), self.addresses)
+            self._orders[order_id] = pack_order(order, self.addresses)
+            match = _ORDER_NUM_RE.match(order_id)
+            if match:
+                start = max(start, int(match.group(1)) + 1)
+        self._seq = itertools.count(start)
+        self._seq_lock = threading.Lock()
+        # Secondary indexes (customer, shoe, status, created_at) kept in step with every write
+        self.index = OrderIndex(self._orders.items())
+
+    # Read-only mapping interface used by the routes
+    def get(self, order_id, default=None):
+        record = self._orders.get(order_id)
+        return default if record is None else record.unpack()
+
+    def __getitem__(self, order_id):
+        return self._orders[order_id].unpack()
+
+    def __contains__(self, order_id):
+        return order_id in self._orders
+
+    def __len__(self):
+        return len(self._orders)
+
+    def __iter__(self):
+        return iter(list(self._orders))
+
+    def items(self):
+        return [(order_id, record.unpack()) for order_id, record in list(self._orders.items())]
+
+    def values(self):
+        return [record.unpack() for record in list(self._orders.values())]
+
+    def _stripe(self, order_id):
+        return self._stripes[hash(order_id) % len(self._stripes)]
+
+    @contextmanager
+    def locked(self, order_id):
+        """Hold the stripe lock for order_id across a read-modify-write."""
+        lock = self._stripe(order_id)
+        with lock:
+            yield self.get(order_id)
+
+    def next_id(self):
+        with self._seq_lock:
+            return f"{ORDER_ID_PREFIX}{next(self._seq)}"
+
+    def create(self, order, on_create=None):
+        """
+        Store order under a freshly allocated id and return the id.
+        on_create(order_id), e.g. journaling the create, runs under the id's
+        stripe lock, so no write to the new order can come before it.
+        """
+        record = pack_order(order, self.addresses)
+        while True:
+            order_id = self.next_id()
+            with self._stripe(order_id):
+                if self._orders.setdefault(order_id, record) is record:
+                    self.index.update(order_id, record)
+                    if on_create is not None:
+                        on_create(order_id)
+                    return order_id
+
+    def put(self, order_id, order):
+        """Insert or overwrite order_id (caller-chosen ids)."""
+        with self._stripe(order_id):
+            self.replace(order_id, order)
+        return order_id
+
+    def replace(self, order_id, order):
+        """Swap in a new version of an order; call while holding locked(order_id)."""
+        record = pack_order(order, self.addresses)
+        release(self._orders.get(order_id), self.addresses)
+        self._orders[order_id] = record
+        self.index.update(order_id, record)
@@ -0,0 +1,277 @@
+import math
+import threading
+
+import numpy as np
+
+from columnar import PRICE_BAND_EDGES, Vocabulary, discounted_prices
+
+DEFAULT_TOP_K = 10
+INITIAL_CAPACITY = 64
+# Rows of the (block x catalog) score matrix computed at once: bounds the
+# scratch memory of a full build to about 32 MiB whatever the catalog size
+BLOCK_ELEMENTS = 1 << 23
+
+# Share of the similarity score carried by each feature group (sums to 1)
+WEIGHTS = {"materials": 0.25, "advantages": 0.3, "colors": 0.15, "price_band": 0.15, "rating": 0.15}
+# Ratings are encoded as a unit vector at this angle per rating point, so the
+# rating term is cos(angle * |r1 - r2|): 1 when equal, 0 two points apart
+RATING_ANGLE = math.pi / 4
+
+
+def price_band(shoe):
+    price = float(discounted_prices(shoe["base_price"], shoe["discount_percent"]))
+    for band, upper in enumerate(PRICE_BAND_EDGES):
+        if price < upper:
+            return band
+    return len(PRICE_BAND_EDGES)
+
+
+class SimilarShoes:
+    """
+    Precomputed "you may also like" lists.
+
+    Every shoe is one row of a feature matrix: multi-hot materials,
+    advantages and colors, a one-hot price band and a rating angle, each
+    group scaled so that the dot product of two rows is a weighted sum of
+    per-group cosine similarities in [0, 1]. A full build multiplies the
+    matrix by its transpose a block of rows at a time and keeps each row's
+    top-k, so serving a recommendation is a lookup in `top_rows`.
+
+    Changes are incremental: a new or edited shoe scores itself against the
+    catalog once (one matrix-vector product), takes its own top-k, and is
+    spliced into every list whose k-th score it beats. Lists that contained
+    an edited or removed shoe are recomputed, found with a vectorized scan
+    of `top_rows`. Rows are tombstoned on removal and reclaimed once half
+    are dead.
+    """
+
+    def __init__(self, shoes=None, k=DEFAULT_TOP_K):
+        self._lock = threading.RLock()
+        self.k = k
+        self._features = Vocabulary()  # (group, value) -> column
+        self._reset(INITIAL_CAPACITY, 8)
+        if shoes:
+            self.build(shoes)
+
+    def _reset(self, capacity, width):
+        self.n = 0
+        self.ids = []
+        self.rows = {}  # shoe_id -> row
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.vectors = np.zeros((capacity, width), dtype=np.float32)
+        self.top_rows = np.full((capacity, self.k), -1, dtype=np.int32)
+        self.top_scores = np.full((capacity, self.k), -np.inf, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.rows)
+
+    # ----------------------------
+    # Encoding
+    # ----------------------------
+    def _encode(self, shoe):
+        """[(column, value)] of a shoe's feature row; registers unseen features."""
+        cells = []
+        for group in ("materials", "advantages", "colors"):
+            values = set(shoe.get(group) or ())
+            if values:
+                weight = math.sqrt(WEIGHTS[group] / len(values))
+                cells.extend((self._features.code((group, v)), weight) for v in values)
+        cells.append((self._features.code(("price_band", price_band(shoe))), math.sqrt(WEIGHTS["price_band"])))
+        angle = float(shoe.get("rating") or 0) * RATING_ANGLE
+        weight = math.sqrt(WEIGHTS["rating"])
+        cells.append((self._features.code(("rating", "cos")), weight * math.cos(angle)))
+        cells.append((self._features.code(("rating", "sin")), weight * math.sin(angle)))
+        return cells
+
+    def _ensure(self, rows, width):
+        capacity, current = self.vectors.shape
+        if rows <= capacity and width <= current:
+            return
+        rows_to, width_to = max(rows, capacity * 2 if rows > capacity else capacity), max(width, current)
+        if width > current:
+            width_to = max(width, current * 2)
+        vectors = np.zeros((rows_to, width_to), dtype=np.float32)
+        vectors[:capacity, :current] = self.vectors
+        self.vectors = vectors
+        if rows_to > capacity:
+            for name, fill in (("alive", False), ("top_rows", -1), ("top_scores", -np.inf)):
+                old = getattr(self, name)
+                grown = np.full((rows_to,) + old.shape[1:], fill, dtype=old.dtype)
+                grown[:capacity] = old
+                setattr(self, name, grown)
+
+    def _write(self, row, cells):
+        self._ensure(row + 1, len(self._features))
+        self.vectors[row] = 0
+        for col, value in cells:
+            self.vectors[row, col] = value
+        self.alive[row] = True
+
+    # ----------------------------
+    # Top-k
+    # ----------------------------
+    def _select(self, scores, rows):
+        """Top-k columns of each row of scores (best first, ties by row order) -> (top_rows, top_scores)."""
+        k = min(self.k, scores.shape[1])
+        if k < scores.shape[1]:
+            picked = np.argpartition(scores, scores.shape[1] - k, axis=1)[:, -k:]
+        else:
+            picked = np.broadcast_to(np.arange(k), (len(rows), k))
+        picked_scores = np.take_along_axis(scores, picked, axis=1)
+        order = np.lexsort((picked, -picked_scores), axis=1)
+        top_rows = np.full((len(rows), self.k), -1, dtype=np.int32)
+        top_scores = np.full((len(rows), self.k), -np.inf, dtype=np.float32)
+        top_rows[:, :k] = np.take_along_axis(picked, order, axis=1)
+        top_scores[:, :k] = np.take_along_axis(picked_scores, order, axis=1)
+        top_rows[~np.isfinite(top_scores)] = -1
+        return top_rows, top_scores
+
+    def _recompute(self, rows):
+        """Rebuild the lists of `rows` from scratch against the whole catalog."""
+        rows = np.asarray(rows, dtype=np.intp)
+        n = self.n
+        if not len(rows) or not n:
+            return
+        dead = ~self.alive[:n]
+        block = max(1, BLOCK_ELEMENTS // n)
+        for start in range(0, len(rows), block):
+            chunk = rows[start:start + block]
+            scores = self.vectors[chunk] @ self.vectors[:n].T
+            scores[:, dead] = -np.inf
+            scores[np.arange(len(chunk)), chunk] = -np.inf  # never recommend a shoe for itself
+            self.top_rows[chunk], self.top_scores[chunk] = self._select(scores, chunk)
+
+    def _listing(self, row):
+        """Rows whose list currently contains `row`."""
+        return np.flatnonzero((self.top_rows[:self.n] == row).any(axis=1))
+
+    # ----------------------------
+    # Updates
+    # ----------------------------
+    def build(self, shoes):
+        with self._lock:
+            self._reset(max(INITIAL_CAPACITY, len(shoes)), max(8, len(self._features)))
+            encoded = [(shoe_id, self._encode(shoe)) for shoe_id, shoe in shoes.items()]
+            self._ensure(len(encoded), len(self._features))
+            rows, cols, values = [], [], []
+            for row, (shoe_id, cells) in enumerate(encoded):
+                self.ids.append(shoe_id)
+                self.rows[shoe_id] = row
+                for col, value in cells:
+                    rows.append(row)
+                    cols.append(col)
+                    values.append(value)
+            self.n = len(encoded)
+            self.alive[:self.n] = True
+            self.vectors[rows, cols] = values
+            self._recompute(np.arange(self.n))
+
+    def add(self, shoe_id, shoe):
+        with self._lock:
+            row = self.rows.get(shoe_id)
+            edited = row is not None
+            if not edited:
+                row = self.n
+                self.n += 1
+                self.rows[shoe_id] = row
+                self.ids.append(shoe_id)
+            self._write(row, self._encode(shoe))
+            n = self.n
+            scores = self.vectors[:n] @ self.vectors[row]
+            scores[~self.alive[:n]] = -np.inf
+            scores[row] = -np.inf
+            self.top_rows[row], self.top_scores[row] = (a[0] for a in self._select(scores[None, :], [row]))
+
+            # Lists holding the old version of this shoe are redone; the rest
+            # only take it in where it beats their current k-th entry.
+            stale = self._listing(row) if edited else np.empty(0, dtype=np.intp)
+            beaten = scores > self.top_scores[:n, -1]
+            beaten[stale] = False
+            beaten = np.flatnonzero(beaten)
+            if len(beaten):
+                merged_rows = np.hstack([self.top_rows[beaten], np.full((len(beaten), 1), row, dtype=np.int32)])
+                merged_scores = np.hstack([self.top_scores[beaten], scores[beaten, None]])
+                order = np.lexsort((merged_rows, -merged_scores), axis=1)[:, :self.k]
+                self.top_rows[beaten] = np.take_along_axis(merged_rows, order, axis=1)
+                self.top_scores[beaten] = np.take_along_axis(merged_scores, order, axis=1)
+            self._recompute(stale)
+
+    def remove(self, shoe_id):
+        with self._lock:
+            row = self.rows.pop(shoe_id, None)
+            if row is None:
+                return
+            self.alive[row] = False
+            self.vectors[row] = 0
+            self.top_rows[row] = -1
+            self.top_scores[row] = -np.inf
+            self._recompute(self._listing(row))
+            if self.n > INITIAL_CAPACITY and len(self.rows) < self.n // 2:
+                self._compact()
+
+    def _compact(self):
+        keep = np.flatnonzero(self.alive[:self.n])
+        remap = np.full(self.n + 1, -1, dtype=np.int32)  # remap[-1] maps empty slots to -1
+        remap[keep] = np.arange(len(keep), dtype=np.int32)
+        capacity = max(INITIAL_CAPACITY, len(keep))
+        for name, fill in (("alive", False), ("vectors", 0), ("top_rows", -1), ("top_scores", -np.inf)):
+            old = getattr(self, name)
+            packed = np.full((capacity,) + old.shape[1:], fill, dtype=old.dtype)
+            packed[:len(keep)] = old[keep]
+            setattr(self, name, packed)
+        self.top_rows[:len(keep)] = remap[self.top_rows[:len(keep)]]
+        self.ids = [self.ids[r] for r in keep]
+        self.rows = {shoe_id: r for r, shoe_id in enumerate(self.ids)}
+        self.n = len(self.ids)
+
+    def copy(self):
+        """Independent copy, for deriving the next catalog snapshot without touching this one."""
+        with self._lock:
+            other = SimilarShoes(k=self.k)
+            other._features.values = list(self._features.values)
+            other._features.index = dict(self._features.index)
+            other.n = self.n
+            other.ids = list(self.ids)
+            other.rows = dict(self.rows)
+            for name in ("alive", "vectors", "top_rows", "top_scores"):
+                setattr(other, name, getattr(self, name).copy())
+            return other
+
+    # ----------------------------
+    # Serving
+    # ----------------------------
+    def similar(self, shoe_id, limit=None):
+        """[(shoe_id, score)] best first from the precomputed list, or None for an unknown shoe."""
+        with self._lock:
+            row = self.rows.get(shoe_id)
+            if row is None:
+                return None
+            top_rows = self.top_rows[row, :limit]
+            top_scores = self.top_scores[row, :limit]
+            return [(self.ids[r], round(float(s), 4)) for r, s in zip(top_rows.tolist(), top_scores.tolist()) if r >= 0]
+
+
+# A reload that changes more of the catalog than this is rebuilt from scratch:
+# past it, recomputing the lists that held changed shoes costs about as much
+INCREMENTAL_MAX_SHARE = 0.05
+
+
+def refresh_similar(previous, previous_shoes, shoes, k=DEFAULT_TOP_K):
+    """
+    SimilarShoes for a new catalog version. When `previous` indexes a
+    catalog that differs from `shoes` in only a few entries, a copy of it is
+    updated with just the added, changed and removed shoes; otherwise the
+    index is built from scratch. `previous` itself is never modified.
+    """
+    if previous is None or previous.k != k or not shoes:
+        return SimilarShoes(shoes, k=k)
+    removed = [shoe_id for shoe_id in previous_shoes if shoe_id not in shoes]
+    changed = [shoe_id for shoe_id, shoe in shoes.items() if previous_shoes.get(shoe_id) != shoe]
+    if len(removed) + len(changed) > INCREMENTAL_MAX_SHARE * len(shoes):
+        return SimilarShoes(shoes, k=k)
+    index = previous.copy()
+    for shoe_id in removed:
+        index.remove(shoe_id)
+    for shoe_id in changed:
+        index.add(shoe_id, shoes[shoe_id])
+    return index
@@ -0,0 +1,600 @@
+import json
+import sqlite3
+import threading
+
+from inventory import InventoryMatrix
+from name_index import normalize_name
+from order_store import ORDER_ID_PREFIX
+from reservations import Hold, HoldTable, HELD, CUSTOMER_LIMIT, LIMIT
+
+
+class InMemoryRepository:
+    """
+    Storage backed by the process-local DB dict (the original demo layout).
+
+    DB["inventory"] must be an InventoryMatrix and DB["orders"] an OrderStore;
+    stock holds are kept in DB["pending"] through a HoldTable.
+    """
+
+    name = "memory"
+
+    def __init__(self, db, journal=None):
+        self.db = db
+        self.holds = HoldTable(db.setdefault("pending", {}))
+        # Optional OrderJournal: order writes are logged under the order's
+        # stripe lock (so the log preserves per-order write order) and the
+        # request waits for the group commit outside it.
+        self.journal = journal
+
+    # Customers
+    def get_customer(self, customer_id):
+        return self.db["customers"].get(customer_id)
+
+    # Shoes
+    def get_shoe(self, shoe_id):
+        return self.db["shoes"].get(shoe_id)
+
+    def get_shoes(self, shoe_ids):
+        shoes = self.db["shoes"]
+        return {sid: shoes[sid] for sid in shoe_ids if sid in shoes}
+
+    def all_shoes(self):
+        return dict(self.db["shoes"])
+
+    def upsert_shoe(self, shoe_id, shoe, inventory=None):
+        self.db["shoes"][shoe_id] = shoe
+        if inventory is not None:
+            self.db["inventory"].load_shoe(shoe_id, inventory)
+
+    def delete_shoe(self, shoe_id):
+        self.db["inventory"].remove_shoe(shoe_id)
+        return self.db["shoes"].pop(shoe_id, None)
+
+    def replace_catalog(self, shoes, inventory):
+        """
+        Swap in a whole new catalog and inventory ({shoe_id: {color: {size: bool}}}).
+        The new bitmap is built first and then both tables are swapped by reference.
+        """
+        matrix = InventoryMatrix.from_nested(inventory)
+        self.db["shoes"], self.db["inventory"] = dict(shoes), matrix
+
+    # Inventory
+    def is_available(self, shoe_id, color, size):
+        return self.db["inventory"].is_available(shoe_id, color, size)
+
+    def set_available(self, shoe_id, color, size, available):
+        return self.db["inventory"].set_available(shoe_id, color, size, available)
+
+    def availability_many(self, shoe_ids):
+        inventory = self.db["inventory"]
+        return {sid: inventory.availability(sid) for sid in shoe_ids}
+
+    # Orders
+    def get_order(self, order_id):
+        return self.db["orders"].get(order_id)
+
+    def _journal(self, order_id, order):
+        return self.journal.append(order_id, order) if self.journal is not None else None
+
+    def _durable(self, ticket):
+        if ticket is not None:
+            self.journal.wait(ticket)
+
+    def _create(self, order, tickets):
+        # The create record is appended while the new id's stripe lock is still held
+        return self.db["orders"].create(
+            order, on_create=lambda order_id: tickets.append(self._journal(order_id, order)))
+
+    def create_order(self, order):
+        tickets = []
+        order_id = self._create(order, tickets)
+        self._durable(tickets[-1])
+        return order_id
+
+    def create_orders(self, orders):
+        """Store several new orders; returns their ids. Journaled as one group commit."""
+        tickets = []
+        order_ids = [self._create(order, tickets) for order in orders]
+        if tickets:
+            self._durable(tickets[-1])  # the journal is ordered, so the last write durable means all are
+        return order_ids
+
+    def place_orders(self, orders, now, atomic=False):
+        """
+        Store the orders whose SKU no other customer holds, checking the holds
+        under their stripe locks so none can be taken before the writes.
+        Returns (order_ids, blocked): order_ids[i] is None for an order not
+        stored, blocked the indexes refused because of a hold. With atomic,
+        nothing is stored if any order is blocked.
+        """
+        skus = [(order["shoe_id"], order["color"], order["size"]) for order in orders]
+        tickets = []
+        with self.holds.locked(skus):
+            holders = self.holds.holders(skus, now)
+            blocked = {i for i, (sku, order) in enumerate(zip(skus, orders))
+                       if holders.get(sku, order["customer_id"]) != order["customer_id"]}
+            if atomic and blocked:
+                return [None] * len(orders), blocked
+            order_ids = [None if i in blocked else self._create(order, tickets) for i, order in enumerate(orders)]
+        if tickets:
+            self._durable(tickets[-1])
+        return order_ids, blocked
+
+    def put_order(self, order_id, order):
+        store = self.db["orders"]
+        with store.locked(order_id):
+            store.replace(order_id, order)
+            ticket = self._journal(order_id, order)
+        self._durable(ticket)
+        return order_id
+
+    def update_order(self, order_id, mutate):
+        """
+        Atomically replace an order with mutate(current).
+
+        Returns (previous, updated), or None if the order does not exist.
+        """
+        store = self.db["orders"]
+        with store.locked(order_id) as current:
+            if current is None:
+                return None
+            updated = mutate(current)
+            store.replace(order_id, updated)
+            ticket = self._journal(order_id, updated)
+        self._durable(ticket)
+        return current, updated
+
+    def list_orders(self, limit, before=None, **filters):
+        """
+        [(order_id, order)] newest first, using the store's secondary indexes.
+        Filters: customer_id, shoe_id, status, created_from, created_to.
+        """
+        store = self.db["orders"]
+        page = []
+        for _, order_id in store.index.query(limit, before=before, **filters):
+            order = store.get(order_id)
+            if order is not None:
+                page.append((order_id, order))
+        return page
+
+    def count_orders(self):
+        return len(self.db["orders"])
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
+
+
+# ----------------------------
+# SQLite
+# ----------------------------
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    customer_id TEXT PRIMARY KEY,
+    name        TEXT NOT NULL,
+    membership  TEXT NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS shoes (
+    shoe_id  TEXT PRIMARY KEY,
+    name_key TEXT NOT NULL,
+    doc      TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS shoes_name_key ON shoes (name_key);
+
+CREATE TABLE IF NOT EXISTS inventory (
+    shoe_id   TEXT NOT NULL,
+    color     TEXT NOT NULL,
+    size      INTEGER NOT NULL,
+    available INTEGER NOT NULL,
+    PRIMARY KEY (shoe_id, color, size)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS orders (
+    order_id    TEXT PRIMARY KEY,
+    customer_id TEXT NOT NULL,
+    shoe_id     TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    created_at  TEXT NOT NULL,
+    doc         TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS orders_customer ON orders (customer_id, created_at);
+CREATE INDEX IF NOT EXISTS orders_shoe_created ON orders (shoe_id, created_at);
+CREATE INDEX IF NOT EXISTS orders_status ON orders (status, created_at);
+CREATE INDEX IF NOT EXISTS orders_created ON orders (created_at);
+
+CREATE TABLE IF NOT EXISTS pending (
+    hold_id     TEXT PRIMARY KEY,
+    shoe_id     TEXT NOT NULL,
+    color       TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    quantity    INTEGER NOT NULL,
+    customer_id TEXT NOT NULL,
+    created     REAL NOT NULL,
+    deadline    REAL NOT NULL,
+    UNIQUE (shoe_id, color, size)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS pending_customer ON pending (customer_id);
+CREATE INDEX IF NOT EXISTS pending_deadline ON pending (deadline);
+
+CREATE TABLE IF NOT EXISTS sequences (
+    name  TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Statements are module constants so each pooled connection's statement
+# cache (sqlite3 cached_statements) prepares them once and reuses them.
+SQL_GET_CUSTOMER = "SELECT name, membership FROM customers WHERE customer_id = ?"
+SQL_UPSERT_CUSTOMER = "INSERT OR REPLACE INTO customers (customer_id, name, membership) VALUES (?, ?, ?)"
+SQL_GET_SHOE = "SELECT doc FROM shoes WHERE shoe_id = ?"
+SQL_ALL_SHOES = "SELECT shoe_id, doc FROM shoes"
+SQL_UPSERT_SHOE = "INSERT OR REPLACE INTO shoes (shoe_id, name_key, doc) VALUES (?, ?, ?)"
+SQL_DELETE_SHOE = "DELETE FROM shoes WHERE shoe_id = ?"
+SQL_DELETE_INVENTORY = "DELETE FROM inventory WHERE shoe_id = ?"
+SQL_GET_CELL = "SELECT available FROM inventory WHERE shoe_id = ? AND color = ? AND size = ?"
+SQL_UPSERT_CELL = "INSERT OR REPLACE INTO inventory (shoe_id, color, size, available) VALUES (?, ?, ?, ?)"
+SQL_SET_CELL = "UPDATE inventory SET available = ? WHERE shoe_id = ? AND color = ? AND size = ?"
+SQL_GET_ORDER = "SELECT doc FROM orders WHERE order_id = ?"
+SQL_INSERT_ORDER = ("INSERT OR IGNORE INTO orders (order_id, customer_id, shoe_id, status, created_at, doc) "
+                    "VALUES (?, ?, ?, ?, ?, ?)")
+SQL_UPSERT_ORDER = ("INSERT OR REPLACE INTO orders (order_id, customer_id, shoe_id, status, created_at, doc) "
+                    "VALUES (?, ?, ?, ?, ?, ?)")
+SQL_COUNT_ORDERS = "SELECT COUNT(*) FROM orders"
+HOLD_COLUMNS = "hold_id, shoe_id, color, size, quantity, customer_id, created, deadline"
+SQL_INSERT_HOLD = f"INSERT INTO pending ({HOLD_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+SQL_GET_HOLD = f"SELECT {HOLD_COLUMNS} FROM pending WHERE hold_id = ?"
+SQL_DELETE_HOLD = f"DELETE FROM pending WHERE hold_id = ? RETURNING {HOLD_COLUMNS}"
+SQL_ALL_HOLDS = f"SELECT {HOLD_COLUMNS} FROM pending"
+SQL_SWEEP_HOLDS = "DELETE FROM pending WHERE deadline <= ?"
+SQL_GET_HOLDER = "SELECT customer_id FROM pending WHERE shoe_id = ? AND color = ? AND size = ? AND deadline > ?"
+SQL_COUNT_HOLDS = "SELECT COUNT(*) FROM pending"
+SQL_COUNT_CUSTOMER_HOLDS = "SELECT COUNT(*) FROM pending WHERE customer_id = ?"
+SQL_NEXT_SEQ = "UPDATE sequences SET value = value + 1 WHERE name = ? RETURNING value"
+SQL_INIT_SEQ = "INSERT OR IGNORE INTO sequences (name, value) VALUES (?, ?)"
+
+ORDER_SEQUENCE = "orders"
+
+
+def _order_row(order_id, order):
+    return (order_id, order["customer_id"], order["shoe_id"], order["status"],
+            order["created_at"], json.dumps(order, separators=(",", ":")))
+
+
+def _in_listed_order(values, listed):
+    """values ordered as in `listed`, with any not listed after them in sorted order."""
+    position = {value: i for i, value in enumerate(listed)}
+    return sorted(values, key=lambda value: (position.get(value, len(position)), value))
+
+
+class SqliteRepository:
+    """
+    SQLite storage in WAL mode with one pooled connection per thread.
+
+    WAL lets readers proceed while a writer commits, so catalog reads are
+    not blocked by checkouts. Each waitress worker thread lazily opens its
+    own connection (sqlite3 connections must not be shared across threads)
+    and keeps it for the life of the thread. Order read-modify-writes run in
+    BEGIN IMMEDIATE transactions, which serialize writers at the database
+    and therefore also across processes. Stock holds live in the pending
+    table through a SqliteHoldTable, so every process sees the same ones.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path, busy_timeout_ms=5000, cached_statements=256):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections = []
+        self._pool_lock = threading.Lock()
+        self.conn.executescript(SCHEMA)
+        self.conn.execute(SQL_INIT_SEQ, (ORDER_SEQUENCE, 1000))
+        self.holds = SqliteHoldTable(self)
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout_ms / 1000,
+            isolation_level=None,  # explicit BEGIN/COMMIT below
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            with self._pool_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _tx(self, immediate=False):
+        return _Transaction(self.conn, immediate)
+
+    def close(self):
+        with self._pool_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def seed(self, db):
+        """Load the demo DB dict into an empty database."""
+        with self._tx(immediate=True) as conn:
+            if conn.execute("SELECT 1 FROM shoes LIMIT 1").fetchone():
+                return False
+            conn.executemany(SQL_UPSERT_CUSTOMER, [
+                (cid, c["name"], c["membership"]) for cid, c in db["customers"].items()
+            ])
+            conn.executemany(SQL_UPSERT_SHOE, [
+                (sid, normalize_name(s["name"]), json.dumps(s)) for sid, s in db["shoes"].items()
+            ])
+            inventory = db["inventory"]
+            for shoe_id in db["shoes"]:
+                nested = inventory.to_nested(shoe_id) if isinstance(inventory, InventoryMatrix) else inventory.get(shoe_id, {})
+                conn.executemany(SQL_UPSERT_CELL, [
+                    (shoe_id, color, size, int(ok)) for color, by_size in nested.items() for size, ok in by_size.items()
+                ])
+            conn.executemany(SQL_UPSERT_ORDER, [_order_row(oid, o) for oid, o in db["orders"].items()])
+            top = 1000
+            for oid, _ in db["orders"].items():
+                if oid.startswith(ORDER_ID_PREFIX) and oid[len(ORDER_ID_PREFIX):].isdigit():
+                    top = max(top, int(oid[len(ORDER_ID_PREFIX):]))
+            conn.execute("UPDATE sequences SET value = MAX(value, ?) WHERE name = ?", (top, ORDER_SEQUENCE))
+        return True
+
+    # Customers
+    def get_customer(self, customer_id):
+        row = self.conn.execute(SQL_GET_CUSTOMER, (customer_id,)).fetchone()
+        return {"name": row[0], "membership": row[1]} if row else None
+
+    # Shoes
+    def get_shoe(self, shoe_id):
+        row = self.conn.execute(SQL_GET_SHOE, (shoe_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_shoes(self, shoe_ids):
+        ids = list(dict.fromkeys(shoe_ids))
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        rows = self.conn.execute(f"SELECT shoe_id, doc FROM shoes WHERE shoe_id IN ({placeholders})", ids)
+        found = {sid: json.loads(doc) for sid, doc in rows}
+        return {sid: found[sid] for sid in ids if sid in found}
+
+    def all_shoes(self):
+        return {sid: json.loads(doc) for sid, doc in self.conn.execute(SQL_ALL_SHOES)}
+
+    def upsert_shoe(self, shoe_id, shoe, inventory=None):
+        with self._tx(immediate=True) as conn:
+            conn.execute(SQL_UPSERT_SHOE, (shoe_id, normalize_name(shoe["name"]), json.dumps(shoe)))
+            if inventory is not None:
+                conn.execute(SQL_DELETE_INVENTORY, (shoe_id,))
+                conn.executemany(SQL_UPSERT_CELL, [
+                    (shoe_id, color, size, int(ok)) for color, by_size in inventory.items() for size, ok in by_size.items()
+                ])
+
+    def delete_shoe(self, shoe_id):
+        shoe = self.get_shoe(shoe_id)
+        with self._tx(immediate=True) as conn:
+            conn.execute(SQL_DELETE_SHOE, (shoe_id,))
+            conn.execute(SQL_DELETE_INVENTORY, (shoe_id,))
+        return shoe
+
+    def replace_catalog(self, shoes, inventory):
+        """Swap in a whole new catalog and inventory in one transaction; readers see the old or the new one."""
+        with self._tx(immediate=True) as conn:
+            conn.execute("DELETE FROM shoes")
+            conn.execute("DELETE FROM inventory")
+            conn.executemany(SQL_UPSERT_SHOE, [
+                (sid, normalize_name(s["name"]), json.dumps(s)) for sid, s in shoes.items()
+            ])
+            conn.executemany(SQL_UPSERT_CELL, [
+                (shoe_id, color, size, int(ok))
+                for shoe_id, by_color in inventory.items()
+                for color, by_size in by_color.items() for size, ok in by_size.items()
+            ])
+
+    # Inventory
+    def is_available(self, shoe_id, color, size):
+        if not isinstance(size, int) or isinstance(size, bool):
+            return False
+        row = self.conn.execute(SQL_GET_CELL, (shoe_id, color, size)).fetchone()
+        return bool(row and row[0])
+
+    def set_available(self, shoe_id, color, size, available):
+        with self._tx(immediate=True) as conn:
+            return conn.execute(SQL_SET_CELL, (int(bool(available)), shoe_id, color, size)).rowcount > 0
+
+    def availability_many(self, shoe_ids):
+        ids = list(dict.fromkeys(shoe_ids))
+        result = {sid: None for sid in ids}
+        if not ids:
+            return result
+        placeholders = ",".join("?" * len(ids))
+        rows = self.conn.execute(
+            f"SELECT shoe_id, color, size, available FROM inventory WHERE shoe_id IN ({placeholders})", ids)
+        cells = {}
+        for shoe_id, color, size, available in rows:
+            cells.setdefault(shoe_id, {}).setdefault(color, {})[size] = available
+        # Same shape and order as InventoryMatrix.availability(): colors and
+        # sizes in the order the shoe document lists them
+        shoes = self.get_shoes(list(cells))
+        for shoe_id, by_cell in cells.items():
+            shoe = shoes.get(shoe_id) or {}
+            colors = _in_listed_order(by_cell, shoe.get("colors", ()))
+            sizes = _in_listed_order({size for by_size in by_cell.values() for size in by_size},
+                                     shoe.get("sizes", ()))
+            by_color = {color: [size for size in sizes if by_cell[color].get(size)] for color in colors}
+            by_size = {}
+            for size in sizes:
+                in_stock = [color for color in colors if by_cell[color].get(size)]
+                if in_stock:
+                    by_size[size] = in_stock
+            result[shoe_id] = {"by_color": by_color, "by_size": by_size}
+        return result
+
+    # Orders
+    def get_order(self, order_id):
+        row = self.conn.execute(SQL_GET_ORDER, (order_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    @staticmethod
+    def _insert_order(conn, order):
+        while True:
+            (num,) = conn.execute(SQL_NEXT_SEQ, (ORDER_SEQUENCE,)).fetchone()
+            order_id = f"{ORDER_ID_PREFIX}{num}"
+            if conn.execute(SQL_INSERT_ORDER, _order_row(order_id, order)).rowcount:
+                return order_id
+
+    def create_order(self, order):
+        with self._tx(immediate=True) as conn:
+            return self._insert_order(conn, order)
+
+    def create_orders(self, orders):
+        """Store several new orders in one transaction; returns their ids."""
+        with self._tx(immediate=True) as conn:
+            return [self._insert_order(conn, order) for order in orders]
+
+    def place_orders(self, orders, now, atomic=False):
+        """InMemoryRepository.place_orders(), with the hold check and the writes in one transaction."""
+        skus = [(order["shoe_id"], order["color"], order["size"]) for order in orders]
+        with self._tx(immediate=True):
+            holders = self.holds.holders(skus, now)
+            blocked = {i for i, (sku, order) in enumerate(zip(skus, orders))
+                       if holders.get(sku, order["customer_id"]) != order["customer_id"]}
+            if atomic and blocked:
+                return [None] * len(orders), blocked
+            conn = self.conn
+            return [None if i in blocked else self._insert_order(conn, order) for i, order in enumerate(orders)], blocked
+
+    def put_order(self, order_id, order):
+        with self._tx(immediate=True) as conn:
+            conn.execute(SQL_UPSERT_ORDER, _order_row(order_id, order))
+        return order_id
+
+    def update_order(self, order_id, mutate):
+        with self._tx(immediate=True) as conn:
+            row = conn.execute(SQL_GET_ORDER, (order_id,)).fetchone()
+            if row is None:
+                return None
+            current = json.loads(row[0])
+            updated = mutate(current)
+            conn.execute(SQL_UPSERT_ORDER, _order_row(order_id, updated))
+            return current, updated
+
+    def list_orders(self, limit, before=None, customer_id=None, shoe_id=None, status=None,
+                    created_from=None, created_to=None):
+        # Equality filters plus a created_at range map onto the (column, created_at) indexes
+        where, params = [], []
+        for column, value in (("customer_id", customer_id), ("shoe_id", shoe_id), ("status", status)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if created_from:
+            where.append("created_at >= ?")
+            params.append(created_from)
+        if created_to:
+            where.append("created_at < ?")
+            params.append(created_to)
+        if before is not None:
+            where.append("(created_at, order_id) < (?, ?)")
+            params.extend(before)
+        sql = "SELECT order_id, doc FROM orders"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC, order_id DESC LIMIT ?"
+        params.append(limit)
+        return [(order_id, json.loads(doc)) for order_id, doc in self.conn.execute(sql, params)]
+
+    def count_orders(self):
+        return self.conn.execute(SQL_COUNT_ORDERS).fetchone()[0]
+
+
+class SqliteHoldTable:
+    """
+    HoldTable kept in the pending table. Claims run in BEGIN IMMEDIATE
+    transactions, which serialize them across threads and processes, and
+    first delete every hold past its deadline (an index range on deadline)
+    so that a worker which exited with holds outstanding cannot leave them
+    blocking SKUs or counting against the caps.
+    """
+
+    def __init__(self, repo):
+        self.repo = repo
+
+    def add(self, hold, per_customer, limit, now):
+        with self.repo._tx(immediate=True) as conn:
+            conn.execute(SQL_SWEEP_HOLDS, (now,))
+            if conn.execute(SQL_GET_HOLDER, (*hold.sku, now)).fetchone():
+                return HELD
+            if conn.execute(SQL_COUNT_HOLDS).fetchone()[0] >= limit:
+                return LIMIT
+            if conn.execute(SQL_COUNT_CUSTOMER_HOLDS, (hold.customer_id,)).fetchone()[0] >= per_customer:
+                return CUSTOMER_LIMIT
+            conn.execute(SQL_INSERT_HOLD, (hold.hold_id, *hold.sku, hold.quantity, hold.customer_id,
+                                           hold.created, hold.deadline))
+        return None
+
+    def get(self, hold_id):
+        row = self.repo.conn.execute(SQL_GET_HOLD, (hold_id,)).fetchone()
+        return Hold(*row) if row else None
+
+    def remove(self, hold_id):
+        rows = self.repo.conn.execute(SQL_DELETE_HOLD, (hold_id,)).fetchall()
+        return Hold(*rows[0]) if rows else None
+
+    def holder(self, sku, now):
+        row = self.repo.conn.execute(SQL_GET_HOLDER, (*sku, now)).fetchone()
+        return row[0] if row else None
+
+    def holders(self, skus, now):
+        """{sku: customer_id} for those of the SKUs under a live hold, in one query."""
+        skus = list(dict.fromkeys(skus))
+        if not skus:
+            return {}
+        rows = self.repo.conn.execute(
+            "SELECT shoe_id, color, size, customer_id FROM pending WHERE deadline > ? "
+            f"AND (shoe_id, color, size) IN (VALUES {','.join(['(?, ?, ?)'] * len(skus))})",
+            [now, *(value for sku in skus for value in sku)])
+        return {(shoe_id, color, size): customer_id for shoe_id, color, size, customer_id in rows}
+
+    def all(self):
+        return [Hold(*row) for row in self.repo.conn.execute(SQL_ALL_HOLDS)]
+
+    def __len__(self):
+        return self.repo.conn.execute(SQL_COUNT_HOLDS).fetchone()[0]
+
+
+class _Transaction:
+    """BEGIN [IMMEDIATE] ... COMMIT/ROLLBACK on a pooled connection."""
+
+    def __init__(self, conn, immediate):
+        self.conn = conn
+        self.immediate = immediate
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE" if self.immediate else "BEGIN")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def open_repository(db, backend="memory", sqlite_path="shoehub.db", journal=None):
+    if backend == "memory":
+        return InMemoryRepository(db, journal=journal)
+    if backend == "sqlite":
+        repo = SqliteRepository(sqlite_path)
+        repo.seed(db)
+        return repo
+    raise ValueError(f"Unknown storage backend '{backend}' (use memory|sqlite)")
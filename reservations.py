@@ -0,0 +1,288 @@
+import heapq
+import os
+import secrets
+import threading
+import time
+from contextlib import ExitStack
+from datetime import datetime
+
+HOLD_ID_PREFIX = "HLD"
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_STRIPES = 64
+# Pending holds one customer may have at once, and the whole book
+DEFAULT_MAX_PER_CUSTOMER = 5
+DEFAULT_MAX_PENDING = 10000
+
+# Why reserve() refused a hold
+UNAVAILABLE = "unavailable"
+HELD = "held"
+CUSTOMER_LIMIT = "customer_limit"
+LIMIT = "limit"
+
+
+class Hold:
+    __slots__ = ("hold_id", "shoe_id", "color", "size", "quantity", "customer_id", "created", "deadline")
+
+    def __init__(self, hold_id, shoe_id, color, size, quantity, customer_id, created, deadline):
+        self.hold_id = hold_id
+        self.shoe_id = shoe_id
+        self.color = color
+        self.size = size
+        self.quantity = quantity
+        self.customer_id = customer_id
+        self.created = created  # wall-clock seconds, like deadline
+        self.deadline = deadline
+
+    @property
+    def sku(self):
+        return (self.shoe_id, self.color, self.size)
+
+    def to_dict(self, now=None):
+        remaining = self.deadline - (time.time() if now is None else now)
+        return {
+            "hold_id": self.hold_id, "shoe_id": self.shoe_id, "color": self.color, "size": self.size,
+            "quantity": self.quantity, "customer_id": self.customer_id,
+            "created_at": datetime.fromtimestamp(self.created).isoformat(),
+            "expires_at": datetime.fromtimestamp(self.deadline).isoformat(),
+            "expires_in_seconds": max(0, round(remaining, 1)),
+        }
+
+
+class HoldTable:
+    """
+    Pending holds of one process: {hold_id: Hold} (DB["pending"]) indexed by
+    SKU and counted per customer.
+
+    Claims take one of a fixed set of striped locks, so holds on different
+    SKUs never contend; the counters behind the caps have a lock of their
+    own that is only held for the arithmetic. SqliteHoldTable is the same
+    table kept in SQLite for workers that share one.
+    """
+
+    def __init__(self, pending, stripes=DEFAULT_STRIPES):
+        self.pending = pending
+        self._held = {}  # sku -> the latest Hold claiming it
+        self._per_customer = {}
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+        self._count_lock = threading.Lock()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._stripes = [threading.Lock() for _ in self._stripes]
+        self._count_lock = threading.Lock()
+
+    def _stripe(self, sku):
+        return self._stripes[hash(sku) % len(self._stripes)]
+
+    def locked(self, skus):
+        """Context manager holding the stripe locks of all the SKUs, taken in a fixed order."""
+        stack = ExitStack()
+        for index in sorted({hash(sku) % len(self._stripes) for sku in skus}):
+            stack.enter_context(self._stripes[index])
+        return stack
+
+    def _holder(self, sku, now):
+        hold = self._held.get(sku)
+        return hold.customer_id if hold is not None and hold.deadline > now else None
+
+    def add(self, hold, per_customer, limit, now):
+        """Record a pending hold unless its SKU is held or a cap is reached; returns None or the reason."""
+        with self._stripe(hold.sku):
+            if self._holder(hold.sku, now) is not None:
+                return HELD
+            with self._count_lock:
+                if len(self.pending) >= limit:
+                    return LIMIT
+                count = self._per_customer.get(hold.customer_id, 0)
+                if count >= per_customer:
+                    return CUSTOMER_LIMIT
+                self._per_customer[hold.customer_id] = count + 1
+                self.pending[hold.hold_id] = hold
+            self._held[hold.sku] = hold
+        return None
+
+    def get(self, hold_id):
+        return self.pending.get(hold_id)
+
+    def remove(self, hold_id):
+        """Drop a hold; returns it, or None if it was already gone."""
+        hold = self.pending.get(hold_id)
+        if hold is None:
+            return None
+        with self._stripe(hold.sku):
+            with self._count_lock:
+                if self.pending.pop(hold_id, None) is None:  # removed meanwhile
+                    return None
+                count = self._per_customer.pop(hold.customer_id) - 1
+                if count:
+                    self._per_customer[hold.customer_id] = count
+            if self._held.get(hold.sku) is hold:
+                del self._held[hold.sku]
+        return hold
+
+    def holder(self, sku, now):
+        """customer_id of the live hold on the SKU, or None."""
+        return self._holder(sku, now)
+
+    def holders(self, skus, now):
+        """{sku: customer_id} for those of the SKUs under a live hold."""
+        found = {}
+        for sku in skus:
+            customer_id = self._holder(sku, now)
+            if customer_id is not None:
+                found[sku] = customer_id
+        return found
+
+    def all(self):
+        return list(self.pending.values())
+
+    def __len__(self):
+        return len(self.pending)
+
+
+class ReservationBook:
+    """
+    Short-lived stock holds with TTL expiry, on top of the yes/no inventory.
+
+    Holds are advisory. Inventory has no quantities, so a hold claims its
+    whole (shoe, color, size) SKU: while it is pending the SKU counts as
+    unavailable to every customer but the holder, and once it is confirmed,
+    released or expired the SKU is back to whatever the inventory bit says.
+    Nothing is ever decremented: confirm() only ends the hold so its order
+    can be placed, and `quantity` is carried onto that order unchecked.
+
+    Each customer may have at most `per_customer` pending holds and the book
+    at most `limit`, so one client cannot take the catalog away from
+    everyone else. Records live in a hold table (HoldTable, or the SQLite
+    repository's, which every worker of a multi-process server shares);
+    deadlines are wall-clock seconds so they mean the same in every process,
+    and a hold past its deadline never blocks a SKU, whether or not it has
+    been removed yet.
+
+    Expiry is driven by a min-heap of (deadline, hold_id) per process: one
+    background thread sleeps until the earliest deadline and pops only what
+    is due, so the cost is O(log n) per hold and nothing ever scans the
+    pending table. Holds confirmed or released early, possibly by another
+    worker, leave a stale heap entry that is skipped when it surfaces.
+    """
+
+    def __init__(self, holds, is_available, per_customer=DEFAULT_MAX_PER_CUSTOMER, limit=DEFAULT_MAX_PENDING,
+                 clock=time.time):
+        self.holds = holds
+        self.is_available = is_available
+        self.per_customer = per_customer
+        self.limit = limit
+        self.clock = clock
+        self._heap = []
+        self._heap_lock = threading.Lock()
+        self._due = threading.Condition(self._heap_lock)
+        self._running = False
+        self.stats = {"reserved": 0, "confirmed": 0, "released": 0, "expired": 0, "withdrawn": 0, "rejected": 0}
+        if hasattr(os, "register_at_fork"):
+            # The expiry thread does not survive a fork; forked workers start their own
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._heap_lock = threading.Lock()
+        self._due = threading.Condition(self._heap_lock)
+        self._running = False
+
+    def free(self, shoe_id, color, size, customer_id=None):
+        """In stock and not held by anyone else (customer_id's own hold does not block it)."""
+        holder = self.holds.holder((shoe_id, color, size), self.clock())
+        if holder is not None and holder != customer_id:
+            return False
+        return self.is_available(shoe_id, color, size)
+
+    # ----------------------------
+    # Holds
+    # ----------------------------
+    def reserve(self, shoe_id, color, size, quantity=1, customer_id=None, ttl=DEFAULT_TTL_SECONDS):
+        """
+        Hold the SKU for `ttl` seconds. Returns (Hold, None), or (None, reason)
+        with reason UNAVAILABLE, HELD, CUSTOMER_LIMIT or LIMIT.
+        """
+        if not self.is_available(shoe_id, color, size):
+            reason = UNAVAILABLE
+        else:
+            now = self.clock()
+            hold = Hold(f"{HOLD_ID_PREFIX}{secrets.token_hex(8).upper()}", shoe_id, color, size, quantity,
+                        customer_id, now, now + ttl)
+            reason = self.holds.add(hold, self.per_customer, self.limit, now)
+        if reason is not None:
+            self.stats["rejected"] += 1
+            return None, reason
+        self.stats["reserved"] += 1
+        self._schedule(hold)
+        return hold, None
+
+    def get(self, hold_id, customer_id=None):
+        hold = self.holds.get(hold_id)
+        if hold is None or (customer_id is not None and hold.customer_id != customer_id):
+            return None
+        if hold.deadline <= self.clock():
+            return None  # due; the expiry thread will release it
+        return hold
+
+    def confirm(self, hold_id, customer_id=None):
+        """End a live hold so its order can be placed; returns the Hold, or None if unknown, expired or not the customer's."""
+        hold = self.get(hold_id, customer_id)
+        if hold is None:
+            return None
+        return self._end(hold, "confirmed")
+
+    def release(self, hold_id, customer_id=None):
+        hold = self.holds.get(hold_id)
+        if hold is None or (customer_id is not None and hold.customer_id != customer_id):
+            return None
+        return self._end(hold, "released")
+
+    def withdraw_unavailable(self):
+        """End every pending hold whose SKU is no longer in stock, e.g. after a catalog reload; returns how many."""
+        withdrawn = 0
+        for hold in self.holds.all():
+            if not self.is_available(*hold.sku) and self._end(hold, "withdrawn") is not None:
+                withdrawn += 1
+        return withdrawn
+
+    def _end(self, hold, reason):
+        if self.holds.remove(hold.hold_id) is None:  # ended meanwhile
+            return None
+        self.stats[reason] += 1
+        return hold
+
+    # ----------------------------
+    # Expiry
+    # ----------------------------
+    def _schedule(self, hold):
+        with self._due:
+            if not self._running:
+                self._running = True
+                threading.Thread(target=self._expire_loop, name="hold-expiry", daemon=True).start()
+            earliest = not self._heap or hold.deadline < self._heap[0][0]
+            heapq.heappush(self._heap, (hold.deadline, hold.hold_id))
+            if earliest:
+                self._due.notify()
+
+    def _expire_loop(self):
+        while True:
+            with self._due:
+                while True:
+                    if not self._heap:
+                        self._due.wait()
+                        continue
+                    delay = self._heap[0][0] - self.clock()
+                    if delay <= 0:
+                        break
+                    self._due.wait(delay)
+                now = self.clock()
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    due.append(heapq.heappop(self._heap)[1])
+            for hold_id in due:
+                if self.holds.remove(hold_id) is not None:
+                    self.stats["expired"] += 1
+
+    def __len__(self):
+        return len(self.holds)
@@ -0,0 +1,78 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 4096
+
+
+class VersionCounter:
+    """Monotonic counter bumped on every catalog change."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = 0
+
+    @property
+    def value(self):
+        return self._value
+
+    def bump(self):
+        with self._lock:
+            self._value += 1
+            return self._value
+
+
+class CachedResponse:
+    __slots__ = ("version", "status", "body", "etag_value", "etag")
+
+    def __init__(self, version, status, body):
+        self.version = version
+        self.status = status
+        self.body = body
+        self.etag_value = hashlib.blake2b(body, digest_size=16).hexdigest()
+        self.etag = f'"{self.etag_value}"'
+
+
+class ResponseCache:
+    """
+    Bounded LRU of pre-serialized JSON bodies with strong ETags.
+
+    Each entry remembers the catalog version it was built against; a lookup
+    with a newer version is a miss, so bumping the version invalidates every
+    cached catalog response at once without walking the cache.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, version, status, body):
+        entry = CachedResponse(version, status, body)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,181 @@
+import re
+import threading
+
+# Relative weight of a hit in each indexed field
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "brand": 2.0,
+    "materials": 1.5,
+    "advantages": 1.5,
+    "description": 1.0,
+}
+
+# Score multiplier by how a query term matched an indexed token
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.75
+INFIX_MATCH = 0.5
+
+NGRAM_SIZE = 3
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def ngrams(token, n=NGRAM_SIZE):
+    if len(token) <= n:
+        return {token}
+    return {token[i:i + n] for i in range(len(token) - n + 1)}
+
+
+def _field_text(shoe, field):
+    value = shoe.get(field)
+    if isinstance(value, (list, tuple)):
+        return " ".join(str(v) for v in value)
+    return value or ""
+
+
+class SearchIndex:
+    """
+    Inverted index over the shoe catalog.
+
+    Postings map every token to the shoes containing it with a field-weighted
+    score. A second map from character n-grams to vocabulary tokens resolves
+    partial terms ("run" -> "running") without scanning the catalog.
+    """
+
+    def __init__(self, shoes=None):
+        self._lock = threading.RLock()
+        self._postings = {}   # token -> {shoe_id: weight}
+        self._grams = {}      # n-gram -> set(token)
+        self._doc_tokens = {} # shoe_id -> set(token)
+        self._order = {}      # shoe_id -> insertion sequence (stable tie-break)
+        self._seq = 0
+        if shoes:
+            self.build(shoes)
+
+    def build(self, shoes):
+        with self._lock:
+            self._postings.clear()
+            self._grams.clear()
+            self._doc_tokens.clear()
+            self._order.clear()
+            self._seq = 0
+            for shoe_id, shoe in shoes.items():
+                self._add(shoe_id, shoe)
+
+    def add(self, shoe_id, shoe):
+        with self._lock:
+            self._remove(shoe_id)
+            self._add(shoe_id, shoe)
+
+    def remove(self, shoe_id):
+        with self._lock:
+            self._remove(shoe_id)
+
+    def __len__(self):
+        return len(self._doc_tokens)
+
+    def _add(self, shoe_id, shoe):
+        weights = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(_field_text(shoe, field)):
+                weights[token] = max(weights.get(token, 0.0), weight)
+
+        for token, weight in weights.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                for gram in ngrams(token) | self._short_grams(token):
+                    self._grams.setdefault(gram, set()).add(token)
+            postings[shoe_id] = weight
+
+        self._doc_tokens[shoe_id] = set(weights)
+        if shoe_id not in self._order:
+            self._order[shoe_id] = self._seq
+            self._seq += 1
+
+    def _remove(self, shoe_id):
+        tokens = self._doc_tokens.pop(shoe_id, None)
+        if tokens is None:
+            return
+        self._order.pop(shoe_id, None)
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(shoe_id, None)
+            if not postings:
+                del self._postings[token]
+                for gram in ngrams(token) | self._short_grams(token):
+                    bucket = self._grams.get(gram)
+                    if bucket is not None:
+                        bucket.discard(token)
+                        if not bucket:
+                            del self._grams[gram]
+
+    @staticmethod
+    def _short_grams(token):
+        # Grams shorter than NGRAM_SIZE so one- and two-letter queries resolve too
+        return {token[i:i + n] for n in range(1, NGRAM_SIZE) for i in range(len(token) - n + 1)}
+
+    def _expand(self, term):
+        """Return {token: match multiplier} for every vocabulary token containing term."""
+        if len(term) < NGRAM_SIZE:
+            candidates = self._grams.get(term, ())
+        else:
+            candidates = None
+            for gram in sorted(ngrams(term), key=lambda g: len(self._grams.get(g, ()))):
+                bucket = self._grams.get(gram)
+                if not bucket:
+                    return {}
+                candidates = set(bucket) if candidates is None else candidates & bucket
+                if not candidates:
+                    return {}
+
+        matches = {}
+        for token in candidates:
+            if token == term:
+                matches[token] = EXACT_MATCH
+            elif token.startswith(term):
+                matches[token] = PREFIX_MATCH
+            elif term in token:
+                matches[token] = INFIX_MATCH
+        return matches
+
+    def search(self, query, limit=None, offset=0):
+        """
+        Rank shoes matching every term of query.
+
+        Returns (total, [(shoe_id, score), ...]) for the requested page.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return 0, []
+
+        with self._lock:
+            scores = None
+            for term in terms:
+                term_scores = {}
+                for token, multiplier in self._expand(term).items():
+                    for shoe_id, weight in self._postings[token].items():
+                        score = weight * multiplier
+                        if score > term_scores.get(shoe_id, 0.0):
+                            term_scores[shoe_id] = score
+                if not term_scores:
+                    return 0, []
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {sid: s + term_scores[sid] for sid, s in scores.items() if sid in term_scores}
+                    if not scores:
+                        return 0, []
+
+            order = self._order
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], order[item[0]]))
+
+        total = len(ranked)
+        end = None if limit is None else offset + limit
+        return total, [(sid, round(score, 4)) for sid, score in ranked[offset:end]]
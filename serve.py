@@ -0,0 +1,29 @@
+"""
+Start the ShoeHub server on port 8080.
+
+    python serve.py
+    SHOEHUB_WORKERS=4 SHOEHUB_STORAGE=sqlite python serve.py
+
+The second form pre-forks that many waitress workers; see
+main.serve_multiprocess.
+
+Image encode workers re-import this script, so it imports the app only
+under the __main__ guard and does nothing else at import time.
+"""
+import os
+
+
+def run(host='0.0.0.0', port=8080):
+    import main
+
+    workers = int(os.environ.get("SHOEHUB_WORKERS", "1"))
+    if workers > 1:
+        main.serve_multiprocess(workers, host=host, port=port)
+    else:
+        main.image_derivatives.start()
+        print(f"Server started on http://127.0.0.1:{port}")
+        main.app.run(host=host, port=port, debug=False)
+
+
+if __name__ == '__main__':
+    run()
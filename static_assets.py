@@ -0,0 +1,144 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+
+from flask import send_file
+
+mimetypes.add_type("image/jpeg", ".jfif")
+mimetypes.add_type("image/avif", ".avif")
+
+# Files up to this size are held in memory; larger ones stream from disk.
+DEFAULT_MEMORY_LIMIT = 1024 * 1024
+GZIP_MIN_SIZE = 512
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/xml")
+
+# CRA-style fingerprinted names, e.g. main.3f2a9c1d.js
+HASHED_NAME_RE = re.compile(r"\.[0-9a-f]{8,}\.[A-Za-z0-9]+$")
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, max-age=300, must-revalidate"
+NO_CACHE = "no-cache"
+
+
+class Asset:
+    __slots__ = ("path", "mimetype", "size", "etag", "body", "gzip_body", "fingerprinted")
+
+    def __init__(self, path, mimetype, size, etag, body, gzip_body, fingerprinted):
+        self.path = path
+        self.mimetype = mimetype
+        self.size = size
+        self.etag = etag
+        self.body = body
+        self.gzip_body = gzip_body
+        self.fingerprinted = fingerprinted
+
+    @property
+    def version(self):
+        """Short content hash for cache-busting URLs (?v=...)."""
+        return self.etag[:12]
+
+
+def _compressible(mimetype):
+    return any(mimetype.startswith(t) for t in COMPRESSIBLE_TYPES)
+
+
+def build_asset(path, body=None, memory_limit=DEFAULT_MEMORY_LIMIT, name=None):
+    """Hash, and if small enough cache and precompress, one file (or an in-memory body)."""
+    name = name or os.path.basename(path)
+    mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if mimetype.startswith("text/"):
+        mimetype += "; charset=utf-8"
+    if body is None:
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        size = os.path.getsize(path)
+        if size <= memory_limit:
+            with open(path, "rb") as f:
+                body = f.read()
+        etag = digest.hexdigest()
+    else:
+        size = len(body)
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+
+    gzip_body = None
+    if body is not None and size >= GZIP_MIN_SIZE and _compressible(mimetype):
+        compressed = gzip.compress(body, compresslevel=9, mtime=0)
+        if len(compressed) < size * 0.9:
+            gzip_body = compressed
+    return Asset(path, mimetype, size, etag, body, gzip_body, bool(HASHED_NAME_RE.search(name)))
+
+
+class AssetManifest:
+    """
+    Startup snapshot of a static directory: content-hash ETags for every
+    file, bodies for small files and gzip variants for compressible ones.
+    Lookups are a dict probe; only files larger than memory_limit are read
+    from disk at request time.
+    """
+
+    def __init__(self, root, memory_limit=DEFAULT_MEMORY_LIMIT):
+        self.root = root
+        self.memory_limit = memory_limit
+        self._assets = {}
+        self._lock = threading.Lock()
+        self.rebuild()
+
+    def rebuild(self):
+        assets = {}
+        if os.path.isdir(self.root):
+            for dirpath, _, filenames in os.walk(self.root):
+                for filename in filenames:
+                    full = os.path.join(dirpath, filename)
+                    rel = os.path.relpath(full, self.root).replace(os.sep, "/")
+                    assets[rel] = build_asset(full, memory_limit=self.memory_limit)
+        with self._lock:
+            self._assets = assets
+
+    def get(self, relpath):
+        return self._assets.get(relpath)
+
+    def __contains__(self, relpath):
+        return relpath in self._assets
+
+    def __len__(self):
+        return len(self._assets)
+
+    def items(self):
+        return list(self._assets.items())
+
+
+def accepts_gzip(request):
+    return request.accept_encodings["gzip"] > 0
+
+
+def asset_response(app, request, asset, cache_control=None):
+    """
+    Serve an Asset with ETag revalidation, gzip negotiation and the right
+    Cache-Control. Fingerprinted names, or a ?v= matching the content hash,
+    are marked immutable.
+    """
+    if cache_control is None:
+        versioned = asset.fingerprinted or request.args.get("v") == asset.version
+        cache_control = IMMUTABLE if versioned else REVALIDATE
+
+    if asset.body is None:
+        response = send_file(asset.path, mimetype=asset.mimetype, etag=asset.etag, conditional=True)
+    elif asset.gzip_body is not None and accepts_gzip(request):
+        response = app.response_class(asset.gzip_body, mimetype=asset.mimetype)
+        response.headers["Content-Encoding"] = "gzip"
+        response.set_etag(asset.etag + "-gz")
+        response.make_conditional(request)
+    else:
+        response = app.response_class(asset.body, mimetype=asset.mimetype)
+        response.set_etag(asset.etag)
+        response.make_conditional(request, accept_ranges=True, complete_length=asset.size)
+
+    if asset.gzip_body is not None:
+        response.vary.add("Accept-Encoding")
+    response.headers["Cache-Control"] = cache_control
+    return response